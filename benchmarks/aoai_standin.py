@@ -0,0 +1,464 @@
+"""
+Local OpenAI-compatible stand-in for Azure OpenAI chat completions and embeddings.
+
+Serves the Azure routes (/openai/deployments/<deployment>/chat/completions and /embeddings) and
+the OpenAI ones (/v1/chat/completions, /v1/embeddings), so the agents, data_prep / the retrieval
+helpers and the benchmarks run against it unchanged with
+
+    AZURE_OPENAI_ENDPOINT=http://localhost:8001/
+    AZURE_OPENAI_API_KEY=local
+
+Modes:
+    synthetic  deterministic answers generated locally (default)
+    record     requests are proxied to --upstream and every response (with the timing of each
+               streamed chunk) is appended to --cassette; the client's credentials are forwarded,
+               or STANDIN_UPSTREAM_API_KEY is sent instead when it is set
+    replay     responses are served from --cassette with their recorded timing (scaled by
+               --replay-speed); a request that was not recorded gets a synthetic answer, or a 404
+               with --on-miss error
+
+Synthetic chat: when the request offers tools and the conversation has no tool result since the
+last user message, the tool whose name and description share the most words with that message
+(the first one on a tie) is called, with the message text for its string parameters; otherwise
+the answer quotes the tool results, or echoes the question. json_schema response formats get a minimal conforming object. The first
+token arrives after --ttft-ms and the rest follow at --tokens-per-second.
+
+Synthetic embeddings hash words and word bigrams into signed buckets (feature hashing) and are
+L2-normalized, so texts that share words get similar vectors and the same text always gets the
+same vector.
+
+    python benchmarks/aoai_standin.py --port 8001 --ttft-ms 400 --tokens-per-second 60
+    python benchmarks/aoai_standin.py --mode record --upstream https://<resource>.openai.azure.com/ --cassette session.jsonl
+    python benchmarks/aoai_standin.py --mode replay --cassette session.jsonl --replay-speed 0
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# allow running as `python benchmarks/aoai_standin.py` from the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from semantic_kernel_framework.bm25_index import tokenize
+
+CHARS_PER_TOKEN = 4
+STREAM_PIECE_PATTERN = re.compile(r"\S+\s*|\s+")
+# request fields that do not change the answer
+VOLATILE_FIELDS = ("user", "stream_options", "n", "seed", "logprobs", "top_logprobs")
+# headers forwarded to the upstream service in record mode
+FORWARDED_HEADERS = ("authorization", "api-key", "content-type")
+MAX_QUOTED_WORDS = 60
+
+
+class Config:
+    mode = "synthetic"
+    ttft_ms = 300.0
+    tokens_per_second = 50.0
+    embedding_latency_ms = 20.0
+    embedding_dimensions = 1536
+    upstream: Optional[str] = None
+    cassette: Optional[str] = None
+    replay_speed = 1.0
+    on_miss = "synthetic"
+
+
+config = Config()
+stats: Dict[str, int] = {"chat_requests": 0, "embedding_requests": 0, "tool_calls": 0,
+                         "recorded": 0, "replayed": 0, "replay_misses": 0, "upstream_errors": 0}
+app = FastAPI(title="Azure OpenAI stand-in")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# ---------------------------------------------------------------- embeddings
+
+
+def hash_embedding(text: str, dimensions: int) -> np.ndarray:
+    vector = np.zeros(dimensions, dtype=np.float32)
+    tokens = tokenize(text)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for feature in features or [text]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embedding_inputs(body: Dict[str, Any]) -> List[str]:
+    inputs = body.get("input", "")
+    if isinstance(inputs, str):
+        return [inputs]
+    if inputs and isinstance(inputs[0], int):
+        # a single pre-tokenized input
+        return [" ".join(map(str, inputs))]
+    return [item if isinstance(item, str) else " ".join(map(str, item)) for item in inputs]
+
+
+async def synthetic_embeddings(body: Dict[str, Any], deployment: str) -> Dict[str, Any]:
+    inputs = embedding_inputs(body)
+    dimensions = int(body.get("dimensions") or config.embedding_dimensions)
+    base64_encoded = body.get("encoding_format") == "base64"
+    await asyncio.sleep(config.embedding_latency_ms / 1000)
+    data = []
+    for i, text in enumerate(inputs):
+        vector = hash_embedding(text, dimensions)
+        embedding = base64.b64encode(vector.tobytes()).decode("ascii") if base64_encoded else vector.tolist()
+        data.append({"object": "embedding", "index": i, "embedding": embedding})
+    tokens = sum(estimate_tokens(text) for text in inputs)
+    return {"object": "list", "data": data, "model": deployment,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+
+# ---------------------------------------------------------------- chat
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def pick_tool(tools: List[Dict[str, Any]], query: str) -> Optional[Dict[str, Any]]:
+    """The function whose name and description share the most words with the query (ties: first offered)."""
+    query_words = set(tokenize(query))
+    functions = [tool["function"] for tool in tools if tool.get("function")]
+    if not functions:
+        return None
+    return max(functions, key=lambda function: len(query_words & set(
+        tokenize(function.get("name", "").replace("_", " ") + " " + function.get("description", "")))))
+
+
+def tool_arguments(function: Dict[str, Any], query: str) -> Dict[str, Any]:
+    properties = (function.get("parameters") or {}).get("properties") or {}
+    required = (function.get("parameters") or {}).get("required") or list(properties)[:1]
+    return {name: value_from_schema(properties.get(name) or {}, query) for name in required}
+
+
+def value_from_schema(schema: Dict[str, Any], query: str) -> Any:
+    """A minimal value conforming to a JSON schema; enums take the option closest to the query."""
+    if "enum" in schema:
+        query_words = set(tokenize(query))
+        return max(schema["enum"], key=lambda option: len(query_words & set(tokenize(str(option)))))
+    if "anyOf" in schema:
+        return value_from_schema(schema["anyOf"][0], query)
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "string")
+    if kind == "object":
+        return {name: value_from_schema(sub, query) for name, sub in (schema.get("properties") or {}).items()}
+    if kind == "array":
+        return [value_from_schema(schema.get("items") or {}, query)]
+    if kind == "boolean":
+        return True
+    if kind in ("integer", "number"):
+        return schema.get("default", 0)
+    return query
+
+
+def resolve_refs(schema: Any, definitions: Dict[str, Any]) -> Any:
+    if isinstance(schema, dict):
+        if "$ref" in schema:
+            return resolve_refs(definitions.get(schema["$ref"].split("/")[-1], {}), definitions)
+        return {key: resolve_refs(value, definitions) for key, value in schema.items()}
+    if isinstance(schema, list):
+        return [resolve_refs(item, definitions) for item in schema]
+    return schema
+
+
+def synthetic_turn(body: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """(answer text, tool call or None) for a chat request."""
+    messages = body.get("messages") or []
+    last_user = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].get("role") == "user"), None)
+    query = message_text(messages[last_user]) if last_user is not None else ""
+    tool_results = [message_text(m) for m in messages[(last_user or 0) + 1:] if m.get("role") == "tool"]
+
+    tools = body.get("tools") or []
+    if tools and not tool_results and body.get("tool_choice") != "none":
+        function = pick_tool(tools, query)
+        if function is not None:
+            return "", {"id": "call_" + hashlib.sha1(f"{query}|{function['name']}".encode()).hexdigest()[:24],
+                        "type": "function",
+                        "function": {"name": function["name"],
+                                     "arguments": json.dumps(tool_arguments(function, query))}}
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format.get("json_schema", {}).get("schema") or {}
+        schema = resolve_refs(schema, schema.get("$defs") or schema.get("definitions") or {})
+        return json.dumps(value_from_schema(schema, query)), None
+    if response_format.get("type") == "json_object":
+        return json.dumps({"answer": query}), None
+
+    if tool_results:
+        quoted = " ".join(" ".join(tool_results).split()[:MAX_QUOTED_WORDS])
+        return f"Here is what I found: {quoted}", None
+    return f"You asked: {query}. This is a synthetic answer from the local stand-in.", None
+
+
+def usage(body: Dict[str, Any], completion: str) -> Dict[str, int]:
+    prompt_tokens = sum(estimate_tokens(message_text(m)) for m in body.get("messages") or [])
+    completion_tokens = estimate_tokens(completion)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    return {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]}
+
+
+async def synthetic_chat_stream(body: Dict[str, Any], model: str) -> AsyncIterator[str]:
+    content, tool_call = synthetic_turn(body)
+    completion_id = "chatcmpl-" + uuid.uuid4().hex
+    await asyncio.sleep(config.ttft_ms / 1000)
+    yield sse(chunk(completion_id, model, {"role": "assistant", "content": ""}))
+    if tool_call is not None:
+        stats["tool_calls"] += 1
+        yield sse(chunk(completion_id, model, {"tool_calls": [{"index": 0, **tool_call}]}))
+        finish_reason = "tool_calls"
+        completion_text = tool_call["function"]["arguments"]
+    else:
+        interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        for i, piece in enumerate(STREAM_PIECE_PATTERN.findall(content)):
+            if i and interval:
+                await asyncio.sleep(interval * estimate_tokens(piece))
+            yield sse(chunk(completion_id, model, {"content": piece}))
+        finish_reason = "stop"
+        completion_text = content
+    yield sse(chunk(completion_id, model, {}, finish_reason))
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield sse({"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": model, "choices": [], "usage": usage(body, completion_text)})
+    yield "data: [DONE]\n\n"
+
+
+async def synthetic_chat(body: Dict[str, Any], model: str) -> Dict[str, Any]:
+    content, tool_call = synthetic_turn(body)
+    text = tool_call["function"]["arguments"] if tool_call else content
+    delay = config.ttft_ms / 1000
+    if config.tokens_per_second > 0:
+        delay += max(estimate_tokens(text) - 1, 0) / config.tokens_per_second
+    await asyncio.sleep(delay)
+    message: Dict[str, Any] = {"role": "assistant", "content": content or None}
+    if tool_call is not None:
+        stats["tool_calls"] += 1
+        message["tool_calls"] = [tool_call]
+    return {"id": "chatcmpl-" + uuid.uuid4().hex, "object": "chat.completion", "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "logprobs": None,
+                         "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": usage(body, text)}
+
+
+def sse(data: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+# ---------------------------------------------------------------- record / replay
+
+
+def request_key(kind: str, deployment: str, body: Dict[str, Any]) -> str:
+    canonical = {key: value for key, value in body.items() if key not in VOLATILE_FIELDS}
+    text = json.dumps([kind, deployment, canonical], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded exchanges in a JSONL file, one per line; the first recording of a request wins on replay."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry["key"], entry)
+        self._lock = asyncio.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    async def add(self, entry: Dict[str, Any]) -> None:
+        async with self._lock:
+            self.entries.setdefault(entry["key"], entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        stats["recorded"] += 1
+
+
+cassette: Optional[Cassette] = None
+upstream_client: Optional[httpx.AsyncClient] = None
+
+
+async def replay(entry: Dict[str, Any]) -> Response:
+    stats["replayed"] += 1
+    if not entry.get("stream"):
+        await asyncio.sleep(entry.get("elapsed_ms", 0) / 1000 * config.replay_speed)
+        return Response(entry["body"], status_code=entry["status"], media_type="application/json")
+
+    async def chunks() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        for offset_ms, text in entry["chunks"]:
+            wait = offset_ms / 1000 * config.replay_speed - (time.perf_counter() - started)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield text
+
+    return StreamingResponse(chunks(), status_code=entry["status"], media_type="text/event-stream")
+
+
+async def record(request: Request, body: Dict[str, Any], key: str) -> Response:
+    """Forward the request upstream, stream the answer back and append the exchange to the cassette."""
+    url = config.upstream.rstrip("/") + request.url.path
+    if request.url.query:
+        url += "?" + request.url.query
+    headers = {name: value for name, value in request.headers.items() if name.lower() in FORWARDED_HEADERS}
+    upstream_key = os.getenv("STANDIN_UPSTREAM_API_KEY")
+    if upstream_key:
+        headers.pop("authorization", None)
+        headers["api-key"] = upstream_key
+    entry = {"key": key, "path": request.url.path, "request": body, "stream": bool(body.get("stream"))}
+    started = time.perf_counter()
+    upstream_request = upstream_client.build_request("POST", url, json=body, headers=headers)
+    try:
+        response = await upstream_client.send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        stats["upstream_errors"] += 1
+        return JSONResponse({"error": {"message": f"upstream request failed: {e}"}}, status_code=502)
+    entry["status"] = response.status_code
+
+    if not entry["stream"] or response.status_code >= 400:
+        content = await response.aread()
+        await response.aclose()
+        entry.update(stream=False, body=content.decode("utf-8"), elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+        if response.status_code < 400:
+            await cassette.add(entry)
+        else:
+            stats["upstream_errors"] += 1
+        return Response(content, status_code=response.status_code,
+                        media_type=response.headers.get("content-type", "application/json"),
+                        headers={name: value for name, value in response.headers.items()
+                                 if name.lower() in ("retry-after", "retry-after-ms", "x-ratelimit-remaining-tokens")})
+
+    async def chunks() -> AsyncIterator[str]:
+        recorded: List[Tuple[float, str]] = []
+        try:
+            async for text in response.aiter_text():
+                recorded.append((round((time.perf_counter() - started) * 1000, 1), text))
+                yield text
+        finally:
+            await response.aclose()
+        entry["chunks"] = recorded
+        await cassette.add(entry)
+
+    return StreamingResponse(chunks(), status_code=response.status_code, media_type="text/event-stream")
+
+
+# ---------------------------------------------------------------- routes
+
+
+async def handle(request: Request, kind: str, deployment: Optional[str]) -> Response:
+    body = await request.json()
+    model = deployment or body.get("model") or "standin"
+    stats["chat_requests" if kind == "chat" else "embedding_requests"] += 1
+    key = request_key(kind, model, body)
+    if config.mode == "record":
+        return await record(request, body, key)
+    if config.mode == "replay":
+        entry = cassette.get(key)
+        if entry is not None:
+            return await replay(entry)
+        stats["replay_misses"] += 1
+        if config.on_miss == "error":
+            return JSONResponse({"error": {"code": "NotRecorded", "message": f"no recording for request {key[:12]}"}},
+                                status_code=404)
+    if kind == "embeddings":
+        return JSONResponse(await synthetic_embeddings(body, model))
+    if body.get("stream"):
+        return StreamingResponse(synthetic_chat_stream(body, model), media_type="text/event-stream")
+    return JSONResponse(await synthetic_chat(body, model))
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def azure_chat(deployment: str, request: Request) -> Response:
+    return await handle(request, "chat", deployment)
+
+
+@app.post("/openai/deployments/{deployment}/embeddings")
+async def azure_embeddings(deployment: str, request: Request) -> Response:
+    return await handle(request, "embeddings", deployment)
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request) -> Response:
+    return await handle(request, "chat", None)
+
+
+@app.post("/v1/embeddings")
+async def openai_embeddings(request: Request) -> Response:
+    return await handle(request, "embeddings", None)
+
+
+@app.get("/stats")
+async def get_stats() -> Dict[str, Any]:
+    return {"mode": config.mode, **stats}
+
+
+def configure(args: argparse.Namespace) -> None:
+    global cassette, upstream_client
+    for name in ("mode", "ttft_ms", "tokens_per_second", "embedding_latency_ms", "embedding_dimensions",
+                 "upstream", "cassette", "replay_speed", "on_miss"):
+        setattr(config, name, getattr(args, name))
+    if config.mode in ("record", "replay") and not config.cassette:
+        raise SystemExit(f"--cassette is required in {config.mode} mode")
+    if config.mode == "record" and not config.upstream:
+        raise SystemExit("--upstream is required in record mode")
+    if config.cassette:
+        cassette = Cassette(config.cassette)
+        print(f"Cassette {config.cassette}: {len(cassette.entries)} recorded requests")
+    if config.mode == "record":
+        upstream_client = httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local stand-in for Azure OpenAI chat completions and embeddings.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--mode", choices=("synthetic", "record", "replay"), default="synthetic")
+    parser.add_argument("--ttft-ms", type=float, default=Config.ttft_ms, help="synthetic time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=Config.tokens_per_second,
+                        help="synthetic streaming rate after the first token (0 = no delay)")
+    parser.add_argument("--embedding-latency-ms", type=float, default=Config.embedding_latency_ms)
+    parser.add_argument("--embedding-dimensions", type=int, default=Config.embedding_dimensions)
+    parser.add_argument("--upstream", default=None, help="real endpoint to record from, e.g. https://<resource>.openai.azure.com/")
+    parser.add_argument("--cassette", default=None, help="JSONL file of recorded exchanges")
+    parser.add_argument("--replay-speed", type=float, default=Config.replay_speed,
+                        help="multiplier on recorded timings (0 = as fast as possible)")
+    parser.add_argument("--on-miss", choices=("synthetic", "error"), default=Config.on_miss,
+                        help="replay mode: answer for requests that were not recorded")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure(args)
+    print(f"Azure OpenAI stand-in ({config.mode}) on http://{args.host}:{args.port}/")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
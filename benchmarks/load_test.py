@@ -0,0 +1,278 @@
+"""
+Load generator and latency benchmark for /multi_agent_chat/.
+
+Replays scripted multi-turn conversations (benchmarks/conversations.json; each virtual user
+gets its own conversation_id and sends the turns in order, each after the previous answer has
+finished streaming). Conversations start either from a fixed number of concurrent users
+(closed loop, --concurrency) or at a fixed arrival rate (open loop, Poisson arrivals, --rate).
+
+Per turn it measures, on the client:
+    ttft      time from sending the request to the first byte of the answer
+    total     time until the answer stream ends
+    tokens/s  answer tokens (about 4 characters per token) over the streaming time after the first token
+With --stream-format ndjson the server-side ttft_ms / total_ms of the final event are recorded too.
+
+The summary (p50 / p95 / p99, error rate, throughput) and every turn are written to a JSON file;
+--baseline prints the change against an earlier run.
+
+    python benchmarks/load_test.py --concurrency 8 --conversations-total 40
+    python benchmarks/load_test.py --rate 0.5 --duration 120 --stream-format ndjson --output run2.json --baseline run1.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+CHARS_PER_TOKEN = 4
+this_dir = os.path.dirname(os.path.abspath(__file__))
+default_conversations_path = os.path.join(this_dir, "conversations.json")
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Linear interpolation between closest ranks, like numpy.percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    values = [value for value in values if value is not None]
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4) if values else None,
+        **{f"p{p}": round(percentile(values, p), 4) if values else None for p in (50, 95, 99)},
+        "max": round(max(values), 4) if values else None,
+    }
+
+
+async def send_turn(client: httpx.AsyncClient, url: str, conversation: Dict[str, Any], turn: int,
+                    conversation_id: str, stream_format: str, timeout: float) -> Dict[str, Any]:
+    message = conversation["turns"][turn]
+    payload = {"user_message": message, "conversation_id": conversation_id}
+    if stream_format != "text":
+        payload["stream_format"] = stream_format
+    record: Dict[str, Any] = {
+        "conversation": conversation["name"], "conversation_id": conversation_id, "turn": turn,
+        "started_at": time.time(), "status": None, "error": None,
+        "ttft": None, "total": None, "characters": 0, "tokens": 0, "tokens_per_second": None,
+    }
+    started = time.perf_counter()
+    first_byte = None
+    answer: List[str] = []
+    try:
+        async with client.stream("POST", url, json=payload, timeout=timeout) as response:
+            record["status"] = response.status_code
+            buffer = ""
+            async for text in response.aiter_text():
+                if not text:
+                    continue
+                if first_byte is None:
+                    first_byte = time.perf_counter()
+                if stream_format == "text":
+                    answer.append(text)
+                    continue
+                buffer += text
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    handle_event_line(line, answer, record)
+            if buffer:
+                handle_event_line(buffer, answer, record)
+            if response.status_code >= 400:
+                record["error"] = f"HTTP {response.status_code}"
+    except Exception as e:
+        record["error"] = f"{e.__class__.__name__}: {e}"
+    finished = time.perf_counter()
+
+    text = "".join(answer)
+    record["total"] = finished - started
+    record["ttft"] = (first_byte - started) if first_byte is not None else None
+    record["characters"] = len(text)
+    record["tokens"] = (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    if first_byte is not None and finished > first_byte and record["tokens"]:
+        record["tokens_per_second"] = record["tokens"] / (finished - first_byte)
+    if not record["error"] and not text.strip():
+        record["error"] = "empty answer"
+    return record
+
+
+def handle_event_line(line: str, answer: List[str], record: Dict[str, Any]) -> None:
+    """NDJSON event from the event-stream mode of the chat API."""
+    line = line.strip()
+    if not line:
+        return
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        return
+    if event.get("type") == "token":
+        answer.append(event.get("text", ""))
+    elif event.get("type") == "error":
+        record["error"] = f"server: {event.get('message')}"
+    elif event.get("type") == "final":
+        record["server_ttft"] = event["ttft_ms"] / 1000 if event.get("ttft_ms") is not None else None
+        record["server_total"] = event["total_ms"] / 1000 if event.get("total_ms") is not None else None
+        record["tool_calls"] = event.get("tool_calls")
+
+
+async def run_conversation(client: httpx.AsyncClient, args: argparse.Namespace, conversation: Dict[str, Any],
+                           records: List[Dict[str, Any]]) -> None:
+    conversation_id = str(uuid.uuid4())
+    for turn in range(len(conversation["turns"])):
+        record = await send_turn(client, args.url, conversation, turn, conversation_id, args.stream_format, args.timeout)
+        records.append(record)
+        status = record["error"] or "ok"
+        ttft = f"{record['ttft']:.2f}s" if record["ttft"] is not None else "-"
+        print(f"[{conversation['name']} {conversation_id[:8]} #{turn}] {status} ttft={ttft} total={record['total']:.2f}s")
+        if args.think_time:
+            await asyncio.sleep(args.think_time)
+
+
+def pick_conversation(conversations: List[Dict[str, Any]], index: int, shuffle: bool) -> Dict[str, Any]:
+    return random.choice(conversations) if shuffle else conversations[index % len(conversations)]
+
+
+async def run_closed_loop(client, args, conversations, records) -> None:
+    counter = iter(range(args.conversations_total))
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    async def user() -> None:
+        for index in counter:
+            if deadline and time.perf_counter() > deadline:
+                return
+            await run_conversation(client, args, pick_conversation(conversations, index, args.shuffle), records)
+
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+
+
+async def run_open_loop(client, args, conversations, records) -> None:
+    tasks = []
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    for index in range(args.conversations_total):
+        if deadline and time.perf_counter() > deadline:
+            break
+        tasks.append(asyncio.create_task(
+            run_conversation(client, args, pick_conversation(conversations, index, args.shuffle), records)))
+        # exponential inter-arrival times give Poisson arrivals at the requested rate
+        await asyncio.sleep(random.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+
+
+def summarize(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    ok = [record for record in records if not record["error"]]
+    errors: Dict[str, int] = {}
+    for record in records:
+        if record["error"]:
+            kind = record["error"].split(":")[0]
+            errors[kind] = errors.get(kind, 0) + 1
+    summary = {
+        "turns": len(records),
+        "errors": len(records) - len(ok),
+        "error_rate": round((len(records) - len(ok)) / len(records), 4) if records else 0.0,
+        "errors_by_kind": errors,
+        "elapsed_seconds": round(elapsed, 2),
+        "turns_per_second": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "output_tokens_per_second": round(sum(record["tokens"] for record in ok) / elapsed, 1) if elapsed else 0.0,
+        "ttft_seconds": distribution([record["ttft"] for record in ok]),
+        "total_seconds": distribution([record["total"] for record in ok]),
+        "tokens_per_second": distribution([record["tokens_per_second"] for record in ok]),
+    }
+    if any("server_ttft" in record for record in ok):
+        summary["server_ttft_seconds"] = distribution([record.get("server_ttft") for record in ok])
+        summary["server_total_seconds"] = distribution([record.get("server_total") for record in ok])
+    return summary
+
+
+def print_summary(summary: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    print(f"\n{summary['turns']} turns, {summary['errors']} errors ({summary['error_rate']:.1%}) in {summary['elapsed_seconds']}s, "
+          f"{summary['turns_per_second']} turns/s, {summary['output_tokens_per_second']} output tokens/s")
+    if summary["errors_by_kind"]:
+        print(f"errors: {summary['errors_by_kind']}")
+    header = f"{'metric':<22}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    print(header)
+    for key in ("ttft_seconds", "total_seconds", "tokens_per_second", "server_ttft_seconds", "server_total_seconds"):
+        if key not in summary:
+            continue
+        row = f"{key:<22}" + "".join(f"{_fmt(summary[key][p]):>10}" for p in ("p50", "p95", "p99", "max"))
+        print(row)
+        if baseline and key in baseline:
+            print(f"{'  vs baseline':<22}" + "".join(
+                f"{_change(summary[key][p], baseline[key][p]):>10}" for p in ("p50", "p95", "p99", "max")))
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def _change(value: Optional[float], before: Optional[float]) -> str:
+    if value is None or not before:
+        return "-"
+    return f"{(value - before) / before:+.1%}"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test /multi_agent_chat/ with scripted conversations.")
+    parser.add_argument("--url", default=os.getenv("CHAT_API_URL", "http://localhost:8000/multi_agent_chat/"))
+    parser.add_argument("--conversations", default=default_conversations_path,
+                        help="JSON list of {name, turns: [messages]}")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent virtual users (closed loop)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="conversations started per second (open loop); overrides --concurrency")
+    parser.add_argument("--conversations-total", type=int, default=20, help="conversations to run")
+    parser.add_argument("--duration", type=float, default=None, help="stop starting conversations after this many seconds")
+    parser.add_argument("--shuffle", action="store_true", help="pick conversations at random instead of round robin")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between the turns of a conversation")
+    parser.add_argument("--stream-format", choices=("text", "ndjson"), default="text")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-turn timeout in seconds")
+    parser.add_argument("--output", default=None, help="results file (default benchmarks/results/load_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    with open(args.conversations, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+
+    records: List[Dict[str, Any]] = []
+    limits = httpx.Limits(max_connections=max(args.concurrency, 100), max_keepalive_connections=max(args.concurrency, 20))
+    started = time.perf_counter()
+    async with httpx.AsyncClient(limits=limits) as client:
+        if args.rate:
+            await run_open_loop(client, args, conversations, records)
+        else:
+            await run_closed_loop(client, args, conversations, records)
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(records, elapsed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+    print_summary(summary, baseline)
+
+    output = args.output or os.path.join(this_dir, "results", time.strftime("load_%Y%m%dT%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "summary": summary, "turns": records}, f, indent=2)
+    print(f"Results written to {output}")
+    return summary
+
+
+if __name__ == "__main__":
+    summary = asyncio.run(main())
+    sys.exit(1 if summary["turns"] and summary["error_rate"] == 1 else 0)
@@ -0,0 +1,328 @@
+"""
+Retrieval quality versus latency across search backends.
+
+The golden set (benchmarks/retrieval_golden.json) maps queries to the files in search_docs/ that
+answer them. It is built from the docs: every help / technical article whose file name is a
+question gives one query, its page title; the relevant files are all files with that title (the
+same article saved twice, e.g. help535.txt). A few hand-written paraphrases in the way users ask
+are added, since a title query mostly tests exact word overlap.
+
+Every backend runs every query at every --top-k, and for each (backend, top_k) the suite reports
+recall@k and hit@k (over the distinct files returned), MRR and latency percentiles. The query
+embedding cache is cleared before each run, so vector searches pay for embedding the query.
+
+Backends:
+    local-hybrid      local vector store + BM25, fused with RRF (local_search_helper, LOCAL_SEARCH_MODE=hybrid)
+    local-vector      local vector store only
+    local-bm25        local BM25 index only (no embedding call)
+    cosmos-rrf        cosmosdb_helper.search_with_rrf (query errors are counted as errors, not misses)
+    cosmos-vector     cosmosdb_helper.get_vector_search_results
+    cosmos-fulltext   cosmosdb_helper.get_fulltext_search_results (likewise)
+    aisearch          search_helper.retrieve_search_results
+    module:function   any async function(query, top_k=...) returning results with a fileName
+
+Offline, the local backends run against the Azure OpenAI stand-in (benchmarks/aoai_standin.py);
+their vector store then has to be embedded through the stand-in as well (vector_indexing/data_prep.py).
+
+    python benchmarks/retrieval_benchmark.py build-golden
+    python benchmarks/retrieval_benchmark.py run --backends local-hybrid,local-vector,local-bm25 --top-k 1,3,5,10
+    python benchmarks/retrieval_benchmark.py run --backends cosmos-rrf,aisearch --output cloud.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+this_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.dirname(this_dir)
+# allow running as `python benchmarks/retrieval_benchmark.py` from the repo root
+sys.path.append(repo_dir)
+from load_test import distribution
+
+default_docs_dir = os.path.join(repo_dir, "search_docs")
+default_golden_path = os.path.join(this_dir, "retrieval_golden.json")
+# help center (helpNNN) and technical support (tsNNNN) articles are named after their question
+ARTICLE_SUFFIX = re.compile(r"-(help|ts)\d+$")
+TITLE_SEPARATOR = " | "
+
+# file of the article -> questions about it, phrased the way users ask them
+PARAPHRASES: Dict[str, List[str]] = {
+    "how-do-i-open-a-dispute-with-a-seller-help160.txt": [
+        "how to open dispute PayPal Account", "the seller never shipped my item, what can I do"],
+    "how-do-i-get-a-refund-help100.txt": ["I want my money back for an order"],
+    "i-forgot-my-password-how-do-i-reset-it-help143.txt": ["cannot log in, lost my password"],
+    "what-should-i-do-if-my-paypal-debit-card-is-lost-stolen-or-damaged-help499.txt": ["my debit card was stolen"],
+    "why-was-my-payment-declined-help419.txt": ["my payment got rejected"],
+    "how-do-i-remove-a-limitation-from-my-account-help535.txt": ["my account is limited, how do I fix it"],
+    "why-is-my-withdrawal-being-held-for-review-help395.txt": ["transfer to my bank is stuck in review"],
+    "what-is-an-automatic-payment-and-how-do-i-update-or-cancel-one-help240.txt": ["stop a subscription payment"],
+    "how-do-i-report-potential-fraud-spoof-or-unauthorized-transactions-to-paypal-help165.txt": [
+        "someone used my account without permission"],
+    "how-do-i-change-the-name-on-my-paypal-account-help564.txt": ["update the name on my account after marriage"],
+    "where-can-i-find-test-credit-card-numbers-ts2157.txt": ["sandbox card numbers for testing"],
+    "why-did-i-get-api-error-code-10002-ts1030.txt": ["API error 10002"],
+    "how-do-i-create-and-send-an-invoice-help319.txt": ["bill a customer for my services"],
+}
+
+SearchFunction = Callable[..., Awaitable[List[Any]]]
+
+
+# ---------------------------------------------------------------- golden set
+
+
+def page_title(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        first_line = f.readline()
+    return first_line.split(TITLE_SEPARATOR)[0].strip()
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", title.lower()))
+
+
+def build_golden_set(docs_dir: str) -> List[Dict[str, Any]]:
+    file_names = sorted(name for name in os.listdir(docs_dir) if name.endswith(".txt"))
+    titles = {name: page_title(os.path.join(docs_dir, name)) for name in file_names}
+    files_by_title: Dict[str, List[str]] = defaultdict(list)
+    for name, title in titles.items():
+        files_by_title[normalize_title(title)].append(name)
+
+    golden = []
+    seen_titles = set()
+    for name in file_names:
+        if not ARTICLE_SUFFIX.search(os.path.splitext(name)[0]) or not titles[name]:
+            continue
+        title_key = normalize_title(titles[name])
+        relevant = files_by_title[title_key]
+        # an article saved under two names gives one title query
+        if title_key not in seen_titles:
+            seen_titles.add(title_key)
+            golden.append({"query": titles[name], "relevant": relevant, "source": "title"})
+        for query in PARAPHRASES.get(name, []):
+            golden.append({"query": query, "relevant": relevant, "source": "paraphrase"})
+    return golden
+
+
+# ---------------------------------------------------------------- backends
+
+
+async def local_search(query: str, top_k: int = 5, mode: str = "hybrid") -> List[Any]:
+    from semantic_kernel_framework import bm25_index
+    from semantic_kernel_framework import local_search_helper as helper
+
+    index = helper.get_local_index()
+    if mode == "bm25":
+        return index.to_search_results(helper.get_bm25_index().search(query, top_k=top_k))
+    embedding = (await helper.get_query_embeddings([query]))[0]
+    depth = max(top_k, helper.rrf_candidates) if mode == "hybrid" else top_k
+    vector_hits = index.search(np.asarray(embedding, dtype=np.float32), top_k=depth)
+    if mode == "vector":
+        return index.to_search_results(vector_hits)
+    lexical_hits = helper.get_bm25_index().search(query, top_k=helper.rrf_candidates)
+    return index.to_search_results(bm25_index.rrf_fuse([lexical_hits, vector_hits], top_k=top_k))
+
+
+async def local_hybrid(query: str, top_k: int = 5) -> List[Any]:
+    return await local_search(query, top_k, "hybrid")
+
+
+async def local_vector(query: str, top_k: int = 5) -> List[Any]:
+    return await local_search(query, top_k, "vector")
+
+
+async def local_bm25(query: str, top_k: int = 5) -> List[Any]:
+    return await local_search(query, top_k, "bm25")
+
+
+async def cosmos_rrf(query: str, top_k: int = 5) -> List[Any]:
+    # the helpers log query errors and return no results, which would be scored as misses
+    from semantic_kernel_framework.cosmosdb_helper import search_with_rrf
+    return await search_with_rrf(query, top_k, raise_errors=True)
+
+
+async def cosmos_fulltext(query: str, top_k: int = 5) -> List[Any]:
+    from semantic_kernel_framework.cosmosdb_helper import get_fulltext_search_results
+    return await get_fulltext_search_results(query, top_k, raise_errors=True)
+
+
+BACKENDS: Dict[str, str] = {
+    "local-hybrid": f"{__name__}:local_hybrid",
+    "local-vector": f"{__name__}:local_vector",
+    "local-bm25": f"{__name__}:local_bm25",
+    "cosmos-rrf": f"{__name__}:cosmos_rrf",
+    "cosmos-vector": "semantic_kernel_framework.cosmosdb_helper:get_vector_search_results",
+    "cosmos-fulltext": f"{__name__}:cosmos_fulltext",
+    "aisearch": "semantic_kernel_framework.search_helper:retrieve_search_results",
+}
+# modules whose clients are closed after their backends ran
+CLIENT_MODULES: Dict[str, str] = {
+    f"{__name__}:local_hybrid": "semantic_kernel_framework.local_search_helper",
+    f"{__name__}:local_vector": "semantic_kernel_framework.local_search_helper",
+    f"{__name__}:local_bm25": "semantic_kernel_framework.local_search_helper",
+    f"{__name__}:cosmos_rrf": "semantic_kernel_framework.cosmosdb_helper",
+    f"{__name__}:cosmos_fulltext": "semantic_kernel_framework.cosmosdb_helper",
+}
+
+
+def resolve_backend(name: str) -> Tuple[SearchFunction, str]:
+    """(search function, module to close) for a backend name or a module:function spec."""
+    spec = BACKENDS.get(name, name)
+    if ":" not in spec:
+        raise SystemExit(f"Unknown backend {name!r}; use one of {', '.join(BACKENDS)} or module:function")
+    module_name, function_name = spec.split(":", 1)
+    module = sys.modules[__name__] if module_name == __name__ else importlib.import_module(module_name)
+    return getattr(module, function_name), CLIENT_MODULES.get(spec, module_name)
+
+
+def result_file_names(result: Any) -> List[str]:
+    """The result's file, then the near-duplicate files merged into it, which hold the same article."""
+    if isinstance(result, dict):
+        names = [result.get("fileName"), *(result.get("duplicateFileNames") or [])]
+    else:
+        names = [getattr(result, "fileName", None), *(getattr(result, "duplicateFileNames", None) or [])]
+    return [name for name in names if name]
+
+
+def clear_query_embedding_cache() -> None:
+    from semantic_kernel_framework.embedding_cache import query_embedding_cache
+    query_embedding_cache.clear()
+
+
+# ---------------------------------------------------------------- evaluation
+
+
+def score_query(files: List[Union[str, List[str]]], relevant: List[str], k: int) -> Dict[str, float]:
+    """files in rank order; an entry may be a list of the file names one result stands for."""
+    top = [[entry] if isinstance(entry, str) else entry for entry in files[:k]]
+    found = {name for names in top for name in names} & set(relevant)
+    first = next((rank for rank, names in enumerate(top, start=1) if found & set(names)), None)
+    return {"recall": len(found) / len(relevant), "hit": 1.0 if found else 0.0, "reciprocal_rank": 1 / first if first else 0.0}
+
+
+async def run_backend(name: str, search: SearchFunction, golden: List[Dict[str, Any]], top_k: int,
+                      repeats: int) -> Dict[str, Any]:
+    clear_query_embedding_cache()
+    latencies: List[float] = []
+    scores: Dict[str, List[float]] = defaultdict(list)
+    scores_by_source: Dict[str, List[float]] = defaultdict(list)
+    queries = []
+    errors = 0
+    for item in golden:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            try:
+                results = await search(item["query"], top_k=top_k)
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                errors += 1
+                print(f"[{name} k={top_k}] {item['query']!r} failed: {e}")
+                results = None
+        # distinct files in rank order (chunk-level stores return several passages of one file),
+        # each standing for the near-duplicates merged into it as well
+        names_by_file: Dict[str, List[str]] = {}
+        for names in map(result_file_names, results or []):
+            if names and names[0] not in names_by_file:
+                names_by_file[names[0]] = names
+        files = list(names_by_file)
+        query_scores = score_query(list(names_by_file.values()), item["relevant"], top_k)
+        for key, value in query_scores.items():
+            scores[key].append(value)
+        scores_by_source[item.get("source", "golden")].append(query_scores["recall"])
+        queries.append({"query": item["query"], "files": files, **query_scores})
+
+    return {
+        "backend": name,
+        "top_k": top_k,
+        "queries": len(golden),
+        "errors": errors,
+        "recall": round(float(np.mean(scores["recall"])), 4) if golden else None,
+        "hit_rate": round(float(np.mean(scores["hit"])), 4) if golden else None,
+        "mrr": round(float(np.mean(scores["reciprocal_rank"])), 4) if golden else None,
+        "recall_by_source": {source: round(float(np.mean(values)), 4) for source, values in scores_by_source.items()},
+        "latency_ms": distribution(latencies),
+        "per_query": queries,
+    }
+
+
+def print_table(runs: List[Dict[str, Any]]) -> None:
+    print(f"\n{'backend':<24}{'k':>4}{'recall@k':>10}{'hit@k':>8}{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for run in runs:
+        latency = run["latency_ms"]
+        print(f"{run['backend']:<24}{run['top_k']:>4}{run['recall']:>10.3f}{run['hit_rate']:>8.3f}{run['mrr']:>8.3f}"
+              + "".join(f"{latency[p]:>10.1f}" if latency[p] is not None else f"{'-':>10}" for p in ("p50", "p95", "p99"))
+              + f"{run['errors']:>8}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    with open(args.golden, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    if args.source:
+        golden = [item for item in golden if item.get("source") == args.source]
+    top_ks = [int(k) for k in args.top_k.split(",")]
+    print(f"{len(golden)} golden queries, top_k {top_ks}")
+
+    runs = []
+    modules_to_close = set()
+    try:
+        for name in args.backends.split(","):
+            search, module_name = resolve_backend(name.strip())
+            modules_to_close.add(module_name)
+            # the first call loads indexes and opens connections; it is not measured
+            try:
+                await search(golden[0]["query"], top_k=max(top_ks))
+            except Exception as e:
+                print(f"[{name}] warm-up failed: {e}")
+            for top_k in top_ks:
+                runs.append(await run_backend(name.strip(), search, golden, top_k, args.repeats))
+    finally:
+        for module_name in modules_to_close:
+            close = getattr(sys.modules.get(module_name), "close_clients", None)
+            if close is not None:
+                await close()
+
+    print_table(runs)
+    output = args.output or os.path.join(this_dir, "results", time.strftime("retrieval_%Y%m%dT%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"config": {key: value for key, value in vars(args).items() if key not in ("output", "func")},
+                   "runs": runs}, f, indent=2)
+    print(f"Results written to {output}")
+    return runs
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall / MRR / latency of the retrieval backends on a golden set.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build-golden", help="write the golden set built from search_docs/")
+    build.add_argument("--docs", default=default_docs_dir)
+    build.add_argument("--output", default=default_golden_path)
+
+    bench = commands.add_parser("run", help="run the backends on the golden set")
+    bench.add_argument("--backends", default="local-hybrid,local-vector,local-bm25",
+                       help=f"comma-separated: {', '.join(BACKENDS)} or module:function")
+    bench.add_argument("--top-k", default="1,3,5,10", help="comma-separated top_k values")
+    bench.add_argument("--golden", default=default_golden_path)
+    bench.add_argument("--source", choices=("title", "paraphrase"), default=None, help="only queries of this kind")
+    bench.add_argument("--repeats", type=int, default=1, help="timed calls per query (repeats hit the embedding cache)")
+    bench.add_argument("--output", default=None, help="results file (default benchmarks/results/retrieval_<timestamp>.json)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "build-golden":
+        golden_set = build_golden_set(args.docs)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(golden_set, f, indent=2)
+        print(f"Wrote {len(golden_set)} golden queries to {args.output}")
+    else:
+        asyncio.run(run(args))
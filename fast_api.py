@@ -1,22 +1,99 @@
 import asyncio
+import os
+import time
 import typing
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Iterator, Literal, Optional
 
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from semantic_kernel.contents import (StreamingChatMessageContent,
                                       StreamingTextContent)
 
+from semantic_kernel_framework import metrics
+from semantic_kernel_framework.AgentPlugins import close_search_clients
 from semantic_kernel_framework.AgentSessionManager import \
     MultiAgentSessionManager
-from semantic_kernel_framework.paypal_agent_implementation import MultiAgent
-
-app = FastAPI()
+from semantic_kernel_framework.context_packer import context_packing_stats
+from semantic_kernel_framework.embedding_cache import query_embedding_cache
+from semantic_kernel_framework.paypal_agent_implementation import (
+    MultiAgent, fast_path_router, history_reduction_stats)
+from semantic_kernel_framework.semantic_answer_cache import \
+    semantic_answer_cache
+from semantic_kernel_framework.speculative_retrieval import \
+    speculative_retrieval_stats
+from semantic_kernel_framework.session_store import (SqliteSessionStore,
+                                                     purge_expired_sessions)
+from semantic_kernel_framework.turn_events import (TurnEventStream,
+                                                   current_turn_events,
+                                                   format_ndjson, format_sse)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # stored sessions of conversations that are never continued would otherwise stay in the store forever
+    purge_task = None
+    if session_store is not None and session_store_ttl_seconds > 0:
+        purge_task = asyncio.create_task(
+            purge_expired_sessions(session_store, session_store_ttl_seconds, session_store_purge_interval_seconds))
+    yield
+    if purge_task is not None:
+        purge_task.cancel()
+    # search clients are long-lived and pooled for the whole process; release them on shutdown
+    await close_search_clients()
+    if session_store is not None:
+        session_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # the route template, not the raw path, keeps the label set bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.http_requests.inc(route=path, method=request.method, status=str(status))
+        metrics.http_request_duration.observe(time.perf_counter() - started, route=path, method=request.method)
 
 class ChatRequest(BaseModel):
     user_message: str
     conversation_id: str
+    # "sse" / "ndjson" stream typed events (tokens, handoffs, tool calls, timings) instead of plain text;
+    # also selected by Accept: text/event-stream or application/x-ndjson
+    stream_format: Optional[Literal["text", "sse", "ndjson"]] = None
+
+
+EVENT_STREAM_MEDIA_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def get_stream_format(request: ChatRequest, accept: str) -> str:
+    if request.stream_format:
+        return request.stream_format
+    for stream_format, media_type in EVENT_STREAM_MEDIA_TYPES.items():
+        if media_type in accept:
+            return stream_format
+    return "text"
+
+
+def chunk_texts(chunk) -> Iterator[str]:
+    """Text deltas of one streamed chunk."""
+    if not isinstance(chunk, StreamingChatMessageContent):
+        yield str(chunk)
+        return
+    if chunk.content:
+        yield chunk.content
+    else:
+        for item in chunk.items:
+            if isinstance(item, StreamingTextContent) and item.text:
+                yield item.text
 
 
 @app.get("/")
@@ -29,29 +106,142 @@ def read_item(item_id: int):
 
 
 
+def drop_evicted_session(conversation_id: str, session: MultiAgent, reason: str) -> None:
+    # with a session store the history was saved when the last turn ended and is reloaded on demand
+    print(f"Dropped session {conversation_id} ({reason}) from memory, {len(session.thread)} messages")
+
+
+# Shared across workers / replicas when SESSION_STORE_PATH is set; otherwise sessions are process-local.
+session_store = SqliteSessionStore(os.environ["SESSION_STORE_PATH"]) if os.getenv("SESSION_STORE_PATH") else None
+# stored sessions not updated for this long are deleted (0 = keep them); the purge runs every interval
+session_store_ttl_seconds = float(os.getenv("SESSION_STORE_TTL_SECONDS", "604800"))
+session_store_purge_interval_seconds = float(os.getenv("SESSION_STORE_PURGE_INTERVAL_SECONDS", "3600"))
+
 multi_agent_session_manager: MultiAgentSessionManager[MultiAgent] = (
-    MultiAgentSessionManager(MultiAgent)        # ← factory goes here
+    MultiAgentSessionManager(
+        MultiAgent,        # ← factory goes here
+        max_sessions=int(os.getenv("SESSION_MAX_COUNT", "1000")),
+        idle_ttl_seconds=float(os.getenv("SESSION_IDLE_TTL_SECONDS", "3600")),
+        max_total_bytes=int(os.getenv("SESSION_MAX_TOTAL_BYTES", str(512 * 1024 * 1024))),
+        max_session_bytes=int(os.getenv("SESSION_MAX_BYTES", str(8 * 1024 * 1024))),
+        on_evict=[drop_evicted_session],
+        store=session_store,
+        serialize=MultiAgent.serialize_state,
+        deserialize=MultiAgent.from_state,
+    )
 )
 
 
+@app.get("/status/sessions")
+def read_session_metrics():
+    return multi_agent_session_manager.get_metrics()
+
+
+def session_gauges():
+    session_metrics = multi_agent_session_manager.get_metrics()
+    return {
+        "sessions": {("total",): session_metrics["session_count"], ("active",): session_metrics["active_sessions"]},
+        "bytes": {(): session_metrics["approximate_bytes"]},
+        "events": {
+            ("created",): session_metrics["sessions_created"],
+            ("store_load",): session_metrics["store_loads"],
+            ("store_save",): session_metrics["store_saves"],
+            **{(f"evicted_{reason}",): count for reason, count in session_metrics["evictions"].items()},
+        },
+    }
+
+
+metrics.sessions.set_callback(lambda: session_gauges()["sessions"])
+metrics.session_bytes.set_callback(lambda: session_gauges()["bytes"])
+metrics.session_events.set_callback(lambda: session_gauges()["events"])
+# counters the optimizations already keep, exposed as they are (rates and sizes as gauges)
+metrics.registry.stats_metrics("speculative_retrieval", "Speculative KB prefetch outcomes.", lambda: speculative_retrieval_stats)
+metrics.registry.stats_metrics("context_packing", "Search results and tokens packed into / dropped from tool results.", lambda: context_packing_stats)
+metrics.registry.stats_metrics("history_reduction", "Chat history compactions and tokens saved.", lambda: history_reduction_stats)
+metrics.registry.stats_metrics("fast_path_router", "Fast path routing decisions.", fast_path_router.stats)
+metrics.registry.stats_metrics("semantic_answer_cache", "Semantic answer cache lookups.", semantic_answer_cache.stats)
+metrics.registry.stats_metrics("query_embedding_cache", "Query embedding cache lookups.", query_embedding_cache.stats)
+
+
+@app.get("/metrics")
+def read_metrics():
+    """Prometheus text exposition of the service metrics."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def measure_turn(token_stream, started: float) -> AsyncGenerator:
+    first_chunk = True
+    try:
+        async for chunk in token_stream:
+            if first_chunk:
+                metrics.chat_time_to_first_token.observe(time.perf_counter() - started)
+                first_chunk = False
+            yield chunk
+    except Exception:
+        metrics.chat_turn_errors.inc(stage="stream")
+        raise
+    finally:
+        metrics.chat_turn_duration.observe(time.perf_counter() - started)
+
+
+
+class SessionStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs on_close once it is finished, including when the client
+    disconnected before the body was iterated (the body's own finally never runs then)."""
+
+    def __init__(self, content, on_close: typing.Callable[[], None], **kwargs) -> None:
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
 
 @app.post("/multi_agent_chat/")
-async def multi_agent_chat_with_user(request: ChatRequest):
+async def multi_agent_chat_with_user(request: ChatRequest, http_request: Request):
+    started = time.perf_counter()
+    stream_format = get_stream_format(request, http_request.headers.get("accept", ""))
+    metrics.chat_turns.inc(stream_format=stream_format)
+    # created before the turn starts so that routing / cache events and the timings cover the whole turn
+    turn_events = TurnEventStream() if stream_format != "text" else None
+    if turn_events is not None:
+        current_turn_events.set(turn_events)
+
     sk_multiagent_instance = multi_agent_session_manager.get_or_create_session(conversation_id=request.conversation_id) 
 
 
-    token_stream = await sk_multiagent_instance.start_multi_agent_chat_stream(user_input=request.user_message)
+    try:
+        token_stream = await sk_multiagent_instance.start_multi_agent_chat_stream(user_input=request.user_message)
+    except BaseException:
+        metrics.chat_turn_errors.inc(stage="start")
+        multi_agent_session_manager.release_session(request.conversation_id)
+        raise
+    if token_stream is None:
+        metrics.chat_turn_errors.inc(stage="start")
+    else:
+        token_stream = measure_turn(token_stream, started)
+
     async def stream_tokens():
+        # the turn failed to start: an empty body, like the event stream's error event
+        if token_stream is None:
+            return
         async for chunk in token_stream:
-            if not isinstance(chunk, StreamingChatMessageContent):
-                yield str(chunk)
-                continue
-            if chunk.content:                      
-                yield chunk.content
-            else:                                  
-                for item in chunk.items:
-                    if isinstance(item, StreamingTextContent) and item.text:
-                        yield item.text
-
-    return StreamingResponse(stream_tokens(), media_type="text/plain")
-
+            for text in chunk_texts(chunk):
+                yield text
+
+    async def stream_events():
+        format_event = format_sse if stream_format == "sse" else format_ndjson
+        async for event in turn_events.run(token_stream, chunk_texts):
+            yield format_event(event)
+
+    def end_turn():
+        # the turn is over: the session may be measured and evicted again
+        multi_agent_session_manager.release_session(request.conversation_id)
+
+    if turn_events is not None:
+        return SessionStreamingResponse(stream_events(), on_close=end_turn, media_type=EVENT_STREAM_MEDIA_TYPES[stream_format],
+                                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return SessionStreamingResponse(stream_tokens(), on_close=end_turn, media_type="text/plain")
@@ -4,8 +4,8 @@ from typing import Annotated, List
 
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 
-from semantic_kernel_framework import search_helper, cosmosdb_helper
-from semantic_kernel_framework.user_defined_types import PaypalResult
+from semantic_kernel_framework import search_helper, cosmosdb_helper, local_search_helper, speculative_retrieval, context_packer, metrics
+from semantic_kernel_framework.user_defined_types import PaypalResult, PaypalSearchResult
 
 this_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -39,8 +39,55 @@ class AccountPlugins:
             return "Transaction details not found."
 
 
+SUPPORTED_SEARCH_ENGINES = ["cosmosdb", "azureaisearch", "local"]
+
+
+async def close_search_clients():
+    """Close the pooled async clients of every search backend. Called from the app lifespan."""
+    for helper in (cosmosdb_helper, search_helper, local_search_helper):
+        try:
+            await helper.close_clients()
+        except Exception as e:
+            print(f"Error closing {helper.__name__} clients: {e}")
+
+
+async def search_knowledge_base(search_query: str) -> List[PaypalSearchResult]:
+    """Search the KB with the backend selected by SEARCH_DB_TO_USE."""
+    search_engine = (os.getenv("SEARCH_DB_TO_USE") or "").lower()
+    with metrics.retrieval_duration.time(backend=search_engine):
+        results = await _search_backend(search_engine, search_query)
+    metrics.retrieval_results.observe(len(results), backend=search_engine)
+    return results
+
+
+async def _search_backend(search_engine: str, search_query: str) -> List[PaypalSearchResult]:
+    if search_engine == "cosmosdb":
+        print("Using CosmosDB for search")
+        return await cosmosdb_helper.search_with_rrf(
+            search_query=search_query
+        )
+    elif search_engine == "azureaisearch":
+        print("Using Azure AI Search for search")
+        return await search_helper.retrieve_search_results(
+            search_query=search_query
+        )
+    elif search_engine == "local":
+        print("Using local in-process vector index for search")
+        return await local_search_helper.retrieve_search_results(
+            search_query=search_query
+        )
+    raise ValueError(f"Invalid search engine specified: {search_engine}")
+
+
 class SearchPlugins:
-        
+
+    def __init__(self):
+        # Load the local vector matrix (and BM25 index) at startup so the first query doesn't pay for it.
+        if (os.getenv("SEARCH_DB_TO_USE") or "").lower() == "local":
+            local_search_helper.get_local_index()
+            if local_search_helper.local_search_mode == "hybrid":
+                local_search_helper.get_bm25_index()
+
     @kernel_function(
         name="get_search_results",
         description="Search PayPal KB and return results."
@@ -54,19 +101,13 @@ class SearchPlugins:
         
         try:
             search_engine = os.getenv("SEARCH_DB_TO_USE").lower()
-            if search_engine not in ["cosmosdb", "azureaisearch"]:
-                return f"Invalid search engine specified: {search_engine}. Supported engines are 'cosmosdb' and 'azureaisearch'."
-            if search_engine == "cosmosdb":
-                print("Using CosmosDB for search")
-                
-                results = await cosmosdb_helper.search_with_rrf(
-                    search_query=search_query
-                )
-            elif search_engine == "azureaisearch":
-                print("Using Azure AI Search for search")
-                results = await search_helper.retrieve_search_results(
-                    search_query=search_query
-                )
+            if search_engine not in SUPPORTED_SEARCH_ENGINES:
+                return f"Invalid search engine specified: {search_engine}. Supported engines are 'cosmosdb', 'azureaisearch' and 'local'."
+            results = await speculative_retrieval.serve_prefetched(search_query)
+            if results is None:
+                results = await search_knowledge_base(search_query)
+            # the tool result goes straight into the rag_agent's prompt; keep it within the token budget
+            results, _ = context_packer.pack_search_results(search_query, results)
             return (
                 PaypalResult(
                     search_results=results,
@@ -77,5 +118,3 @@ class SearchPlugins:
         except Exception as e:
             print(f"Error during search: {e}")
             return f"An error occurred while searching"
-        
-
@@ -1,14 +1,216 @@
-from typing import Callable, Dict, Generic, TypeVar
+import asyncio
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+from semantic_kernel_framework.session_store import SessionStore
+
+T = TypeVar("T")
+
+# (conversation_id, session, reason) -> None, or an awaitable for async persistence
+EvictionCallback = Callable[[str, Any, str], Any]
+
+
+class _SessionEntry(Generic[T]):
+    __slots__ = ("session", "last_access", "size_bytes", "active", "version")
+
+    def __init__(self, session: T, version: Optional[int] = None) -> None:
+        self.session = session
+        self.last_access = time.monotonic()
+        self.size_bytes = 0
+        self.active = 0
+        # version of the shared store copy this session was loaded from / last saved as
+        self.version = version
+
+
+def default_size_of(session: Any) -> int:
+    size_of = getattr(session, "approximate_size_bytes", None)
+    return size_of() if callable(size_of) else 0
 
-T = TypeVar("T")  
 
 class MultiAgentSessionManager(Generic[T]):
-    def __init__(self, factory: Callable[[], T]) -> None:
+    """
+    Keeps one session per conversation_id, bounded by count, idle time and approximate memory.
+
+    Sessions are kept in LRU order. On every access, sessions idle for longer than idle_ttl_seconds
+    are evicted, then least recently used sessions are evicted while there are more than max_sessions
+    or more than max_total_bytes in total. A session larger than max_session_bytes is evicted as soon
+    as its turn is released. Sessions with a turn in flight (between get_or_create_session and
+    release_session) are never evicted. Eviction callbacks receive (conversation_id, session, reason)
+    and can persist or drop the session's thread.
+
+    With a shared store (see session_store), every released turn is saved to the store and sessions
+    missing locally, or older locally than in the store, are loaded from it on access. This lets a
+    conversation continue on any worker; the local sessions act as a cache in front of the store.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        max_sessions: Optional[int] = None,
+        idle_ttl_seconds: Optional[float] = None,
+        max_total_bytes: Optional[int] = None,
+        max_session_bytes: Optional[int] = None,
+        size_of: Callable[[T], int] = default_size_of,
+        on_evict: Optional[List[EvictionCallback]] = None,
+        store: Optional[SessionStore] = None,
+        serialize: Optional[Callable[[T], bytes]] = None,
+        deserialize: Optional[Callable[[bytes], T]] = None,
+    ) -> None:
+        if store is not None and (serialize is None or deserialize is None):
+            raise ValueError("A session store needs serialize and deserialize functions")
         self._factory = factory
-        self._sessions: Dict[str, T] = {}
+        self._store = store
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self._sessions: "OrderedDict[str, _SessionEntry[T]]" = OrderedDict()
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self.max_session_bytes = max_session_bytes
+        self._size_of = size_of
+        self._eviction_callbacks: List[EvictionCallback] = list(on_evict or [])
+        self._total_bytes = 0
+        self.sessions_created = 0
+        self.store_loads = 0
+        self.store_saves = 0
+        self.evictions: Dict[str, int] = {"idle": 0, "max_sessions": 0, "max_total_bytes": 0, "max_session_bytes": 0}
+
+    def add_eviction_callback(self, callback: EvictionCallback) -> None:
+        self._eviction_callbacks.append(callback)
 
     def get_or_create_session(self, conversation_id: str) -> T:
-        if conversation_id not in self._sessions:
+        entry = self._sessions.get(conversation_id)
+        if self._store is not None and (entry is None or not entry.active):
+            entry = self._refresh_from_store(conversation_id, entry)
+        if entry is None:
             print(f"session with {conversation_id} not found")
-            self._sessions[conversation_id] = self._factory()
-        return self._sessions[conversation_id]
\ No newline at end of file
+            entry = _SessionEntry(self._factory())
+            self._sessions[conversation_id] = entry
+            self.sessions_created += 1
+        entry.last_access = time.monotonic()
+        entry.active += 1
+        self._sessions.move_to_end(conversation_id)
+        self._enforce_limits()
+        return entry.session
+
+    def release_session(self, conversation_id: str) -> None:
+        """Mark the turn as finished and re-measure the session, whose history has grown."""
+        entry = self._sessions.get(conversation_id)
+        if entry is None:
+            return
+        entry.active = max(0, entry.active - 1)
+        entry.last_access = time.monotonic()
+        self._sessions.move_to_end(conversation_id)
+        self._update_size(entry)
+        if self._store is not None:
+            self._save_to_store(conversation_id, entry)
+        if self.max_session_bytes and entry.active == 0 and entry.size_bytes > self.max_session_bytes:
+            self._evict(conversation_id, "max_session_bytes")
+        self._enforce_limits()
+
+    def _refresh_from_store(self, conversation_id: str, entry: Optional["_SessionEntry[T]"]) -> Optional["_SessionEntry[T]"]:
+        """Load the session from the store if it's missing locally or another worker saved a newer turn."""
+        try:
+            if entry is not None:
+                stored_version = self._store.get_version(conversation_id)
+                if stored_version is None or stored_version == entry.version:
+                    return entry
+            stored = self._store.load(conversation_id)
+            if stored is None:
+                return entry
+            version, data = stored
+            loaded = _SessionEntry(self._deserialize(data), version)
+        except Exception as e:
+            print(f"Failed to load session {conversation_id} from the session store: {e}")
+            return entry
+        if entry is not None:
+            self._total_bytes -= entry.size_bytes
+        self._sessions[conversation_id] = loaded
+        self._update_size(loaded)
+        self.store_loads += 1
+        print(f"Loaded session {conversation_id} (version {version}) from the session store")
+        return loaded
+
+    def _save_to_store(self, conversation_id: str, entry: "_SessionEntry[T]") -> None:
+        try:
+            entry.version = self._store.save(conversation_id, self._serialize(entry.session))
+            self.store_saves += 1
+        except Exception as e:
+            print(f"Failed to save session {conversation_id} to the session store: {e}")
+
+    def remove_session(self, conversation_id: str) -> None:
+        entry = self._sessions.pop(conversation_id, None)
+        if entry is not None:
+            self._total_bytes -= entry.size_bytes
+
+    def _update_size(self, entry: "_SessionEntry[T]") -> None:
+        try:
+            size = self._size_of(entry.session)
+        except Exception as e:
+            print(f"Failed to measure session size: {e}")
+            return
+        self._total_bytes += size - entry.size_bytes
+        entry.size_bytes = size
+
+    def _evict(self, conversation_id: str, reason: str) -> None:
+        entry = self._sessions.pop(conversation_id)
+        self._total_bytes -= entry.size_bytes
+        self.evictions[reason] += 1
+        print(f"Evicting session {conversation_id} ({reason}, ~{entry.size_bytes} bytes)")
+        for callback in self._eviction_callbacks:
+            try:
+                result = callback(conversation_id, entry.session, reason)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                print(f"Session eviction callback failed for {conversation_id}: {e}")
+
+    def _enforce_limits(self) -> None:
+        # Victims are picked oldest-first, skipping sessions in the middle of a turn. Each pass stops
+        # as soon as the limit is met, so the common case only looks at the head of the LRU order.
+        if self.idle_ttl_seconds:
+            now = time.monotonic()
+            victims = []
+            for conversation_id, entry in self._sessions.items():
+                if now - entry.last_access <= self.idle_ttl_seconds:
+                    break
+                if not entry.active:
+                    victims.append(conversation_id)
+            for conversation_id in victims:
+                self._evict(conversation_id, "idle")
+
+        if self.max_sessions is not None and len(self._sessions) > self.max_sessions:
+            excess = len(self._sessions) - self.max_sessions
+            victims = []
+            for conversation_id, entry in self._sessions.items():
+                if len(victims) >= excess:
+                    break
+                if not entry.active:
+                    victims.append(conversation_id)
+            for conversation_id in victims:
+                self._evict(conversation_id, "max_sessions")
+
+        if self.max_total_bytes is not None and self._total_bytes > self.max_total_bytes:
+            excess_bytes = self._total_bytes - self.max_total_bytes
+            victims = []
+            for conversation_id, entry in self._sessions.items():
+                if excess_bytes <= 0:
+                    break
+                if not entry.active:
+                    victims.append(conversation_id)
+                    excess_bytes -= entry.size_bytes
+            for conversation_id in victims:
+                self._evict(conversation_id, "max_total_bytes")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "session_count": len(self._sessions),
+            "active_sessions": sum(1 for entry in self._sessions.values() if entry.active),
+            "approximate_bytes": self._total_bytes,
+            "sessions_created": self.sessions_created,
+            "store_loads": self.store_loads,
+            "store_saves": self.store_saves,
+            "evictions": dict(self.evictions),
+        }
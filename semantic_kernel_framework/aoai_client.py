@@ -0,0 +1,59 @@
+"""
+Azure OpenAI authentication shared by the agents, the retrieval helpers and the loaders.
+
+Requests are authenticated with the Entra ID token provider of the calling module (Azure CLI
+login) unless AZURE_OPENAI_API_KEY is set, in which case the key is sent instead. Either way
+AZURE_OPENAI_ENDPOINT may be a plain-http URL, which is how everything is pointed at the local
+stand-in server (benchmarks/aoai_standin.py):
+
+    AZURE_OPENAI_ENDPOINT=http://localhost:8001/
+    AZURE_OPENAI_API_KEY=local
+
+Configuration (environment):
+    AZURE_OPENAI_ENDPOINT     service endpoint
+    AZURE_OPENAI_API_VERSION  API version
+    AZURE_OPENAI_API_KEY      key authentication instead of Entra ID (unset = Entra ID)
+"""
+import os
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI
+
+load_dotenv()
+
+# stands in for a plain-http endpoint in Semantic Kernel's settings, which only accept https;
+# requests go through the client passed along with it
+_SK_PLACEHOLDER_ENDPOINT = "https://localhost/"
+
+
+def get_api_key() -> Optional[str]:
+    return os.getenv("AZURE_OPENAI_API_KEY") or None
+
+
+def is_plain_http_endpoint(endpoint: Optional[str] = None) -> bool:
+    endpoint = endpoint if endpoint is not None else os.getenv("AZURE_OPENAI_ENDPOINT", "")
+    return endpoint.lower().startswith("http://")
+
+
+def auth_kwargs(token_provider: Callable) -> Dict[str, Any]:
+    """AsyncAzureOpenAI authentication arguments: the API key if one is configured, else the token provider."""
+    api_key = get_api_key()
+    return {"api_key": api_key} if api_key else {"azure_ad_token_provider": token_provider}
+
+
+def create_async_client(token_provider: Callable, **kwargs: Any) -> AsyncAzureOpenAI:
+    return AsyncAzureOpenAI(
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        **auth_kwargs(token_provider),
+        **kwargs,
+    )
+
+
+def sk_service_kwargs(token_provider: Callable) -> Dict[str, Any]:
+    """Authentication / connection arguments for AzureChatCompletion and AzureTextEmbedding."""
+    if is_plain_http_endpoint():
+        return {"async_client": create_async_client(token_provider), "endpoint": _SK_PLACEHOLDER_ENDPOINT}
+    api_key = get_api_key()
+    return {"api_key": api_key} if api_key else {"ad_token_provider": token_provider}
@@ -0,0 +1,177 @@
+"""
+In-process BM25 index over the search docs, and reciprocal rank fusion with the vector index.
+
+The index is an inverted file in CSR layout: for term t (row t of the sorted vocabulary) the
+postings are doc_rows[indptr[t]:indptr[t + 1]] with precomputed BM25 weights (k1 and b baked in),
+so scoring a query is one vectorized scatter-add per query term. Rows are the rows of the vector
+store, which lets the lexical and vector rankings be fused by row.
+
+It is written by data_prep next to the vector store as <base>.bm25.npz:
+
+    python -m semantic_kernel_framework.bm25_index build search_docs_vectors
+    python -m semantic_kernel_framework.bm25_index search search_docs_vectors "close my account"
+"""
+import math
+import re
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from semantic_kernel_framework import vector_store
+
+INDEX_SUFFIX = ".bm25.npz"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its "
+    "me my not of on or our so that the their them then there these they this to was we what "
+    "when where which who why will with you your".split()
+)
+# RRF constant used by Cosmos DB and Azure AI Search
+RRF_K = 60
+
+
+def index_path(base_path: str) -> str:
+    return base_path + INDEX_SUFFIX
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        # light plural folding so "refunds" matches "refund"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of documents, stored as CSR postings."""
+
+    def __init__(self, vocabulary: np.ndarray, indptr: np.ndarray, doc_rows: np.ndarray, weights: np.ndarray,
+                 num_docs: int, k1: float = 1.2, b: float = 0.75) -> None:
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_rows = doc_rows
+        self.weights = weights
+        self.num_docs = num_docs
+        self.k1 = k1
+        self.b = b
+        self._term_ids: Dict[str, int] = {term: i for i, term in enumerate(vocabulary.tolist())}
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        term_freqs: List[Counter] = [Counter(tokenize(text)) for text in texts]
+        num_docs = len(term_freqs)
+        doc_lengths = np.array([sum(tf.values()) for tf in term_freqs], dtype=np.float32)
+        average_length = float(doc_lengths.mean()) if num_docs and doc_lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for row, tf in enumerate(term_freqs):
+            for term, count in tf.items():
+                postings.setdefault(term, []).append((row, count))
+
+        vocabulary = sorted(postings)
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_rows = np.empty(sum(len(p) for p in postings.values()), dtype=np.int32)
+        weights = np.empty(doc_rows.shape[0], dtype=np.float32)
+        position = 0
+        for term_id, term in enumerate(vocabulary):
+            term_postings = postings[term]
+            df = len(term_postings)
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            rows = np.fromiter((row for row, _ in term_postings), dtype=np.int32, count=df)
+            tf = np.fromiter((count for _, count in term_postings), dtype=np.float32, count=df)
+            norm = k1 * (1 - b + b * doc_lengths[rows] / average_length)
+            doc_rows[position:position + df] = rows
+            weights[position:position + df] = idf * tf * (k1 + 1) / (tf + norm)
+            position += df
+            indptr[term_id + 1] = position
+        return cls(np.array(vocabulary, dtype=np.str_), indptr, doc_rows, weights, num_docs, k1, b)
+
+    @classmethod
+    def from_vector_store(cls, base_path: str) -> "BM25Index":
+        store = vector_store.open_vector_store(base_path)
+        try:
+            return cls.build(record.get("content", "") for record in store.iter_records())
+        finally:
+            store.close()
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path if path.endswith(".npz") else path + ".npz",
+            vocabulary=self.vocabulary, indptr=self.indptr, doc_rows=self.doc_rows, weights=self.weights,
+            params=np.array([self.num_docs, self.k1, self.b], dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            num_docs, k1, b = data["params"].tolist()
+            return cls(data["vocabulary"], data["indptr"], data["doc_rows"], data["weights"], int(num_docs), k1, b)
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # a document appears at most once per term, so a fancy-indexed add is safe
+            scores[self.doc_rows[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (row, score) pairs; documents that match no query term are left out."""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if matched.size == 0:
+            return []
+        k = min(top_k, matched.size)
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+def rrf_fuse(rankings: Sequence[Sequence[Tuple[int, float]]], top_k: int = 5, k: int = RRF_K,
+             weights: Optional[Sequence[float]] = None) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion: each ranking adds weight / (k + rank) to its rows; scores are ignored."""
+    fused: Dict[int, float] = {}
+    for i, ranking in enumerate(rankings):
+        weight = weights[i] if weights else 1.0
+        for rank, (row, _) in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])[:top_k]
+
+
+def build_index_for_store(base_path: str) -> BM25Index:
+    start = time.perf_counter()
+    index = BM25Index.from_vector_store(base_path)
+    index.save(index_path(base_path))
+    print(f"Built BM25 index over {len(index)} documents ({len(index.vocabulary)} terms, {index.doc_rows.shape[0]} postings) "
+          f"in {time.perf_counter() - start:.2f}s -> {index_path(base_path)}")
+    return index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "build":
+        build_index_for_store(sys.argv[2])
+    elif len(sys.argv) >= 4 and sys.argv[1] == "search":
+        bm25 = BM25Index.load(index_path(sys.argv[2]))
+        store = vector_store.open_vector_store(sys.argv[2])
+        start = time.perf_counter()
+        hits = bm25.search(sys.argv[3], top_k=5)
+        print(f"{(time.perf_counter() - start) * 1000:.3f} ms")
+        for row, score in hits:
+            print(f"{score:.3f} {store.get_record(row).get('fileName')}")
+        store.close()
+    else:
+        print("usage: python -m semantic_kernel_framework.bm25_index build <store base path>\n"
+              "       python -m semantic_kernel_framework.bm25_index search <store base path> <query>")
@@ -0,0 +1,147 @@
+"""
+Token-budgeted packing of search results before they become the get_search_results tool result.
+
+Retrieval returns up to top_k whole passages (search_helper defaults to 10 full pages), and every
+token of them goes into the rag_agent's prompt. pack_search_results keeps the prompt bounded:
+
+1. duplicates are dropped: the same id, or a passage whose word trigrams mostly coincide with
+   those of a higher-ranked one (Jaccard similarity; the same page indexed twice, mirrored pages),
+2. passages longer than max_passage_tokens are cut down to the window of sentences that
+   shares the most terms with the query,
+3. passages are taken in rank order until the token budget is used up; the one that crosses the
+   budget is trimmed if a useful part of it still fits, the rest are dropped.
+
+Token counts are estimated at about 4 characters per token.
+
+Configuration (environment):
+    SEARCH_CONTEXT_TOKEN_BUDGET         total tokens of passage content per tool result (default 3000, 0 disables packing)
+    SEARCH_CONTEXT_MAX_PASSAGE_TOKENS   longest snippet taken from a single passage (default 800)
+    SEARCH_CONTEXT_DUPLICATE_THRESHOLD  trigram Jaccard similarity at which a passage counts as a duplicate (default 0.8)
+"""
+import os
+import re
+from typing import Dict, List, Set, Tuple
+
+from dotenv import load_dotenv
+
+from semantic_kernel_framework.bm25_index import tokenize
+from semantic_kernel_framework.history_reducer import estimate_tokens
+from semantic_kernel_framework.user_defined_types import PaypalSearchResult
+
+load_dotenv()
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+ELLIPSIS = "…"
+# a trimmed passage shorter than this is not worth its framing
+MIN_PASSAGE_TOKENS = 50
+
+context_packing_stats: Dict[str, int] = {
+    "searches": 0, "results_in": 0, "results_packed": 0, "duplicates_dropped": 0,
+    "results_dropped": 0, "tokens_in": 0, "tokens_packed": 0, "tokens_dropped": 0,
+}
+
+
+def _trigrams(text: str) -> Set[Tuple[str, ...]]:
+    words = text.lower().split()
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def _trim_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max_tokens * 4]
+    # end at a word boundary
+    space = cut.rfind(" ")
+    return (cut[:space] if space > len(cut) // 2 else cut).rstrip() + ELLIPSIS
+
+
+def extract_snippet(query: str, text: str, max_tokens: int) -> str:
+    """The contiguous run of sentences of at most max_tokens that matches the most query terms."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    sentences = [sentence for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+    query_terms = set(tokenize(query))
+    scores = [len(query_terms.intersection(tokenize(sentence))) for sentence in sentences]
+    sizes = [estimate_tokens(sentence) + 1 for sentence in sentences]
+
+    # sliding window over sentences: for each start, extend as far as the budget allows and keep the best score
+    best_start, best_end, best_score = 0, 0, -1
+    end, window_score, window_size = 0, 0, 0
+    for start in range(len(sentences)):
+        while end < len(sentences) and window_size + sizes[end] <= max_tokens:
+            window_score += scores[end]
+            window_size += sizes[end]
+            end += 1
+        if end > start and window_score > best_score:
+            best_start, best_end, best_score = start, end, window_score
+        if end > start:
+            window_score -= scores[start]
+            window_size -= sizes[start]
+        else:
+            end = start + 1
+    if best_end == best_start:
+        # a single sentence longer than the budget
+        return _trim_to_tokens(text, max_tokens)
+
+    snippet = " ".join(sentence.strip() for sentence in sentences[best_start:best_end])
+    if best_start > 0:
+        snippet = ELLIPSIS + snippet
+    if best_end < len(sentences):
+        snippet += ELLIPSIS
+    return snippet
+
+
+def pack_search_results(
+    query: str,
+    results: List[PaypalSearchResult],
+    token_budget: int = None,
+    max_passage_tokens: int = None,
+    duplicate_threshold: float = None,
+) -> Tuple[List[PaypalSearchResult], Dict[str, int]]:
+    """Results (in rank order) whose content fits in token_budget, and a report of what was packed and dropped."""
+    token_budget = int(os.getenv("SEARCH_CONTEXT_TOKEN_BUDGET", "3000")) if token_budget is None else token_budget
+    max_passage_tokens = int(os.getenv("SEARCH_CONTEXT_MAX_PASSAGE_TOKENS", "800")) if max_passage_tokens is None else max_passage_tokens
+    duplicate_threshold = float(os.getenv("SEARCH_CONTEXT_DUPLICATE_THRESHOLD", "0.8")) if duplicate_threshold is None else duplicate_threshold
+
+    tokens_in = sum(estimate_tokens(result.content or "") for result in results)
+    report = {"results_in": len(results), "results_packed": 0, "duplicates_dropped": 0, "results_dropped": 0,
+              "tokens_in": tokens_in, "tokens_packed": 0, "tokens_dropped": 0}
+    if token_budget <= 0:
+        report.update(results_packed=len(results), tokens_packed=tokens_in)
+        return results, report
+
+    packed: List[PaypalSearchResult] = []
+    kept_ids: Set[str] = set()
+    kept_trigrams: List[Set[Tuple[str, ...]]] = []
+    remaining = token_budget
+    for result in results:
+        content = result.content or ""
+        trigrams = _trigrams(content)
+        if result.id in kept_ids or any(
+            len(trigrams & kept) / len(trigrams | kept) >= duplicate_threshold for kept in kept_trigrams
+        ):
+            report["duplicates_dropped"] += 1
+            continue
+        if remaining < MIN_PASSAGE_TOKENS:
+            report["results_dropped"] += 1
+            continue
+
+        snippet = extract_snippet(query, content, min(max_passage_tokens, remaining))
+        if estimate_tokens(snippet) > remaining:
+            snippet = _trim_to_tokens(snippet, remaining)
+        packed.append(result.model_copy(update={"content": snippet}))
+        kept_ids.add(result.id)
+        kept_trigrams.append(trigrams)
+        remaining -= estimate_tokens(snippet)
+
+    report["results_packed"] = len(packed)
+    report["tokens_packed"] = sum(estimate_tokens(result.content or "") for result in packed)
+    report["tokens_dropped"] = tokens_in - report["tokens_packed"]
+
+    context_packing_stats["searches"] += 1
+    for key, value in report.items():
+        context_packing_stats[key] += value
+    print(f"Packed {report['results_packed']}/{report['results_in']} search results: "
+          f"{report['tokens_packed']} tokens kept, {report['tokens_dropped']} dropped "
+          f"({report['duplicates_dropped']} duplicates, budget {token_budget})")
+    return packed, report
@@ -1,43 +1,63 @@
 import asyncio
+import json
 import os
 
-from azure.cosmos import CosmosClient, PartitionKey, exceptions
-from azure.identity import AzureCliCredential, get_bearer_token_provider
+from azure.cosmos import PartitionKey, exceptions
+from azure.cosmos.aio import CosmosClient
+from azure.identity.aio import AzureCliCredential, get_bearer_token_provider
 from dotenv import load_dotenv
-from openai import AzureOpenAI, RateLimitError
+from openai import RateLimitError
+from semantic_kernel_framework.aoai_client import create_async_client
+from semantic_kernel_framework.embedding_cache import query_embedding_cache
 from semantic_kernel_framework.user_defined_types import *
-from typing import List
+from typing import List, Optional
 
 load_dotenv()
 
 print(f"Using Cosmos DB endpoint: {os.getenv('AZURE_COSMOSDB_ENDPOINT')}")
 
-# Initialize the Cosmos client
-client = CosmosClient(os.getenv("AZURE_COSMOSDB_ENDPOINT"), credential=AzureCliCredential())
 database_name = os.getenv("AZURE_COSMOSDB_DBNAME")
 container_name = os.getenv("AZURE_COSMOSDB_CONTAINER_NAME")
-
-client.create_database_if_not_exists(id=database_name)
-# Connect to the database and container
-database = client.get_database_client(database_name)
 embedding_model = "text-embedding-ada-002" 
 
-container = database.get_container_client(container_name)
+# Async clients are created once per process on first use (inside the running event loop)
+# and reused by every search; close_clients() releases their connection pools on shutdown.
 azcli_credential = AzureCliCredential()
 token_provider = get_bearer_token_provider(
     azcli_credential,
     "https://cognitiveservices.azure.com/.default"
 )
 
-aoai_client = AzureOpenAI(
-   api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-   azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-   azure_ad_token_provider=token_provider,   
-)
+aoai_client = create_async_client(token_provider)
+
+client: Optional[CosmosClient] = None
+container = None
+_container_lock = asyncio.Lock()
+
 
-if not container:
-    print(f"Container '{container_name}' does not exist.")
-    exit(1)
+async def get_container():
+    """The shared Cosmos container client, connecting on first use."""
+    global client, container
+    if container is not None:
+        return container
+    async with _container_lock:
+        if container is None:
+            client = CosmosClient(os.getenv("AZURE_COSMOSDB_ENDPOINT"), credential=azcli_credential)
+            await client.create_database_if_not_exists(id=database_name)
+            # Connect to the database and container
+            database = client.get_database_client(database_name)
+            container = database.get_container_client(container_name)
+    return container
+
+
+async def close_clients():
+    global client, container
+    if client is not None:
+        await client.close()
+    client = None
+    container = None
+    await aoai_client.close()
+    await azcli_credential.close()
 
 
 async def generate_embeddings_sync(text_list, model="text-embedding-ada-002"):
@@ -46,7 +66,7 @@ async def generate_embeddings_sync(text_list, model="text-embedding-ada-002"):
         if text_list is None or len(text_list) == 0:
             return []
         #print("embedding model:", model)
-        embeddings = aoai_client.embeddings.create(input=text_list, model=model)
+        embeddings = await aoai_client.embeddings.create(input=text_list, model=model)
         return embeddings.data[0].embedding
     
     except RateLimitError as e:
@@ -58,12 +78,20 @@ async def generate_embeddings_sync(text_list, model="text-embedding-ada-002"):
         print(e)
         raise
 
+async def get_query_embedding(search_query):
+    """Embedding for a search query, served from the shared query-embedding cache when possible."""
+    return await query_embedding_cache.get_or_create(
+        search_query,
+        embedding_model,
+        lambda: generate_embeddings_sync([search_query], model=embedding_model),
+    )
+
 async def get_vector_search_results(search_query, top_k=5, threshold=0.7):
-    embedding_result = await generate_embeddings_sync([search_query], model=embedding_model)
-    search_query_embedded = embedding_result # embedding_result[0].embedding
+    search_query_embedded = await get_query_embedding(search_query)
+    container = await get_container()
     items = container.query_items( 
         query="""
-        SELECT top @top_k c.fileName, c.content, VectorDistance(c.contentVector, @embedding) AS textSimilarityScore 
+        SELECT top @top_k c.fileName, c.duplicateFileNames, c.content, VectorDistance(c.contentVector, @embedding) AS textSimilarityScore 
         FROM c
         WHERE VectorDistance(c.contentVector, @embedding) > @threshold
         ORDER BY VectorDistance(c.contentVector, @embedding) 
@@ -72,31 +100,38 @@ async def get_vector_search_results(search_query, top_k=5, threshold=0.7):
             {"name": "@embedding", "value": search_query_embedded},
             {"name": "@top_k", "value": top_k},
             {"name": "@threshold", "value": threshold}
-        ], 
-        enable_cross_partition_query=True)
-    results = [item for item in items]
+        ])
+    results = [item async for item in items]
     return results
 
     
 
 
-async def get_fulltext_search_results(search_query, top_k=5):
-    #print(search_query_arr)
-    query_string = f"""
-    SELECT TOP {top_k} c.content
-    FROM c
-    ORDER BY RANK FullTextScore(c.content, '{search_query}')
+def full_text_literal(search_query):
+    """
+    The query as a quoted SQL string literal for FullTextScore, which takes its search terms as
+    literals rather than parameters. JSON string escaping is valid Cosmos SQL escaping.
     """
+    return json.dumps(search_query)
 
+
+async def get_fulltext_search_results(search_query, top_k=5, raise_errors=False):
+    """Full-text ranked passages. Errors are logged and give no results unless raise_errors is set."""
+    container = await get_container()
     items = container.query_items(
-        query=query_string,
-        parameters=[],
-        enable_cross_partition_query=True
+        query=f"""
+        SELECT TOP @top_k c.id, c.fileName, c.duplicateFileNames, c.content
+        FROM c
+        ORDER BY RANK FullTextScore(c.content, {full_text_literal(search_query)})
+        """,
+        parameters=[{"name": "@top_k", "value": top_k}]
     )
 
     try:
-        item_files = [item for item in items]
+        item_files = [item async for item in items]
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error in query: {e}")
         item_files = []
 
@@ -105,32 +140,40 @@ async def get_fulltext_search_results(search_query, top_k=5):
 
 
 
-async def search_with_rrf(search_query, top_k=5, threshold=0.7):
-    embedding_result = await generate_embeddings_sync([search_query], model=embedding_model)
-    search_query_embedded = embedding_result  # already a list of floats
+async def search_with_rrf(search_query, top_k=5, threshold=0.7, raise_errors=False):
+    """Full-text and vector ranks fused with RRF. Errors are logged and give no results unless raise_errors is set."""
+    search_query_embedded = await get_query_embedding(search_query)  # already a list of floats
     try:
+        container = await get_container()
         items = container.query_items(
             query=f"""
-            SELECT TOP {top_k} c.fileName, c.content
+            SELECT TOP @top_k c.id, c.fileName, c.duplicateFileNames, c.content, c.parentId, c.chunkIndex
             FROM c
             ORDER BY RANK RRF(
-                FullTextScore(c.content, '{search_query}'),
-                VectorDistance(c.contentVector, {search_query_embedded})
+                FullTextScore(c.content, {full_text_literal(search_query)}),
+                VectorDistance(c.contentVector, @embedding)
             )
             """,
-            parameters=[],
-            enable_cross_partition_query=True
+            parameters=[
+                {"name": "@top_k", "value": top_k},
+                {"name": "@embedding", "value": search_query_embedded},
+            ]
         )
         search_results: List[PaypalSearchResult] = []
-        for item in items:
+        async for item in items:
             single_result = {}
             single_result['id'] = item.get('id', '')
             single_result['fileName'] = item.get('fileName', '')
             single_result['content'] = item.get('content', '')
+            single_result['parentId'] = item.get('parentId')
+            single_result['chunkIndex'] = item.get('chunkIndex')
+            single_result['duplicateFileNames'] = item.get('duplicateFileNames')
             search_results.append(PaypalSearchResult(**single_result))
         return search_results
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error in query: {e}")
         return []
 
@@ -138,10 +181,16 @@ async def search_with_rrf(search_query, top_k=5, threshold=0.7):
 if __name__ == "__main__":
     question = "dispute"
     print(f"Searching for: {question}")
-    
-    #items = asyncio.run(search_with_rrf(question, top_k=5, threshold=0.7))
-    #items = asyncio.run(get_vector_search_results(question, top_k=5, threshold=0.7))
-    items = asyncio.run(get_fulltext_search_results(question, top_k=5))
+
+    async def main():
+        try:
+            #return await search_with_rrf(question, top_k=5, threshold=0.7)
+            #return await get_vector_search_results(question, top_k=5, threshold=0.7)
+            return await get_fulltext_search_results(question, top_k=5)
+        finally:
+            await close_clients()
+
+    items = asyncio.run(main())
 
     for item in items:
         print(item)
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Query-embedding cache shared by the retrieval helpers.
+
+Entries are keyed on the normalized query text plus the embedding deployment, so
+"How do I open a dispute?" and "how do i open a dispute" share one embedding.
+There is an in-memory LRU tier (bounded by entry count and TTL) and an optional
+SQLite tier on disk that survives restarts.
+
+Configuration (environment):
+    EMBEDDING_CACHE_MAX_ENTRIES   in-memory LRU size (default 2048)
+    EMBEDDING_CACHE_TTL_SECONDS   entry lifetime for both tiers (default 86400, 0 = no expiry)
+    EMBEDDING_CACHE_PATH          SQLite file for the persistent tier (unset = memory only)
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_whitespace_re = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _whitespace_re.sub(" ", text).strip()
+    # trailing punctuation does not change what the user is asking for
+    return text.rstrip("?!.¿¡ ").strip()
+
+
+def make_cache_key(text: str, deployment: str) -> str:
+    return hashlib.sha256(f"{deployment}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """In-memory LRU + optional on-disk tier for query embeddings."""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 86400, disk_path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, created REAL, embedding BLOB)"
+            )
+            self._db.commit()
+
+    def _is_expired(self, created: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created > self.ttl_seconds
+
+    def _remember(self, key: str, created: float, embedding: List[float]) -> None:
+        self._entries[key] = (created, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, List[float]]]:
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT created, embedding FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        created, blob = row
+        if self._is_expired(created):
+            self._db.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return created, np.frombuffer(blob, dtype=np.float32).tolist()
+
+    def get(self, text: str, deployment: str) -> Optional[List[float]]:
+        key = make_cache_key(text, deployment)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_expired(entry[0]):
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return entry[1]
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, text: str, deployment: str, embedding: List[float]) -> None:
+        key = make_cache_key(text, deployment)
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, embedding)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, created, embedding) VALUES (?, ?, ?)",
+                    (key, created, np.asarray(embedding, dtype=np.float32).tobytes()),
+                )
+                self._db.commit()
+
+    async def get_or_create(
+        self, text: str, deployment: str, create: Callable[[], Awaitable[List[float]]]
+    ) -> List[float]:
+        """Return the cached embedding, or await create() on a miss and cache its result."""
+        embedding = self.get(text, deployment)
+        if embedding is None:
+            embedding = await create()
+            if embedding:
+                self.put(text, deployment, embedding)
+        return embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+
+query_embedding_cache = EmbeddingCache(
+    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400")),
+    disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+)
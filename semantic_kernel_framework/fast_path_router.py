@@ -0,0 +1,178 @@
+"""
+Deterministic fast path in front of the LLM triage agent.
+
+Every turn normally costs a triage completion, a query_validator_agent completion and
+only then the specialist agent. Obvious turns can skip the first two:
+
+- rules: an account number plus balance wording goes to the account agent, an account
+  number plus transaction wording goes to the transaction agent,
+- embeddings: a question close to one of the generic KB exemplars (disputes, refunds,
+  support) and clearly closer to it than to any off-topic / small talk exemplar goes to
+  the rag agent.
+
+Anything else, including follow-ups that need the conversation to make sense, falls back
+to the triage agent.
+
+Configuration (environment):
+    FAST_PATH_ROUTER_ENABLED    "true" to turn the router on (default off)
+    FAST_PATH_ROUTER_THRESHOLD  minimum cosine similarity to a KB exemplar (default 0.9)
+    FAST_PATH_ROUTER_MARGIN     required lead over the closest off-topic exemplar (default 0.03)
+"""
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from semantic_kernel_framework.semantic_answer_cache import (
+    ACCOUNT_NUMBER_PATTERN, looks_personal)
+
+load_dotenv()
+
+BALANCE_PATTERN = re.compile(
+    r"\b(balance|saldo|credit card|tarjeta de cr[eé]dito|account (details|info(rmation)?)|detalles de (la|mi) cuenta)\b",
+    re.IGNORECASE,
+)
+TRANSACTION_PATTERN = re.compile(
+    r"\b(transactions?|transacci[oó]n(es)?|payment history|historial de pagos|movimientos)\b",
+    re.IGNORECASE,
+)
+# shorter messages are usually follow-ups ("and in Spanish?") that need the conversation
+MIN_EMBEDDING_ROUTE_WORDS = 4
+
+KB_EXEMPLARS = [
+    "How do I open a dispute for a PayPal purchase?",
+    "How can I escalate a dispute to a claim?",
+    "What happens after I file a dispute with PayPal?",
+    "How do I request a refund from a seller?",
+    "How long does it take to receive a PayPal refund?",
+    "How do I issue a refund to a buyer?",
+    "How do I contact PayPal customer support?",
+    "What is PayPal Purchase Protection?",
+    "¿Cómo abro una disputa en PayPal?",
+    "¿Cómo solicito un reembolso?",
+    "¿Cuánto tarda un reembolso de PayPal?",
+    "¿Cómo contacto al soporte de PayPal?",
+]
+
+OFF_TOPIC_EXEMPLARS = [
+    "Hello, how are you today?",
+    "Thanks, that's all for now",
+    "Tell me a joke",
+    "What's the weather like tomorrow?",
+    "Who won the football game last night?",
+    "Write me a poem about the sea",
+    "Hola, ¿qué tal?",
+    "¿Cuál es la capital de Francia?",
+]
+
+
+@dataclass
+class RouteDecision:
+    agent_name: Optional[str]
+    confidence: float
+    reason: str
+
+    @property
+    def is_fast_path(self) -> bool:
+        return self.agent_name is not None
+
+
+class FastPathRouter:
+    """Routes high-confidence turns straight to a specialist agent; returns a fallback decision otherwise."""
+
+    def __init__(
+        self,
+        embed: Callable[[str], Awaitable[List[float]]],
+        account_agent_name: str,
+        transaction_agent_name: str,
+        kb_agent_name: str,
+        threshold: float = 0.9,
+        margin: float = 0.03,
+        kb_exemplars: List[str] = KB_EXEMPLARS,
+        off_topic_exemplars: List[str] = OFF_TOPIC_EXEMPLARS,
+    ) -> None:
+        self._embed = embed
+        self.account_agent_name = account_agent_name
+        self.transaction_agent_name = transaction_agent_name
+        self.kb_agent_name = kb_agent_name
+        self.threshold = threshold
+        self.margin = margin
+        self._kb_exemplars = kb_exemplars
+        self._off_topic_exemplars = off_topic_exemplars
+        self._kb_matrix: Optional[np.ndarray] = None
+        self._off_topic_matrix: Optional[np.ndarray] = None
+        self._warm_up_lock = asyncio.Lock()
+        self.routed: Dict[str, int] = {}
+        self.fallbacks = 0
+
+    async def _embed_matrix(self, texts: List[str]) -> np.ndarray:
+        embeddings = await asyncio.gather(*(self._embed(text) for text in texts))
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    async def _ensure_exemplars(self) -> None:
+        if self._kb_matrix is not None:
+            return
+        async with self._warm_up_lock:
+            if self._kb_matrix is None:
+                self._off_topic_matrix = await self._embed_matrix(self._off_topic_exemplars)
+                self._kb_matrix = await self._embed_matrix(self._kb_exemplars)
+
+    def _route_by_rules(self, query: str) -> Optional[RouteDecision]:
+        if not ACCOUNT_NUMBER_PATTERN.search(query):
+            return None
+        wants_balance = bool(BALANCE_PATTERN.search(query))
+        wants_transactions = bool(TRANSACTION_PATTERN.search(query))
+        # both at once needs two agents, which is the triage agent's job
+        if wants_balance and not wants_transactions:
+            return RouteDecision(self.account_agent_name, 1.0, "account number + balance")
+        if wants_transactions and not wants_balance:
+            return RouteDecision(self.transaction_agent_name, 1.0, "account number + transactions")
+        return None
+
+    async def _route_by_embedding(self, query: str) -> Optional[RouteDecision]:
+        if len(query.split()) < MIN_EMBEDDING_ROUTE_WORDS or looks_personal(query):
+            return None
+        await self._ensure_exemplars()
+        vector = np.asarray(await self._embed(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        kb_score = float(np.max(self._kb_matrix @ vector))
+        off_topic_score = float(np.max(self._off_topic_matrix @ vector))
+        if kb_score >= self.threshold and kb_score - off_topic_score >= self.margin:
+            return RouteDecision(self.kb_agent_name, kb_score, f"KB exemplar {kb_score:.3f} vs off-topic {off_topic_score:.3f}")
+        return None
+
+    async def route(self, query: str) -> RouteDecision:
+        try:
+            decision = self._route_by_rules(query) or await self._route_by_embedding(query)
+        except Exception as e:
+            print(f"Fast path router failed, falling back to triage: {e}")
+            decision = None
+        if decision is None:
+            decision = RouteDecision(None, 0.0, "low confidence")
+            self.fallbacks += 1
+        else:
+            self.routed[decision.agent_name] = self.routed.get(decision.agent_name, 0) + 1
+        stats = self.stats()
+        print(
+            f"Fast path router: {decision.agent_name or 'triage'} ({decision.reason}), "
+            f"hit rate {stats['hit_rate']:.0%} over {stats['decisions']} turns"
+        )
+        return decision
+
+    def stats(self) -> Dict[str, float]:
+        routed = sum(self.routed.values())
+        decisions = routed + self.fallbacks
+        return {
+            "decisions": decisions,
+            "fallbacks": self.fallbacks,
+            "hit_rate": routed / decisions if decisions else 0.0,
+            "routed": dict(self.routed),
+        }
+
+
+fast_path_router_enabled = os.getenv("FAST_PATH_ROUTER_ENABLED", "false").lower() == "true"
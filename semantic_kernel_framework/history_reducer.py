@@ -0,0 +1,185 @@
+"""
+Token-budgeted chat history compaction for the triage agent's ChatHistoryAgentThread.
+
+The triage agent re-sends its whole thread on every turn, including large tool results
+(raw account / transaction JSON, RAG answers). TokenBudgetHistoryReducer is a Semantic
+Kernel ChatHistoryReducer, so `await thread.reduce()` compacts it in place:
+
+1. old tool results (outside the most recent turns) are truncated,
+2. if the history is still over budget, the oldest whole turns are removed and, optionally,
+   folded into a rolling summary message produced by a chat completion service.
+
+Token counts are estimated (about 4 characters per token); they are meant for budgeting
+and reporting, not billing.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+from pydantic import Field
+from semantic_kernel.connectors.ai.chat_completion_client_base import \
+    ChatCompletionClientBase
+from semantic_kernel.connectors.ai.prompt_execution_settings import \
+    PromptExecutionSettings
+from semantic_kernel.contents import (AuthorRole, ChatHistory,
+                                      ChatMessageContent, FunctionCallContent,
+                                      FunctionResultContent)
+from semantic_kernel.contents.history_reducer.chat_history_reducer import \
+    ChatHistoryReducer
+from semantic_kernel.contents.history_reducer.chat_history_reducer_utils import \
+    SUMMARY_METADATA_KEY
+
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+
+SUMMARIZATION_INSTRUCTIONS = """
+Summarize the conversation so far between a PayPal customer and the PayPal support agents in at most 5 sentences.
+Keep account numbers the customer provided, what they asked for, and the answers they were given.
+Include the details of any previous summary. Do not add anything that was not said.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(message: ChatMessageContent) -> int:
+    tokens = TOKENS_PER_MESSAGE + estimate_tokens(message.content or "")
+    for item in message.items or []:
+        if isinstance(item, FunctionResultContent):
+            tokens += estimate_tokens(str(item.result))
+        elif isinstance(item, FunctionCallContent):
+            tokens += estimate_tokens(f"{item.name}{item.arguments or ''}")
+    return tokens
+
+
+def estimate_history_tokens(messages: List[ChatMessageContent]) -> int:
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+class TokenBudgetHistoryReducer(ChatHistoryReducer):
+    """
+    A ChatHistory that keeps itself under max_tokens when reduce() is called.
+
+    Args:
+        max_tokens: Token budget for the whole history.
+        keep_recent_turns: Number of most recent user turns that are never truncated or removed.
+        max_tool_result_chars: Tool results older than the recent turns are cut to this many characters.
+        service: Chat completion service used to summarize removed turns; without it they are dropped.
+    """
+
+    # the base class counts messages; this reducer budgets tokens instead
+    target_count: int = Field(default=1, gt=0)
+    max_tokens: int = Field(default=6000, gt=0)
+    keep_recent_turns: int = Field(default=2, ge=1)
+    max_tool_result_chars: int = Field(default=1500, ge=0)
+    service: Optional[ChatCompletionClientBase] = Field(default=None, exclude=True)
+    summarization_instructions: str = SUMMARIZATION_INSTRUCTIONS
+    # counters, for logging and metrics
+    reductions: int = Field(default=0, exclude=True)
+    tokens_saved_total: int = Field(default=0, exclude=True)
+    last_reduction: Dict[str, Any] = Field(default_factory=dict, exclude=True)
+
+    def _recent_turns_start(self) -> int:
+        """Index of the first message of the protected recent turns."""
+        user_indexes = [i for i, message in enumerate(self.messages) if message.role == AuthorRole.USER]
+        if len(user_indexes) <= self.keep_recent_turns:
+            return 0
+        return user_indexes[-self.keep_recent_turns]
+
+    def _truncate_tool_results(self, end: int) -> int:
+        truncated = 0
+        for message in self.messages[:end]:
+            for item in message.items or []:
+                if not isinstance(item, FunctionResultContent):
+                    continue
+                result = str(item.result)
+                if len(result) > self.max_tool_result_chars:
+                    item.result = f"{result[:self.max_tool_result_chars]}... [truncated {len(result) - self.max_tool_result_chars} chars]"
+                    truncated += 1
+        return truncated
+
+    def _turn_cut_index(self, end: int, tokens_to_free: int) -> int:
+        """Smallest turn boundary (a user message index) before `end` that frees tokens_to_free tokens."""
+        freed = 0
+        cut = 0
+        for i, message in enumerate(self.messages[:end]):
+            # cutting only at user messages keeps each function call with its result
+            if message.role == AuthorRole.USER and i > 0 and freed >= tokens_to_free:
+                return i
+            freed += estimate_message_tokens(message)
+            cut = i + 1
+        return cut if freed >= tokens_to_free else end
+
+    async def _summarize(self, messages: List[ChatMessageContent]) -> Optional[ChatMessageContent]:
+        chat_history = ChatHistory(messages=list(messages))
+        chat_history.add_message(ChatMessageContent(role=AuthorRole.SYSTEM, content=self.summarization_instructions))
+        settings = self.service.get_prompt_execution_settings_from_settings(PromptExecutionSettings())
+        summary = await self.service.get_chat_message_content(chat_history=chat_history, settings=settings)
+        if summary is None or not summary.content:
+            return None
+        return ChatMessageContent(
+            role=AuthorRole.ASSISTANT,
+            content=f"Summary of the earlier conversation: {summary.content}",
+            metadata={SUMMARY_METADATA_KEY: True},
+        )
+
+    async def reduce(self) -> Optional["TokenBudgetHistoryReducer"]:
+        tokens_before = estimate_history_tokens(self.messages)
+        self.last_reduction = {"tokens_before": tokens_before, "tokens_after": tokens_before, "tokens_saved": 0}
+        if tokens_before <= self.max_tokens:
+            return None
+
+        recent_start = self._recent_turns_start()
+        truncated = self._truncate_tool_results(recent_start)
+        tokens = estimate_history_tokens(self.messages)
+
+        removed = 0
+        summarized = False
+        if tokens > self.max_tokens and recent_start > 0:
+            cut = self._turn_cut_index(recent_start, tokens - self.max_tokens)
+            if cut > 0:
+                old_messages = self.messages[:cut]
+                summary = None
+                if self.service is not None:
+                    try:
+                        summary = await self._summarize(old_messages)
+                    except Exception as e:
+                        print(f"History summarization failed, dropping old turns instead: {e}")
+                self.messages = ([summary] if summary else []) + self.messages[cut:]
+                removed = len(old_messages)
+                summarized = summary is not None
+
+        tokens_after = estimate_history_tokens(self.messages)
+        saved = tokens_before - tokens_after
+        self.reductions += 1
+        self.tokens_saved_total += saved
+        self.last_reduction = {
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": saved,
+            "tool_results_truncated": truncated,
+            "messages_removed": removed,
+            "summarized": summarized,
+        }
+        return self if saved > 0 else None
+
+
+def create_history_reducer(
+    service: Optional[ChatCompletionClientBase] = None,
+    messages: Optional[List[ChatMessageContent]] = None,
+) -> TokenBudgetHistoryReducer:
+    """
+    A reducer configured from the environment:
+        CHAT_HISTORY_MAX_TOKENS             token budget (default 6000)
+        CHAT_HISTORY_KEEP_RECENT_TURNS      recent user turns kept verbatim (default 2)
+        CHAT_HISTORY_TOOL_RESULT_MAX_CHARS  size old tool results are cut to (default 1500)
+        CHAT_HISTORY_SUMMARIZE              "true" to fold removed turns into a rolling summary (default false)
+    """
+    summarize = os.getenv("CHAT_HISTORY_SUMMARIZE", "false").lower() == "true"
+    return TokenBudgetHistoryReducer(
+        messages=messages or [],
+        max_tokens=int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "6000")),
+        keep_recent_turns=int(os.getenv("CHAT_HISTORY_KEEP_RECENT_TURNS", "2")),
+        max_tool_result_chars=int(os.getenv("CHAT_HISTORY_TOOL_RESULT_MAX_CHARS", "1500")),
+        service=service if summarize else None,
+    )
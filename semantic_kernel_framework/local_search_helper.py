@@ -0,0 +1,268 @@
+import asyncio
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+from azure.identity.aio import AzureCliCredential, get_bearer_token_provider
+from dotenv import load_dotenv
+from openai import RateLimitError
+from semantic_kernel_framework.aoai_client import create_async_client
+from semantic_kernel_framework import bm25_index, vector_store
+from semantic_kernel_framework.embedding_cache import query_embedding_cache
+from semantic_kernel_framework.user_defined_types import *
+
+load_dotenv()
+
+this_dir = os.path.dirname(os.path.abspath(__file__))
+
+# The binary vector store (search_docs_vectors.npy/.jsonl) is written to the repo root by data_prep or by
+# `vector_store export`; it is not committed, and the legacy .json file is used until it exists.
+# LOCAL_VECTOR_STORE_PATH may point at another store base path or a legacy .json file.
+default_vector_store_path = os.path.abspath(os.path.join(this_dir, "..", "search_docs_vectors"))
+legacy_vector_file_path = os.path.abspath(os.path.join(this_dir, "..", "search_docs_with_vectors.json"))
+vector_file_path = os.getenv("LOCAL_VECTOR_STORE_PATH") or (
+    default_vector_store_path if vector_store.store_exists(default_vector_store_path) else legacy_vector_file_path
+)
+embedding_model = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-ada-002")
+# "hybrid" fuses the vector ranking with the local BM25 ranking (RRF, like cosmosdb_helper.search_with_rrf); "vector" skips BM25
+local_search_mode = (os.getenv("LOCAL_SEARCH_MODE") or "hybrid").lower()
+# how deep each ranking goes before fusion
+rrf_candidates = int(os.getenv("LOCAL_SEARCH_RRF_CANDIDATES", "50"))
+
+azcli_credential = AzureCliCredential()
+token_provider = get_bearer_token_provider(
+    azcli_credential,
+    "https://cognitiveservices.azure.com/.default"
+)
+
+aoai_client = create_async_client(token_provider)
+
+
+class LocalVectorIndex:
+    """Exact cosine search over a float32 matrix of document vectors (in memory or memory-mapped)."""
+
+    def __init__(self, vectors: np.ndarray, get_record: Callable[[int], dict]) -> None:
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a (num_docs, dim) matrix, got {vectors.shape}")
+        # A memory-mapped float32 store is used as-is (zero-copy); anything else becomes one contiguous block.
+        self.matrix = vectors if isinstance(vectors, np.memmap) else np.ascontiguousarray(vectors, dtype=np.float32)
+        # Row norms are precomputed once so cosine similarity is a single product plus a rescale,
+        # without materializing a normalized copy of the matrix.
+        norms = np.linalg.norm(self.matrix, axis=1).astype(np.float32)
+        norms[norms == 0] = 1.0
+        self.inverse_norms = 1.0 / norms
+        self.get_record = get_record
+
+    @classmethod
+    def from_records(cls, records: List[dict], vectors: np.ndarray) -> "LocalVectorIndex":
+        if vectors.shape[0] != len(records):
+            raise ValueError(f"Expected {len(records)} vectors, got {vectors.shape[0]}")
+        return cls(vectors, records.__getitem__)
+
+    @classmethod
+    def from_vector_store(cls, base_path: str) -> "LocalVectorIndex":
+        store = vector_store.open_vector_store(base_path)
+        return cls(store.vectors, store.get_record)
+
+    @classmethod
+    def from_json_file(cls, file_path: str) -> "LocalVectorIndex":
+        records = []
+        rows = []
+        for doc in vector_store.iter_json_documents(file_path):
+            vector = doc.get("contentVector")
+            if not vector:
+                # documents that failed embedding in data prep are not searchable
+                continue
+            records.append({
+                "id": doc.get("id", ""),
+                # data_prep writes "filename", the loaders read "fileName"
+                "fileName": doc.get("fileName") or doc.get("filename", ""),
+                "content": doc.get("content", ""),
+            })
+            rows.append(vector)
+        vectors = np.asarray(rows, dtype=np.float32) if rows else np.zeros((0, 0), dtype=np.float32)
+        return cls.from_records(records, vectors)
+
+    @classmethod
+    def from_path(cls, path: str) -> "LocalVectorIndex":
+        if path.endswith(".json"):
+            return cls.from_json_file(path)
+        return cls.from_vector_store(path)
+
+    @property
+    def dimensions(self) -> int:
+        return self.matrix.shape[1]
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def _normalize_queries(self, query_vectors: np.ndarray) -> np.ndarray:
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if queries.shape[1] != self.dimensions:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dimensions}")
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return queries / norms
+
+    def search_batch(self, query_vectors: np.ndarray, top_k: int = 5) -> List[List[tuple]]:
+        """Top-k (row, score) pairs for each query row, computed as one matrix-matrix product."""
+        if len(self) == 0:
+            return [[] for _ in range(np.atleast_2d(query_vectors).shape[0])]
+        queries = self._normalize_queries(query_vectors)
+        scores = (queries @ self.matrix.T) * self.inverse_norms  # (num_queries, num_docs)
+        k = min(top_k, scores.shape[1])
+        # argpartition is O(n) per row; only the k survivors get sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(int(row), float(score)) for row, score in zip(rows, row_scores)]
+            for rows, row_scores in zip(top, top_scores)
+        ]
+
+    def search(self, query_vector: np.ndarray, top_k: int = 5) -> List[tuple]:
+        """Top-k (row, score) pairs for a single query, computed as one matrix-vector product."""
+        if len(self) == 0:
+            return []
+        query = self._normalize_queries(query_vector)[0]
+        scores = (self.matrix @ query) * self.inverse_norms     # (num_docs,)
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def to_search_results(self, hits: List[tuple]) -> List[PaypalSearchResult]:
+        results = []
+        for row, _ in hits:
+            record = self.get_record(row)
+            results.append(PaypalSearchResult(
+                id=record.get("id", ""),
+                fileName=record.get("fileName", ""),
+                content=record.get("content", ""),
+                parentId=record.get("parentId"),
+                chunkIndex=record.get("chunkIndex"),
+                duplicateFileNames=record.get("duplicateFileNames"),
+            ))
+        return results
+
+
+def source_mtime(path: str) -> int:
+    """Modification time of the vector store (or legacy .json file) the local index is loaded from."""
+    if path.endswith(".json"):
+        return os.stat(path).st_mtime_ns
+    return vector_store.store_mtime(path)
+
+
+_local_index: Optional[LocalVectorIndex] = None
+_local_index_mtime: Optional[int] = None
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Open the vector store once per process and reuse the matrix until data_prep rewrites the store."""
+    global _local_index, _local_index_mtime
+    mtime = source_mtime(vector_file_path)
+    if _local_index is None or mtime != _local_index_mtime:
+        print(f"Loading local vector index from: {vector_file_path}")
+        _local_index = LocalVectorIndex.from_path(vector_file_path)
+        _local_index_mtime = mtime
+        print(f"Loaded {len(_local_index)} vectors of dimension {_local_index.dimensions}")
+    return _local_index
+
+
+_bm25_index: Optional[bm25_index.BM25Index] = None
+_bm25_index_mtime: Optional[int] = None
+
+
+def get_bm25_index() -> bm25_index.BM25Index:
+    """Load the BM25 index written by data_prep, or build it in memory if it is missing or older than the store."""
+    global _bm25_index, _bm25_index_mtime
+    index = get_local_index()
+    if _bm25_index is not None and _bm25_index_mtime == _local_index_mtime:
+        return _bm25_index
+    _bm25_index = None
+    path = bm25_index.index_path(vector_file_path)
+    # a store rewritten with the same number of rows still needs a new index, so the sidecar must be newer
+    if not vector_file_path.endswith(".json") and os.path.exists(path) and os.stat(path).st_mtime_ns >= _local_index_mtime:
+        _bm25_index = bm25_index.BM25Index.load(path)
+    if _bm25_index is None or len(_bm25_index) != len(index):
+        print(f"No up-to-date BM25 index at {path}, building it in memory")
+        _bm25_index = bm25_index.BM25Index.build(index.get_record(row).get("content", "") for row in range(len(index)))
+    _bm25_index_mtime = _local_index_mtime
+    print(f"Loaded BM25 index with {len(_bm25_index.vocabulary)} terms")
+    return _bm25_index
+
+
+def candidate_depth(top_k: int) -> int:
+    return max(top_k, rrf_candidates) if local_search_mode == "hybrid" else top_k
+
+
+def rank(search_query: str, vector_hits: List[tuple], top_k: int) -> List[tuple]:
+    if local_search_mode != "hybrid":
+        return vector_hits[:top_k]
+    lexical_hits = get_bm25_index().search(search_query, top_k=rrf_candidates)
+    return bm25_index.rrf_fuse([lexical_hits, vector_hits], top_k=top_k)
+
+
+async def close_clients():
+    await aoai_client.close()
+    await azcli_credential.close()
+
+
+async def generate_embeddings_sync(text_list, model=embedding_model):
+    try:
+        if text_list is None or len(text_list) == 0:
+            return []
+        embeddings = await aoai_client.embeddings.create(input=text_list, model=model)
+        return [item.embedding for item in embeddings.data]
+
+    except RateLimitError as e:
+        print("Rate limit reached (429 error).")
+        raise
+
+    except Exception as e:
+        print("Error calling OpenAI:" + str(aoai_client.base_url))
+        print(e)
+        raise
+
+
+async def get_query_embeddings(search_queries: List[str]) -> List[List[float]]:
+    """Embeddings for the queries; cache misses are embedded together in one request."""
+    embeddings = [query_embedding_cache.get(query, embedding_model) for query in search_queries]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        created = await generate_embeddings_sync([search_queries[i] for i in missing])
+        for i, embedding in zip(missing, created):
+            query_embedding_cache.put(search_queries[i], embedding_model, embedding)
+            embeddings[i] = embedding
+    return embeddings
+
+
+async def retrieve_search_results(search_query: str, top_k: int = 5) -> List[PaypalSearchResult]:
+    index = get_local_index()
+    embedding_result = await get_query_embeddings([search_query])
+    hits = index.search(np.asarray(embedding_result[0], dtype=np.float32), top_k=candidate_depth(top_k))
+    return index.to_search_results(rank(search_query, hits, top_k))
+
+
+async def retrieve_search_results_batch(search_queries: List[str], top_k: int = 5) -> List[List[PaypalSearchResult]]:
+    """Embed all uncached queries in one request and score them against the corpus in one matrix-matrix product."""
+    index = get_local_index()
+    embedding_result = await get_query_embeddings(search_queries)
+    hits_per_query = index.search_batch(np.asarray(embedding_result, dtype=np.float32), top_k=candidate_depth(top_k))
+    return [index.to_search_results(rank(query, hits, top_k)) for query, hits in zip(search_queries, hits_per_query)]
+
+
+if __name__ == "__main__":
+    search_query = "how to open dispute?"
+
+    async def main():
+        try:
+            return await retrieve_search_results(search_query, top_k=5)
+        finally:
+            await close_clients()
+
+    results = asyncio.run(main())
+    for result in results:
+        print(result.fileName)
@@ -0,0 +1,259 @@
+"""
+Service metrics: request rate, time-to-first-token, per-agent / per-tool latency, retrieval latency,
+sessions.
+
+Every instrument is kept in a small in-process registry that fast_api renders in the Prometheus
+text format on GET /metrics, and is mirrored to an OpenTelemetry instrument of the same name on
+the global meter, so it is also exported by observability_helper.set_up_metrics (which keeps
+instruments named "paypal_cs*" next to the semantic_kernel ones).
+
+Counters and histograms take their labels as keyword arguments:
+
+    chat_turns.inc(stream_format="sse")
+    function_duration.observe(0.42, plugin="rag_agent", function="rag_agent", ok="true")
+
+Gauges and observed counters are read when scraped, from a callback returning {labels tuple: value};
+observed counters are for totals something else already keeps (session manager events, the stats
+dicts of the optimizations), so rate() works on them.
+"""
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
+
+METRIC_PREFIX = "paypal_cs_"
+# seconds; covers cache hits (ms) up to slow multi-agent turns
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+meter = get_meter("paypal_cs")
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = METRIC_PREFIX + name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._otel = meter.create_counter(self.name, description=description)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._otel.add(amount, dict(zip(self.labelnames, key)))
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, unit: str = "s") -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (non-cumulative, last one is +Inf), sum, count]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._otel = meter.create_histogram(self.name, unit=unit, description=description)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+        self._otel.record(value, dict(zip(self.labelnames, key)))
+
+    def time(self, **labels: str) -> "_Timer":
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, labels)
+
+    def _samples(self) -> List[str]:
+        samples = []
+        with self._lock:
+            items = [(key, list(counts), list(totals)) for key, (counts, totals) in self._values.items()]
+        for key, counts, (total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                samples.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            samples.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {int(count)}")
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, ok=str(exc_type is None).lower(), **self.labels)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> None:
+        super().__init__(name, description, labelnames)
+        self.callback = callback
+        self._create_instrument(description)
+
+    def _create_instrument(self, description: str) -> None:
+        meter.create_observable_gauge(self.name, callbacks=[self._observe], description=description)
+
+    def set_callback(self, callback: Callable[[], Dict[LabelValues, float]]) -> None:
+        self.callback = callback
+
+    def _read(self) -> Dict[LabelValues, float]:
+        if self.callback is None:
+            return {}
+        try:
+            return self.callback()
+        except Exception as e:
+            print(f"Failed to read gauge {self.name}: {e}")
+            return {}
+
+    def _observe(self, options: CallbackOptions) -> Iterable[Observation]:
+        return [Observation(value, dict(zip(self.labelnames, key))) for key, value in self._read().items()]
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in self._read().items()]
+
+
+class ObservedCounter(Gauge):
+    """Monotonic total read from a callback when scraped."""
+    kind = "counter"
+
+    def _create_instrument(self, description: str) -> None:
+        meter.create_observable_counter(self.name, callbacks=[self._observe], description=description)
+
+
+# entries of the stats dicts that are not running totals
+STATS_GAUGE_KEYS = ("hit_rate", "local_rate", "entries")
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS, unit: str = "s") -> Histogram:
+        return self.register(Histogram(name, description, labelnames, buckets, unit))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+        return self.register(Gauge(name, description, labelnames, callback))
+
+    def observed_counter(self, name: str, description: str, labelnames: Sequence[str] = (),
+                         callback: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> ObservedCounter:
+        return self.register(ObservedCounter(name, description, labelnames, callback))
+
+    def stats_metrics(self, name: str, description: str, stats: Callable[[], Dict[str, float]],
+                      gauge_keys: Sequence[str] = STATS_GAUGE_KEYS) -> ObservedCounter:
+        """
+        Expose a module's stats dict labelled by key (numeric entries only): the running totals as the
+        counter {name}_total, and gauge_keys (ratios, sizes) as the gauge {name} if the dict has any.
+        """
+        def numeric(gauges: bool) -> Dict[LabelValues, float]:
+            return {
+                (key,): value for key, value in stats().items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and (key in gauge_keys) == gauges
+            }
+
+        if any(key in gauge_keys for key in stats()):
+            self.gauge(name, description, ("key",), lambda: numeric(True))
+        return self.observed_counter(name + "_total", description, ("key",), lambda: numeric(False))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route, method and status code.",
+                                 ("route", "method", "status"))
+http_request_duration = registry.histogram("http_request_duration_seconds",
+                                           "Time until the response headers are sent, by route.", ("route", "method"))
+chat_turns = registry.counter("chat_turns_total", "Chat turns started, by response stream format.", ("stream_format",))
+chat_turn_errors = registry.counter("chat_turn_errors_total", "Chat turns that failed before or while streaming.", ("stage",))
+chat_time_to_first_token = registry.histogram("chat_time_to_first_token_seconds",
+                                              "Server-side time from request to the first answer token.")
+chat_turn_duration = registry.histogram("chat_turn_duration_seconds",
+                                        "Server-side time from request to the end of the answer stream.")
+function_duration = registry.histogram("function_duration_seconds",
+                                       "Kernel function latency; agents exposed as plugins have plugin == function == agent name.",
+                                       ("plugin", "function", "ok"))
+retrieval_duration = registry.histogram("retrieval_duration_seconds", "KB search latency by backend.", ("backend", "ok"))
+retrieval_results = registry.histogram("retrieval_results", "Search results returned per KB search.", ("backend",),
+                                       buckets=(0, 1, 2, 3, 5, 10, 20, 50), unit="1")
+sessions = registry.gauge("sessions", "Sessions held in memory, by state.", ("state",))
+session_bytes = registry.gauge("session_bytes", "Approximate memory held by the in-memory sessions.")
+session_events = registry.observed_counter("session_events_total", "Session manager events (creations, store loads / saves, evictions by reason).", ("event",))
+
+
+async def function_metrics_filter(context, next) -> None:
+    """Function invocation filter that records the latency of every kernel function (agents and tools)."""
+    with function_duration.time(plugin=context.function.plugin_name or "", function=context.function.name):
+        await next(context)
@@ -67,8 +67,10 @@ def set_up_metrics():
         resource=resource,
         views=[
             # Dropping all instrument names except for those starting with "semantic_kernel"
+            # and the service's own metrics (see metrics.py)
             View(instrument_name="*", aggregation=DropAggregation()),
             View(instrument_name="semantic_kernel*"),
+            View(instrument_name="paypal_cs*"),
         ],
     )
     # Sets the global default meter provider
@@ -1,7 +1,10 @@
 import asyncio
-from typing import Any, AsyncGenerator
+import os
+from typing import Any, AsyncGenerator, List, Optional, Set, Tuple
 
-from semantic_kernel_framework.AgentPlugins import AccountPlugins, SearchPlugins
+from semantic_kernel_framework.AgentPlugins import (AccountPlugins,
+                                                    SearchPlugins,
+                                                    search_knowledge_base)
 from azure.identity.aio import (AzureDeveloperCliCredential,
                                 DefaultAzureCredential,
                                 AzureCliCredential,
@@ -10,16 +13,39 @@ from semantic_kernel import Kernel
 from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread
 from semantic_kernel.connectors.ai import FunctionChoiceBehavior
 from semantic_kernel.connectors.ai.open_ai import (
-    AzureChatCompletion, AzureChatPromptExecutionSettings)
+    AzureChatCompletion, AzureChatPromptExecutionSettings, AzureTextEmbedding)
 from semantic_kernel.connectors.ai.prompt_execution_settings import \
     PromptExecutionSettings
-from semantic_kernel.contents import (ChatMessageContent, FunctionCallContent,
+from semantic_kernel.contents import (AuthorRole, ChatHistory,
+                                      ChatMessageContent, FunctionCallContent,
                                       FunctionResultContent)
 from semantic_kernel.filters import FunctionInvocationContext
+from semantic_kernel.functions import KernelPlugin
 from semantic_kernel.prompt_template.prompt_template_config import \
     PromptTemplateConfig
 
+from semantic_kernel_framework.aoai_client import sk_service_kwargs
+from semantic_kernel_framework.embedding_cache import query_embedding_cache
+from semantic_kernel_framework.fast_path_router import (
+    FastPathRouter, RouteDecision, fast_path_router_enabled)
+from semantic_kernel_framework.history_reducer import (SUMMARY_METADATA_KEY,
+                                                       create_history_reducer)
+from semantic_kernel_framework.metrics import function_metrics_filter
+from semantic_kernel_framework.query_validator import (LocalQueryValidator,
+                                                       QueryValidatorPlugin,
+                                                       conversation_context,
+                                                       is_context_dependent,
+                                                       load_blocklist,
+                                                       query_validator_mode)
 from semantic_kernel_framework.observability_helper import set_up_observability
+from semantic_kernel_framework.semantic_answer_cache import (
+    CachedAnswer, looks_personal, semantic_answer_cache, semantic_answer_cache_enabled)
+from semantic_kernel_framework.speculative_retrieval import (
+    SpeculativeSearch, cancel_current, current_prefetch,
+    speculative_match_threshold, speculative_retrieval_enabled)
+from semantic_kernel_framework.turn_events import emit as emit_turn_event
+from semantic_kernel_framework.turn_events import turn_event_filter
+from semantic_kernel_framework.user_defined_types import QueryType
 
 set_up_observability()
 
@@ -43,6 +69,8 @@ QUERY_VALIDATOR_AGENT_SERVICE_ID = "query_validator_agent"
 TRIAGE_AGENT_SERVICE_ID = "triage_agent"
 ACCOUNT_AGENT_SERVICE_ID = "get_account_info_agent"
 TRANSACTION_AGENT_SERVICE_ID = "get_transaction_info_agent"
+HISTORY_SUMMARIZER_SERVICE_ID = "history_summarizer"
+EMBEDDING_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-ada-002")
 
 
 
@@ -51,17 +79,38 @@ def get_azure_chat_completion(service_id) -> AzureChatCompletion:
     Creates an instance of AzureChatCompletion with the necessary credentials.
     """
     return AzureChatCompletion(
-        ad_token_provider=token_provider,
-        service_id=service_id
+        service_id=service_id,
+        **sk_service_kwargs(token_provider),
+    )
+
 
+def get_azure_text_embedding() -> AzureTextEmbedding:
+    """
+    Creates an instance of AzureTextEmbedding with the necessary credentials.
+    """
+    return AzureTextEmbedding(
+        deployment_name=EMBEDDING_DEPLOYMENT_NAME,
+        **sk_service_kwargs(token_provider),
     )
 
 
+text_embedding_service = get_azure_text_embedding()
+
+
+async def embed_query(text: str) -> List[float]:
+    """Query embedding through the shared query-embedding cache."""
+    async def create() -> List[float]:
+        embeddings = await text_embedding_service.generate_embeddings([text])
+        return embeddings[0].tolist()
+
+    return await query_embedding_cache.get_or_create(text, EMBEDDING_DEPLOYMENT_NAME, create)
 
 
 # Define the auto function invocation filter that will be used by the kernel
 async def function_invocation_filter(context: FunctionInvocationContext, next):
     """A filter that will be called for each function call in the response."""
+    if context.function.name in (ACCOUNT_AGENT_SERVICE_ID, TRANSACTION_AGENT_SERVICE_ID):
+        cancel_current(f"routed to {context.function.name}")
     if "messages" not in context.arguments:
         await next(context)
         return
@@ -135,6 +184,29 @@ query_validator_agent = ChatCompletionAgent(
     service=get_azure_chat_completion(service_id=QUERY_VALIDATOR_AGENT_SERVICE_ID),
 )
 
+
+
+async def escalate_query_validation(query: str) -> str:
+    response = await query_validator_agent.get_response(messages=query)
+    return str(response.content)
+
+
+local_query_validator = LocalQueryValidator(
+    embed=embed_query,
+    escalate=escalate_query_validation,
+    min_score=float(os.getenv("QUERY_VALIDATOR_MIN_SCORE", "0.8")),
+    margin=float(os.getenv("QUERY_VALIDATOR_MARGIN", "0.02")),
+    blocklist=load_blocklist(os.getenv("QUERY_VALIDATOR_BLOCKLIST_PATH")),
+)
+
+# the local validator is exposed under the agent's plugin / function name, so the triage
+# instructions and the steps recorded per turn stay the same
+query_validator_plugin = (
+    query_validator_agent
+    if query_validator_mode == "llm"
+    else KernelPlugin.from_object(QUERY_VALIDATOR_AGENT_SERVICE_ID, QueryValidatorPlugin(local_query_validator))
+)
+
 rag_agent = ChatCompletionAgent(
     name="rag_agent",
     prompt_template_config=prompt_template_config,
@@ -184,9 +256,15 @@ triage_agent = ChatCompletionAgent(
         Do not ask clarifying questions, always use the agents to answer the queries.
         """
     ),
-    plugins=[query_validator_agent, rag_agent, get_account_info_agent, get_transaction_info_agent],
+    plugins=[query_validator_plugin, rag_agent, get_account_info_agent, get_transaction_info_agent],
 )
 
+# report every function call of a turn (the agents' own tools included) to the event stream of /multi_agent_chat/
+# and to the per-agent / per-tool latency metrics
+for agent_kernel in {id(agent.kernel): agent.kernel for agent in (triage_agent, rag_agent, get_account_info_agent, get_transaction_info_agent)}.values():
+    agent_kernel.add_filter("function_invocation", turn_event_filter)
+    agent_kernel.add_filter("function_invocation", function_metrics_filter)
+
 async def handle_streaming_intermediate_steps(message: ChatMessageContent) -> None:
     for item in message.items or []:
         if isinstance(item, FunctionCallContent):
@@ -196,18 +274,248 @@ async def handle_streaming_intermediate_steps(message: ChatMessageContent) -> No
         else:
             print(f"{message.role}: {message.content}")
 
-class MultiAgent:
+class TurnSteps:
+    """Records which agents the triage agent delegated to during one turn and how the query was classified."""
+
     def __init__(self):
-        self.thread = ChatHistoryAgentThread()
+        self.called_agents: Set[str] = set()
+        self.query_types: Set[QueryType] = set()
+
+    async def on_intermediate_message(self, message: ChatMessageContent) -> None:
+        await handle_streaming_intermediate_steps(message)
+        for item in message.items or []:
+            if isinstance(item, FunctionCallContent):
+                self.called_agents.add(item.function_name)
+            elif isinstance(item, FunctionResultContent) and item.function_name == QUERY_VALIDATOR_AGENT_SERVICE_ID:
+                result = str(item.result)
+                self.query_types.update(query_type for query_type in QueryType if query_type.value in result)
+
+    def record_fast_path(self, decision: RouteDecision) -> None:
+        """The router skipped the triage and validator agents; a rag_agent route means a generic KB question."""
+        self.called_agents.add(decision.agent_name)
+        if decision.agent_name == RAG_AGENT_SERVICE_ID:
+            self.query_types.add(QueryType.SEARCH_GENERIC)
+
+    @property
+    def is_generic_kb_answer(self) -> bool:
+        """True if the turn was classified Search Generic and answered by the rag_agent alone."""
+        return (
+            self.query_types == {QueryType.SEARCH_GENERIC}
+            and RAG_AGENT_SERVICE_ID in self.called_agents
+            and ACCOUNT_AGENT_SERVICE_ID not in self.called_agents
+            and TRANSACTION_AGENT_SERVICE_ID not in self.called_agents
+        )
+
+
+fast_path_router = FastPathRouter(
+    embed=embed_query,
+    account_agent_name=ACCOUNT_AGENT_SERVICE_ID,
+    transaction_agent_name=TRANSACTION_AGENT_SERVICE_ID,
+    kb_agent_name=RAG_AGENT_SERVICE_ID,
+    threshold=float(os.getenv("FAST_PATH_ROUTER_THRESHOLD", "0.9")),
+    margin=float(os.getenv("FAST_PATH_ROUTER_MARGIN", "0.03")),
+)
+fast_path_agents = {agent.name: agent for agent in (get_account_info_agent, get_transaction_info_agent, rag_agent)}
+
+# only used when CHAT_HISTORY_SUMMARIZE=true, see history_reducer.create_history_reducer
+history_summarizer_service = get_azure_chat_completion(service_id=HISTORY_SUMMARIZER_SERVICE_ID)
+
+# totals across all sessions, for logging
+history_reduction_stats = {"reductions": 0, "tokens_saved": 0}
+
 
+async def replay_cached_answer(answer: str) -> AsyncGenerator[str, Any]:
+    yield answer
+
+
+# rough per-message overhead of ChatMessageContent objects on top of their text
+MESSAGE_OVERHEAD_BYTES = 600
+
+
+class MultiAgent:
+    def __init__(self, thread: Optional[ChatHistoryAgentThread] = None):
+        if thread is None:
+            thread = ChatHistoryAgentThread(chat_history=create_history_reducer(history_summarizer_service))
+        self.thread = thread
+
+    def serialize_state(self) -> bytes:
+        """Compact JSON of the conversation history, for the shared session store."""
+        chat_history = ChatHistory(messages=self.thread._chat_history.messages)
+        return chat_history.model_dump_json(exclude_none=True).encode("utf-8")
+
+    @classmethod
+    def from_state(cls, data: bytes) -> "MultiAgent":
+        messages = ChatHistory.model_validate_json(data).messages
+        return cls(ChatHistoryAgentThread(
+            chat_history=create_history_reducer(history_summarizer_service, messages=messages)
+        ))
+
+    async def compact_history(self) -> None:
+        """Keep the thread within its token budget before it is sent to the triage agent again."""
+        try:
+            await self.thread.reduce()
+        except Exception as e:
+            print("Chat history compaction failed: ", e)
+            return
+        reduction = self.thread._chat_history.last_reduction
+        if reduction.get("tokens_saved"):
+            history_reduction_stats["reductions"] += 1
+            history_reduction_stats["tokens_saved"] += reduction["tokens_saved"]
+            print(
+                f"Compacted chat history: ~{reduction['tokens_before']} -> ~{reduction['tokens_after']} tokens "
+                f"({reduction['tool_results_truncated']} tool results truncated, "
+                f"{reduction['messages_removed']} messages removed, summarized={reduction['summarized']})"
+            )
+
+    def has_user_turns(self) -> bool:
+        """Whether the conversation already has a user message (or a summary of earlier turns)."""
+        return any(message.role == AuthorRole.USER or (message.metadata or {}).get(SUMMARY_METADATA_KEY)
+                   for message in self.thread._chat_history.messages)
+
+    def recent_user_turns(self, limit: int = 3) -> Tuple[str, ...]:
+        """The last user messages (and the summary of older turns, if any), oldest first."""
+        turns = [str(message.content) for message in self.thread._chat_history.messages
+                 if (message.role == AuthorRole.USER or (message.metadata or {}).get(SUMMARY_METADATA_KEY))
+                 and message.content]
+        return tuple(turns[-limit:])
+
+    def approximate_size_bytes(self) -> int:
+        """Approximate memory held by this session, dominated by the chat history text and tool results."""
+        size = 0
+        for message in self.thread._chat_history.messages:
+            size += MESSAGE_OVERHEAD_BYTES + len(message.content or "")
+            for item in message.items or []:
+                if isinstance(item, FunctionResultContent):
+                    size += len(str(item.result))
+                elif isinstance(item, FunctionCallContent):
+                    size += len(str(item.arguments or ""))
+        return size
 
     async def start_multi_agent_chat_stream(self, user_input: str) -> AsyncGenerator[str, Any]:
+        prefetch = None
         try:
-            stream_response = triage_agent.invoke_stream(messages=user_input, 
-                                          thread=self.thread,
-                                          on_intermediate_message=handle_streaming_intermediate_steps)
-            return stream_response
+            await self.compact_history()
+            query_embedding = None
+            # a follow-up depends on the earlier turns, so only the opening question of a conversation
+            # is looked up in (and stored to) the answer cache, which is keyed on the message alone
+            if (semantic_answer_cache_enabled and not self.has_user_turns()
+                    and semantic_answer_cache.is_cacheable_query(user_input)):
+                query_embedding = await self._embed_for_answer_cache(user_input)
+                cached = semantic_answer_cache.lookup(query_embedding) if query_embedding is not None else None
+                if cached:
+                    return await self._replay_cached_answer(user_input, cached)
+            # only after the cache lookup: a cache hit needs no search
+            prefetch = self._start_prefetch(user_input)
+            decision = await self._route(user_input)
+            if query_embedding is not None:
+                stream = self._stream_and_cache_answer(user_input, query_embedding, decision)
+            else:
+                stream = self._invoke_stream(user_input, decision, handle_streaming_intermediate_steps)
+            return self._with_prefetch(prefetch, stream) if prefetch else stream
 
         except Exception as e:
             print("Error in multi agent chat: ", e)
-
+            # no stream will consume the prefetch
+            if prefetch is not None:
+                prefetch.cancel("turn failed")
+                current_prefetch.set(None)
+
+    def _start_prefetch(self, user_input: str) -> Optional[SpeculativeSearch]:
+        """Start the KB search for the raw user message while validation and triage run."""
+        if not speculative_retrieval_enabled or looks_personal(user_input):
+            return None
+        prefetch = SpeculativeSearch(user_input, search_knowledge_base,
+                                     embed=embed_query, match_threshold=speculative_match_threshold)
+        current_prefetch.set(prefetch)
+        return prefetch
+
+    async def _with_prefetch(self, prefetch: SpeculativeSearch, stream: AsyncGenerator[Any, Any]) -> AsyncGenerator[Any, Any]:
+        # the stream may be consumed in another task than the one that started the turn
+        current_prefetch.set(prefetch)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            prefetch.cancel("turn ended")
+            current_prefetch.set(None)
+
+    async def _route(self, user_input: str) -> Optional[RouteDecision]:
+        if not fast_path_router_enabled:
+            return None
+        # the specialists only see this message, so a follow-up needs the triage agent and its thread
+        if self.has_user_turns() and is_context_dependent(user_input):
+            return None
+        decision = await fast_path_router.route(user_input)
+        if not decision.is_fast_path:
+            return None
+        # the fast path skips the validator, so at least keep its offensive / language checks
+        if not local_query_validator.passes_filters(user_input):
+            print("Fast path skipped, query failed the local validation filters")
+            return None
+        # only once the fast path is taken: otherwise the triage agent may still call the rag_agent
+        if decision.agent_name != RAG_AGENT_SERVICE_ID:
+            cancel_current(f"routed to {decision.agent_name}")
+        emit_turn_event("handoff", agent=decision.agent_name, fast_path=True,
+                        confidence=round(decision.confidence, 3), reason=decision.reason)
+        return decision
+
+    def _invoke_stream(self, user_input: str, decision: Optional[RouteDecision],
+                       on_intermediate_message) -> AsyncGenerator[Any, Any]:
+        if decision is not None:
+            return self._stream_fast_path(fast_path_agents[decision.agent_name], user_input, on_intermediate_message)
+        stream = triage_agent.invoke_stream(messages=user_input,
+                                            thread=self.thread,
+                                            on_intermediate_message=on_intermediate_message)
+        return self._with_conversation_context(self.recent_user_turns(), stream)
+
+    async def _with_conversation_context(self, earlier: Tuple[str, ...],
+                                         stream: AsyncGenerator[Any, Any]) -> AsyncGenerator[Any, Any]:
+        # read by the local query validator, which is shared by all sessions
+        conversation_context.set(earlier)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            conversation_context.set(())
+
+    async def _stream_fast_path(self, agent: ChatCompletionAgent, user_input: str,
+                                on_intermediate_message) -> AsyncGenerator[Any, Any]:
+        answer_parts: List[str] = []
+        # the specialist only gets this message, as when the triage agent calls it as a plugin
+        async for chunk in agent.invoke_stream(messages=user_input, on_intermediate_message=on_intermediate_message):
+            answer_parts.append(str(chunk))
+            yield chunk
+        # record the turn in the triage thread so that later turns still have the context
+        await self.thread.on_new_message(ChatMessageContent(role=AuthorRole.USER, content=user_input))
+        await self.thread.on_new_message(
+            ChatMessageContent(role=AuthorRole.ASSISTANT, name=agent.name, content="".join(answer_parts))
+        )
+
+    async def _embed_for_answer_cache(self, user_input: str) -> Optional[List[float]]:
+        try:
+            return await embed_query(user_input)
+        except Exception as e:
+            print("Semantic answer cache unavailable, continuing without it: ", e)
+            return None
+
+    async def _replay_cached_answer(self, user_input: str, cached: CachedAnswer) -> AsyncGenerator[str, Any]:
+        emit_turn_event("cache_hit", cached_query=cached.query)
+        # keep the conversation history identical to a normal turn
+        await self.thread.on_new_message(ChatMessageContent(role=AuthorRole.USER, content=user_input))
+        await self.thread.on_new_message(
+            ChatMessageContent(role=AuthorRole.ASSISTANT, name=triage_agent.name, content=cached.answer)
+        )
+        return replay_cached_answer(cached.answer)
+
+    async def _stream_and_cache_answer(self, user_input: str, query_embedding: List[float],
+                                       decision: Optional[RouteDecision]) -> AsyncGenerator[str, Any]:
+        steps = TurnSteps()
+        if decision is not None:
+            steps.record_fast_path(decision)
+        answer_parts: List[str] = []
+        async for chunk in self._invoke_stream(user_input, decision, steps.on_intermediate_message):
+            answer_parts.append(str(chunk))  # AgentResponseItem -> text of the streamed message
+            yield chunk
+
+        if steps.is_generic_kb_answer:
+            semantic_answer_cache.store(user_input, query_embedding, "".join(answer_parts))
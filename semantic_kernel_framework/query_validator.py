@@ -0,0 +1,308 @@
+"""
+In-process query validation, in place of the query_validator_agent chat completion.
+
+Produces the same Validation_Response the LLM validator describes:
+
+- offensive content: blocklist of terms (English and Spanish, extendable with a file),
+- language: stopword-based identification; only English and Spanish are supported,
+- condensed query: whitespace and greeting / politeness filler removed,
+- query type: nearest centroid of embedded QueryType exemplars, with account numbers and
+  personal wording forced to Search Personal.
+
+Inputs the local checks are unsure about (mixed or unknown language, a query type too
+close to call) are escalated to the LLM validator agent. So are follow-ups that only make sense
+with the earlier turns ("what about business accounts?", "how long does it take?"): the local
+condensing can't resolve them, so the LLM validator gets the earlier user messages of the
+conversation (conversation_context) along with the query.
+
+Configuration (environment):
+    QUERY_VALIDATOR_MODE            "local" (default) or "llm" to always use the validator agent
+    QUERY_VALIDATOR_MIN_SCORE       minimum similarity to the winning centroid (default 0.8)
+    QUERY_VALIDATOR_MARGIN          required lead over the runner-up centroid (default 0.02)
+    QUERY_VALIDATOR_BLOCKLIST_PATH  optional file with extra blocked terms, one per line
+"""
+import asyncio
+import os
+import re
+import unicodedata
+from contextvars import ContextVar
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from semantic_kernel.functions import kernel_function
+
+from semantic_kernel_framework.semantic_answer_cache import looks_personal
+from semantic_kernel_framework.user_defined_types import (
+    CondensedQuery, QueryFilteringResult, QueryType, QueryTypeClassification,
+    Validation_Response)
+
+load_dotenv()
+
+SUPPORTED_LANGUAGES = ("English", "Spanish")
+
+STOPWORDS: Dict[str, set] = {
+    "English": set("the a an is are was were be do does did i my me you your we our it this that what how why when where "
+                   "can could would should will to of for in on with and or not have has from about please".split()),
+    "Spanish": set("el la los las un una es son era fue ser estar está están yo mi mis me tu tus usted nosotros "
+                   "qué que cómo como por para con sin y o no de del al en se lo le su sus mí puedo quiero "
+                   "cuál cuándo dónde favor".split()),
+    "Portuguese": set("o os as um uma é são foi eu meu minha você nós não com sem para por do da dos das no na em "
+                      "como quero posso obrigado".split()),
+    "French": set("le la les un une est sont était je mon ma mes vous nous ne pas avec sans pour par du des au aux "
+                  "dans comment pourquoi quoi est-ce merci".split()),
+    "German": set("der die das ein eine ist sind war ich mein meine sie wir nicht mit ohne für von zu im auf und "
+                  "oder wie warum was bitte kann".split()),
+    "Italian": set("il lo gli un una è sono era io mio mia voi noi non con senza per da del della nel come perché "
+                   "cosa posso grazie".split()),
+}
+SPANISH_MARKERS = re.compile(r"[ñ¿¡áéíóú]", re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:[-'][^\W\d_]+)*", re.UNICODE)
+
+BLOCKLIST = {
+    "fuck", "fucking", "shit", "bitch", "asshole", "bastard", "dickhead", "cunt", "motherfucker",
+    "mierda", "puta", "puto", "pendejo", "cabrón", "cabron", "gilipollas", "joder", "coño", "hijo de puta",
+}
+
+LEADING_FILLER_PATTERN = re.compile(
+    r"^((hi|hello|hey|hola|buenos d[ií]as|buenas tardes|buenas noches|please|por favor)\b[\s,!.]*)+",
+    re.IGNORECASE,
+)
+TRAILING_FILLER_PATTERN = re.compile(r"([\s,]*\b(please|thanks|thank you|por favor|gracias)\b[\s!.?]*)+$", re.IGNORECASE)
+
+# references to something said earlier, or a query that continues the previous one
+CONTEXT_DEPENDENT_PATTERN = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|same|also|too|else|instead|eso|esto|ese|esa|ello|también|otro|otra)\b"
+    r"|^\s*(and|but|what about|how about|y|pero|y si|qué tal)\b",
+    re.IGNORECASE,
+)
+# a query this short is rarely complete on its own in a follow-up turn
+SHORT_QUERY_WORDS = 4
+
+# earlier user messages of the conversation the current turn belongs to, oldest first
+conversation_context: ContextVar[Tuple[str, ...]] = ContextVar("conversation_context", default=())
+
+QUERY_TYPE_EXEMPLARS: Dict[QueryType, List[str]] = {
+    QueryType.SEARCH_GENERIC: [
+        "How do I open a dispute?",
+        "How can I get a refund for my purchase?",
+        "How long does a refund take?",
+        "How do I contact PayPal support?",
+        "What is PayPal Purchase Protection?",
+        "How do I escalate a dispute to a claim?",
+        "¿Cómo abro una disputa?",
+        "¿Cómo puedo pedir un reembolso?",
+    ],
+    QueryType.SEARCH_PERSONAL: [
+        "What is my account balance?",
+        "Show me my last transactions",
+        "What is the credit card balance for account A1234567890?",
+        "List the transactions for my account",
+        "Why was my payment declined?",
+        "¿Cuál es el saldo de mi cuenta?",
+        "Muéstrame mis últimas transacciones",
+    ],
+    QueryType.SMALL_TALK: [
+        "Hello, how are you?",
+        "Thank you, that's all",
+        "Good morning!",
+        "Who are you?",
+        "Hola, ¿qué tal?",
+        "Muchas gracias",
+    ],
+    QueryType.OFF_TOPIC: [
+        "What's the weather like tomorrow?",
+        "Tell me a joke",
+        "Who won the football game last night?",
+        "Write me a poem about the sea",
+        "What is the capital of France?",
+        "¿Quién ganó el partido de fútbol?",
+    ],
+}
+
+
+def load_blocklist(path: Optional[str]) -> set:
+    terms = set(BLOCKLIST)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            terms.update(line.strip().lower() for line in f if line.strip() and not line.startswith("#"))
+    return terms
+
+
+def identify_language(query: str) -> Tuple[Optional[str], bool]:
+    """(language, confident). language is None when nothing identifies it."""
+    letters = [c for c in query if c.isalpha()]
+    if letters and sum(1 for c in letters if "LATIN" not in unicodedata.name(c, "")) > len(letters) / 2:
+        return "Other", True
+
+    words = [word.lower() for word in WORD_PATTERN.findall(query)]
+    scores = {language: sum(1 for word in words if word in stopwords) for language, stopwords in STOPWORDS.items()}
+    if SPANISH_MARKERS.search(query):
+        scores["Spanish"] += 2
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    if best_score == 0:
+        return None, False
+    return best, best_score > second_score
+
+
+def is_context_dependent(query: str) -> bool:
+    return len(WORD_PATTERN.findall(query)) <= SHORT_QUERY_WORDS or bool(CONTEXT_DEPENDENT_PATTERN.search(query))
+
+
+def with_conversation_context(query: str, earlier: Tuple[str, ...]) -> str:
+    """The query prefixed with the earlier user questions, for the LLM validator to condense against."""
+    previous = "\n".join(f"- {message}" for message in earlier)
+    return f"Previous user questions in this conversation:\n{previous}\n\nUser query to validate: {query}"
+
+
+class LocalQueryValidator:
+    """Fills Validation_Response in-process; escalate() is called for inputs it can't decide."""
+
+    def __init__(
+        self,
+        embed: Callable[[str], Awaitable[List[float]]],
+        escalate: Optional[Callable[[str], Awaitable[Any]]] = None,
+        min_score: float = 0.8,
+        margin: float = 0.02,
+        blocklist: Optional[set] = None,
+        exemplars: Dict[QueryType, List[str]] = QUERY_TYPE_EXEMPLARS,
+    ) -> None:
+        self._embed = embed
+        self._escalate = escalate
+        self.min_score = min_score
+        self.margin = margin
+        self._blocklist = blocklist if blocklist is not None else set(BLOCKLIST)
+        self._blocked_phrases = [term for term in self._blocklist if " " in term]
+        self._exemplars = exemplars
+        self._query_types: List[QueryType] = list(exemplars.keys())
+        self._centroids: Optional[np.ndarray] = None
+        self._warm_up_lock = asyncio.Lock()
+        self.local_decisions = 0
+        self.escalations = 0
+
+    async def _ensure_centroids(self) -> None:
+        if self._centroids is not None:
+            return
+        async with self._warm_up_lock:
+            if self._centroids is not None:
+                return
+            centroids = []
+            for query_type in self._query_types:
+                embeddings = await asyncio.gather(*(self._embed(text) for text in self._exemplars[query_type]))
+                matrix = np.asarray(embeddings, dtype=np.float32)
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+                centroid = matrix.mean(axis=0)
+                centroids.append(centroid / np.linalg.norm(centroid))
+            self._centroids = np.stack(centroids)
+
+    def is_offensive(self, query: str) -> bool:
+        text = query.lower()
+        words = set(WORD_PATTERN.findall(text))
+        return bool(words & self._blocklist) or any(phrase in text for phrase in self._blocked_phrases)
+
+    def check_filters(self, query: str) -> Tuple[QueryFilteringResult, Optional[str], bool]:
+        """Offensive / language checks only. Returns (result, language, confident)."""
+        language, confident = identify_language(query)
+        # text without any stopwords ("refund status") is treated as English, like the agents do
+        supported = language is None or language in SUPPORTED_LANGUAGES
+        result = QueryFilteringResult(is_query_offensive=self.is_offensive(query), is_language_supported=supported)
+        return result, language or "English", confident or language is None
+
+    def passes_filters(self, query: str) -> bool:
+        result, _, confident = self.check_filters(query)
+        return confident and result.is_language_supported and not result.is_query_offensive
+
+    @staticmethod
+    def condense(query: str) -> str:
+        condensed = " ".join(query.split())
+        condensed = LEADING_FILLER_PATTERN.sub("", condensed)
+        condensed = TRAILING_FILLER_PATTERN.sub("", condensed).strip()
+        return condensed or " ".join(query.split())
+
+    async def classify(self, query: str) -> Tuple[Optional[QueryType], float]:
+        """(query type, similarity), or (None, similarity) when the top two centroids are too close."""
+        if looks_personal(query):
+            return QueryType.SEARCH_PERSONAL, 1.0
+        await self._ensure_centroids()
+        vector = np.asarray(await self._embed(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        scores = self._centroids @ vector
+        order = np.argsort(scores)[::-1]
+        best, second = float(scores[order[0]]), float(scores[order[1]])
+        if best < self.min_score or best - second < self.margin:
+            return None, best
+        return self._query_types[int(order[0])], best
+
+    async def validate(self, query: str) -> Optional[Validation_Response]:
+        """Validation_Response, or None if the query should go to the LLM validator."""
+        filtering, language, confident = self.check_filters(query)
+        if not confident:
+            return None
+        condensed = self.condense(query)
+        if filtering.is_query_offensive or not filtering.is_language_supported:
+            # the triage agent rejects these whatever their type
+            query_type = QueryType.OFF_TOPIC
+        else:
+            query_type, _ = await self.classify(condensed)
+            if query_type is None:
+                return None
+        return Validation_Response(
+            query_filtering_result=filtering,
+            condensed_query=CondensedQuery(
+                condensed_query=condensed,
+                language=language,
+                is_condensed=condensed != query.strip(),
+            ),
+            query_type_classification=QueryTypeClassification(query_type=query_type),
+        )
+
+    async def validate_or_escalate(self, query: str) -> str:
+        earlier = conversation_context.get()
+        response = None
+        if earlier and is_context_dependent(query):
+            # condense() only strips filler; the follow-up has to be resolved against the earlier turns
+            print(f"Query depends on the conversation, escalating to the LLM validator: {query}")
+        else:
+            try:
+                response = await self.validate(query)
+            except Exception as e:
+                print(f"Local query validation failed, escalating: {e}")
+        if response is not None:
+            self.local_decisions += 1
+            return response.model_dump_json()
+        self.escalations += 1
+        print(f"Query validation escalated to the LLM validator: {query}")
+        if self._escalate is None:
+            raise RuntimeError("Query needs the LLM validator but none is configured")
+        return str(await self._escalate(with_conversation_context(query, earlier) if earlier else query))
+
+    def stats(self) -> Dict[str, float]:
+        total = self.local_decisions + self.escalations
+        return {
+            "local_decisions": self.local_decisions,
+            "escalations": self.escalations,
+            "local_rate": self.local_decisions / total if total else 0.0,
+        }
+
+
+class QueryValidatorPlugin:
+    """Kernel function with the same name and arguments as the query_validator_agent plugin it replaces."""
+
+    def __init__(self, validator: LocalQueryValidator) -> None:
+        self.validator = validator
+
+    @kernel_function(
+        name="query_validator_agent",
+        description="Validates the user query: offensive content, supported language (English or Spanish), "
+                    "condensed query and query type (Off-topic, Small talk, Search Generic, Search Personal).",
+    )
+    async def validate_query(
+        self,
+        messages: Annotated[str | list[str], "The user messages for the agent."],
+    ) -> Annotated[str, "Validation_Response as JSON."]:
+        query = messages if isinstance(messages, str) else " ".join(messages)
+        return await self.validator.validate_or_escalate(query)
+
+
+query_validator_mode = os.getenv("QUERY_VALIDATOR_MODE", "local").lower()
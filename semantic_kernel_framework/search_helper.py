@@ -1,13 +1,17 @@
+import asyncio
 import os
-from typing import List
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from azure.core.credentials import AzureKeyCredential
-from azure.identity import AzureDeveloperCliCredential, DefaultAzureCredential
-from azure.search.documents import SearchClient
-from azure.search.documents.indexes import SearchIndexClient
+from azure.core.exceptions import HttpResponseError
+from azure.identity.aio import AzureDeveloperCliCredential, DefaultAzureCredential
+from azure.search.documents.aio import SearchClient
+from azure.search.documents.indexes.aio import SearchIndexClient
 from azure.search.documents.indexes.models import SearchFieldDataType
 from azure.search.documents.models import VectorizableTextQuery
 from dotenv import load_dotenv
+from semantic_kernel_framework import vector_store
 from semantic_kernel_framework.user_defined_types import *
 
 load_dotenv()
@@ -17,29 +21,162 @@ azure_search_endpoint = os.environ["AZURE_SEARCH_SERVICE_ENDPOINT"]
 #credential = AzureKeyCredential(os.getenv("AZURE_SEARCH_ADMIN_KEY", "")) if len(os.getenv("AZURE_SEARCH_ADMIN_KEY", "")) > 0 else DefaultAzureCredential()
 azure_search_credential = AzureDeveloperCliCredential()
 index_name = os.environ.get("AZURE_SEARCH_INDEX", "some_index")
+schema_ttl_seconds = float(os.getenv("AZURE_SEARCH_SCHEMA_TTL_SECONDS", "3600"))
 
-def get_index_fields(index_name):
-    index_client = SearchIndexClient(
-        endpoint=azure_search_endpoint, credential=azure_search_credential)
-    idx = index_client.get_index(index_name)
+# One long-lived async client per index (plus one index client), created on first use and
+# reused by every search so connections are pooled; close_clients() releases them on shutdown.
+_search_clients: Dict[str, SearchClient] = {}
+_index_client: Optional[SearchIndexClient] = None
+
+
+def get_search_client(index_name: str) -> SearchClient:
+    if index_name not in _search_clients:
+        _search_clients[index_name] = SearchClient(
+            endpoint=azure_search_endpoint, index_name=index_name, credential=azure_search_credential)
+    return _search_clients[index_name]
+
+
+def get_index_client() -> SearchIndexClient:
+    global _index_client
+    if _index_client is None:
+        _index_client = SearchIndexClient(endpoint=azure_search_endpoint, credential=azure_search_credential)
+    return _index_client
+
+
+async def close_clients():
+    global _index_client
+    for search_client in _search_clients.values():
+        await search_client.close()
+    _search_clients.clear()
+    if _index_client is not None:
+        await _index_client.close()
+        _index_client = None
+    await azure_search_credential.close()
+
+
+# field types that map onto PaypalSearchResult values; complex fields and geography points are not selected
+SELECTABLE_FIELD_TYPES = {
+    SearchFieldDataType.String,
+    SearchFieldDataType.Int32,
+    SearchFieldDataType.Int64,
+    SearchFieldDataType.Double,
+    SearchFieldDataType.Boolean,
+    SearchFieldDataType.DateTimeOffset,
+    SearchFieldDataType.Collection(SearchFieldDataType.String),
+}
+
+
+def split_index_fields(fields) -> Tuple[List[str], List[str]]:
+    """Names of the retrievable plain fields to select, and of the vector fields to query."""
     select_fields = []
-    vector_fields =  []
-    for field in idx.fields:
-        #print(field.name)
-        if(field.type == SearchFieldDataType.String):
-            select_fields.append(field.name)
-        if(str.find(field.name, "Vector") > 0):
+    vector_fields = []
+    for field in fields:
+        if field.vector_search_dimensions:
             vector_fields.append(field.name)
+        elif field.type in SELECTABLE_FIELD_TYPES and not field.hidden:
+            select_fields.append(field.name)
     return select_fields, vector_fields
 
 
+async def get_index_fields(index_name):
+    idx = await get_index_client().get_index(index_name)
+    return split_index_fields(idx.fields)
+
+
+class IndexSchemaRegistry:
+    """
+    Caches the select / vector field names of each index so a search doesn't need a get_index round trip.
+    Entries refresh after ttl_seconds (0 = never), when the KB version changes (the loaders bump it after
+    rebuilding the index), or when invalidate() is called.
+    """
+
+    def __init__(
+        self,
+        fetch_fields: Callable[[str], Awaitable[Tuple[List[str], List[str]]]],
+        ttl_seconds: float = 3600,
+        kb_version: Callable[[], str] = vector_store.get_kb_version,
+    ) -> None:
+        self._fetch_fields = fetch_fields
+        self.ttl_seconds = ttl_seconds
+        self._kb_version = kb_version
+        self._current_kb_version = kb_version()
+        self._schemas: Dict[str, Tuple[float, List[str], List[str]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _get_cached(self, index_name: str) -> Optional[Tuple[List[str], List[str]]]:
+        version = self._kb_version()
+        if version != self._current_kb_version:
+            self._current_kb_version = version
+            self.invalidate()
+        entry = self._schemas.get(index_name)
+        if entry is None:
+            return None
+        fetched_at, select_fields, vector_fields = entry
+        if self.ttl_seconds > 0 and time.monotonic() - fetched_at > self.ttl_seconds:
+            return None
+        return select_fields, vector_fields
+
+    async def get_fields(self, index_name: str) -> Tuple[List[str], List[str]]:
+        fields = self._get_cached(index_name)
+        if fields is not None:
+            return fields
+        # one lock per index so concurrent searches trigger a single get_index call
+        lock = self._locks.setdefault(index_name, asyncio.Lock())
+        async with lock:
+            fields = self._get_cached(index_name)
+            if fields is None:
+                select_fields, vector_fields = await self._fetch_fields(index_name)
+                self._schemas[index_name] = (time.monotonic(), select_fields, vector_fields)
+                print(f"Resolved schema for index {index_name}: select={select_fields} vector={vector_fields}")
+                fields = select_fields, vector_fields
+        return fields
+
+    def cached_fields(self, index_name: str) -> List[str]:
+        """Select and vector field names currently cached for the index, even if expired."""
+        entry = self._schemas.get(index_name)
+        return [*entry[1], *entry[2]] if entry else []
+
+    def invalidate(self, index_name: Optional[str] = None) -> None:
+        if index_name is None:
+            self._schemas.clear()
+        else:
+            self._schemas.pop(index_name, None)
+
+
+index_schema_registry = IndexSchemaRegistry(get_index_fields, ttl_seconds=schema_ttl_seconds)
+
+
+def is_stale_schema_error(error: HttpResponseError, fields: List[str]) -> bool:
+    """
+    Whether the search failed because the cached fields no longer match the index: 404 for an index
+    that was deleted / re-created, 400 naming one of the fields ("Could not find a property named 'x'").
+    """
+    if error.status_code == 404:
+        return True
+    message = str(error.message or error)
+    return error.status_code == 400 and any(f"'{field}'" in message for field in fields)
+
+
 async def retrieve_search_results(search_query: str, top_k: int = 10) -> List[PaypalSearchResult]:
-    select_fields, vector_fields = get_index_fields(index_name)  
-    search_client = SearchClient(endpoint=azure_search_endpoint, index_name=index_name, credential=azure_search_credential)
+    try:
+        return await _search_index(index_name, search_query, top_k)
+    except HttpResponseError as e:
+        # throttling, auth and service errors are not fixed by a schema refresh
+        if not is_stale_schema_error(e, index_schema_registry.cached_fields(index_name)):
+            raise
+        # the cached schema may be stale if the index was rebuilt; refresh once and retry
+        print(f"Search on {index_name} failed ({e.status_code}), refreshing index schema and retrying")
+        index_schema_registry.invalidate(index_name)
+        return await _search_index(index_name, search_query, top_k)
+
+
+async def _search_index(index_name: str, search_query: str, top_k: int) -> List[PaypalSearchResult]:
+    select_fields, vector_fields = await index_schema_registry.get_fields(index_name)
+    search_client = get_search_client(index_name)
     #vector_query = VectorizableTextQuery(text=search_query, k_nearest_neighbors=3, fields=search_fields, exhaustive=True)
   
     vector_queries  = [VectorizableTextQuery(text=search_query, k_nearest_neighbors=top_k, fields=field, exhaustive=True) for field in vector_fields]
-    results = search_client.search(  
+    results = await search_client.search(  
         search_text=search_query,  
         vector_queries= vector_queries,
         select=select_fields,
@@ -47,7 +184,7 @@ async def retrieve_search_results(search_query: str, top_k: int = 10) -> List[Pa
     )  
 
     search_results: List[PaypalSearchResult] = []
-    for result in results:
+    async for result in results:
         single_result = {}
         for field in select_fields:
             single_result[field] = result.get(field)
@@ -60,5 +197,12 @@ if __name__ == "__main__":
     
     search_query = "how to open dispute?"
     top_k = 5
-    results = asyncio.run(retrieve_search_results(search_query, top_k))
+
+    async def main():
+        try:
+            return await retrieve_search_results(search_query, top_k)
+        finally:
+            await close_clients()
+
+    results = asyncio.run(main())
     print(results)
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Semantic answer cache in front of the triage agent.
+
+Generic KB questions ("how do I open a dispute", "how do I get a refund") tend to
+repeat with small wording changes. When a new question's embedding is close
+enough to one we already answered, the stored answer is replayed instead of
+running the triage -> validator -> RAG round again.
+
+Only answers to "Search Generic" queries that were handled by the rag_agent alone
+are stored, and questions that look personal (account numbers, "my balance",
+"my transactions", ...) are never looked up. Entries are keyed on the message alone, so the
+cache is only used for the first question of a conversation; follow-ups depend on the
+earlier turns. Entries expire on a TTL, are evicted
+LRU past max_entries, and are dropped when the KB version changes
+(vector_store.mark_kb_rebuilt).
+
+Configuration (environment):
+    SEMANTIC_ANSWER_CACHE_ENABLED      "true" to turn the cache on (default off)
+    SEMANTIC_ANSWER_CACHE_THRESHOLD    minimum cosine similarity for a hit (default 0.95)
+    SEMANTIC_ANSWER_CACHE_TTL_SECONDS  entry lifetime (default 3600)
+    SEMANTIC_ANSWER_CACHE_MAX_ENTRIES  maximum cached answers (default 512)
+"""
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from semantic_kernel_framework import vector_store
+from semantic_kernel_framework.embedding_cache import normalize_query
+
+load_dotenv()
+
+# Customer account numbers look like A1234567890 / XYZ7890123456 (see sample_data)
+ACCOUNT_NUMBER_PATTERN = re.compile(r"\b[A-Za-z]{1,4}\d{6,}\b")
+PERSONAL_QUERY_PATTERN = re.compile(
+    r"\b(balance|saldo|account number|n[uú]mero de cuenta)\b"
+    r"|\b(my|last|latest|recent|mis?|[uú]ltimas?)\s+(\w+\s+)?(transactions?|transacci[oó]n(es)?)\b",
+    re.IGNORECASE,
+)
+
+
+def looks_personal(query: str) -> bool:
+    """Cheap check for account / transaction questions, which must never be served from the cache."""
+    return bool(ACCOUNT_NUMBER_PATTERN.search(query) or PERSONAL_QUERY_PATTERN.search(query))
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    embedding: np.ndarray
+    kb_version: str
+    created: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """Nearest-neighbour lookup of previous answers by query embedding."""
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 512,
+        kb_version: Callable[[], str] = vector_store.get_kb_version,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._kb_version = kb_version
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._current_kb_version = kb_version()
+        # stacked, normalized embeddings of _entries in insertion order; rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_kb_version(self) -> None:
+        version = self._kb_version()
+        if version != self._current_kb_version:
+            print(f"KB version changed ({self._current_kb_version or 'none'} -> {version}), dropping cached answers")
+            self._current_kb_version = version
+            self.invalidate()
+
+    def _expire(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if now - entry.created > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _ensure_matrix(self) -> None:
+        if self._matrix is None:
+            self._keys = list(self._entries.keys())
+            self._matrix = (
+                np.stack([self._entries[key].embedding for key in self._keys]) if self._keys else None
+            )
+
+    def is_cacheable_query(self, query: str) -> bool:
+        if looks_personal(query):
+            self.skipped += 1
+            return False
+        return True
+
+    def lookup(self, embedding) -> Optional[CachedAnswer]:
+        self._check_kb_version()
+        self._expire()
+        self._ensure_matrix()
+        if self._matrix is None:
+            self.misses += 1
+            return None
+        scores = self._matrix @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+        key = self._keys[best]
+        entry = self._entries[key]
+        # LRU order only; the cached matrix keeps its own row order, so no rebuild needed here
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        print(f"Semantic answer cache hit ({scores[best]:.3f}) for: {entry.query}")
+        return entry
+
+    def store(self, query: str, embedding, answer: str) -> None:
+        if not answer or not answer.strip():
+            return
+        self._check_kb_version()
+        key = normalize_query(query)
+        self._entries[key] = CachedAnswer(
+            query=query,
+            answer=answer,
+            embedding=self._normalize(embedding),
+            kb_version=self._current_kb_version,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._matrix = None
+        self.stores += 1
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+        self._keys = []
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "skipped_personal": self.skipped,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+        }
+
+
+semantic_answer_cache_enabled = os.getenv("SEMANTIC_ANSWER_CACHE_ENABLED", "false").lower() == "true"
+
+semantic_answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("SEMANTIC_ANSWER_CACHE_THRESHOLD", "0.95")),
+    ttl_seconds=float(os.getenv("SEMANTIC_ANSWER_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("SEMANTIC_ANSWER_CACHE_MAX_ENTRIES", "512")),
+)
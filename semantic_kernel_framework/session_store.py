@@ -0,0 +1,124 @@
+"""
+Shared session stores for MultiAgentSessionManager.
+
+A store keeps one serialized session per conversation_id together with a version
+number that increases on every save. Workers keep their own in-process copy and
+only reload the blob when the stored version is newer than the one they hold, so
+a conversation can move between uvicorn workers or replicas without losing history.
+Conversations that are never continued are removed by purge_expired_sessions, which the
+service runs in the background.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+
+class SessionStore(ABC):
+    """Versioned key/value storage for serialized sessions."""
+
+    @abstractmethod
+    def get_version(self, conversation_id: str) -> Optional[int]:
+        """Stored version of the session, or None if it isn't stored."""
+
+    @abstractmethod
+    def load(self, conversation_id: str) -> Optional[Tuple[int, bytes]]:
+        """(version, serialized session), or None if it isn't stored."""
+
+    @abstractmethod
+    def save(self, conversation_id: str, data: bytes) -> int:
+        """Store the serialized session and return its new version."""
+
+    @abstractmethod
+    def delete(self, conversation_id: str) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite-backed store, shared by every worker on the same host (or on a shared volume).
+    Sessions are stored zlib-compressed; WAL mode lets readers proceed while another worker writes.
+    """
+
+    def __init__(self, path: str, compression_level: int = 6) -> None:
+        self.path = path
+        self.compression_level = compression_level
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " conversation_id TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " updated REAL NOT NULL,"
+            " data BLOB NOT NULL)"
+        )
+        self._db.commit()
+
+    def get_version(self, conversation_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version FROM sessions WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, conversation_id: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version, data FROM sessions WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], zlib.decompress(row[1])
+
+    def save(self, conversation_id: str, data: bytes) -> int:
+        blob = zlib.compress(data, self.compression_level)
+        with self._lock:
+            # the upsert bumps the version atomically, even with several workers writing
+            row = self._db.execute(
+                "INSERT INTO sessions (conversation_id, version, updated, data) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET "
+                " version = sessions.version + 1, updated = excluded.updated, data = excluded.data "
+                "RETURNING version",
+                (conversation_id, time.time(), blob),
+            ).fetchone()
+            self._db.commit()
+        return row[0]
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE conversation_id = ?", (conversation_id,))
+            self._db.commit()
+
+    def delete_older_than(self, max_age_seconds: float) -> int:
+        """Drop sessions not updated for max_age_seconds. Returns the number removed."""
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_age_seconds,))
+            self._db.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+async def purge_expired_sessions(store: SqliteSessionStore, max_age_seconds: float, interval_seconds: float) -> None:
+    """Every interval_seconds, delete the sessions not updated for max_age_seconds. Runs until cancelled."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(store.delete_older_than, max_age_seconds)
+            if removed:
+                print(f"Purged {removed} sessions older than {max_age_seconds:.0f}s from the session store")
+        except Exception as e:
+            print("Session store purge failed: ", e)
+        await asyncio.sleep(interval_seconds)
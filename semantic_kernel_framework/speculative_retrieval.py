@@ -0,0 +1,120 @@
+"""
+Speculative KB retrieval.
+
+A KB question normally waits for triage -> validator -> triage -> rag_agent -> get_search_results
+before retrieval even starts. In speculative mode the search for the raw user message starts as
+soon as the turn begins, in parallel with all of that. When get_search_results is called with a
+query that matches the prefetched one (same normalized text, or an embedding cosine
+similarity of at least match_threshold), it is served from the prefetch; otherwise it searches as usual.
+
+The prefetch of the current turn is published through a ContextVar, so the search plugin finds
+it from inside the nested agent / function calls. It is not started when the semantic answer
+cache answers the turn, and it is cancelled when the turn routes to the account or transaction
+agents, and when the turn ends.
+
+Configuration (environment):
+    SPECULATIVE_RETRIEVAL_ENABLED          "true" to turn prefetching on (default off)
+    SPECULATIVE_RETRIEVAL_MATCH_THRESHOLD  minimum cosine similarity between the user message and
+                                           the rag_agent's search query (default 0.9)
+"""
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from semantic_kernel_framework.embedding_cache import normalize_query
+
+load_dotenv()
+
+speculative_retrieval_stats: Dict[str, int] = {"started": 0, "served": 0, "missed": 0, "cancelled": 0, "failed": 0}
+
+
+class SpeculativeSearch:
+    """A search started ahead of the tool call that may or may not ask for it."""
+
+    def __init__(
+        self,
+        query: str,
+        search: Callable[[str], Awaitable[Any]],
+        embed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+        match_threshold: float = 0.9,
+    ) -> None:
+        self.query = query
+        self._embed = embed
+        self.match_threshold = match_threshold
+        self.started = time.perf_counter()
+        self.task = asyncio.create_task(search(query))
+        self.task.add_done_callback(self._on_done)
+        speculative_retrieval_stats["started"] += 1
+
+    @staticmethod
+    def _on_done(task: "asyncio.Task") -> None:
+        # retrieve the exception so an unused, failed prefetch isn't reported as never retrieved
+        if not task.cancelled() and task.exception() is not None:
+            speculative_retrieval_stats["failed"] += 1
+            print(f"Speculative search failed: {task.exception()}")
+
+    @property
+    def active(self) -> bool:
+        return not self.task.cancelled()
+
+    async def matches(self, search_query: str) -> bool:
+        if normalize_query(search_query) == normalize_query(self.query):
+            return True
+        if self._embed is None:
+            return False
+        # both embeddings go through the query embedding cache the search backends use as well
+        prefetched, requested = await asyncio.gather(self._embed(self.query), self._embed(search_query))
+        a = np.asarray(prefetched, dtype=np.float32)
+        b = np.asarray(requested, dtype=np.float32)
+        similarity = float(a @ b / ((np.linalg.norm(a) * np.linalg.norm(b)) or 1.0))
+        return similarity >= self.match_threshold
+
+    def cancel(self, reason: str) -> None:
+        if not self.task.done():
+            self.task.cancel()
+            speculative_retrieval_stats["cancelled"] += 1
+            print(f"Speculative search cancelled ({reason})")
+
+
+current_prefetch: ContextVar[Optional[SpeculativeSearch]] = ContextVar("current_prefetch", default=None)
+
+
+def cancel_current(reason: str) -> None:
+    prefetch = current_prefetch.get()
+    if prefetch is not None:
+        prefetch.cancel(reason)
+
+
+async def serve_prefetched(search_query: str) -> Optional[Any]:
+    """Result of the current turn's prefetch if it matches search_query, else None."""
+    prefetch = current_prefetch.get()
+    if prefetch is None or not prefetch.active:
+        return None
+    try:
+        if not await prefetch.matches(search_query):
+            speculative_retrieval_stats["missed"] += 1
+            print(f"Speculative search not used, '{search_query}' doesn't match '{prefetch.query}'")
+            return None
+        waited = time.perf_counter()
+        results = await prefetch.task
+    except asyncio.CancelledError:
+        if asyncio.current_task() is not None and asyncio.current_task().cancelling():
+            raise
+        return None
+    except Exception:
+        return None
+    speculative_retrieval_stats["served"] += 1
+    print(
+        f"Served prefetched search results for '{search_query}' "
+        f"(started {(waited - prefetch.started) * 1000:.0f} ms before the tool call)"
+    )
+    return results
+
+
+speculative_retrieval_enabled = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "false").lower() == "true"
+speculative_match_threshold = float(os.getenv("SPECULATIVE_RETRIEVAL_MATCH_THRESHOLD", "0.9"))
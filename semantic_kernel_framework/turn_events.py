@@ -0,0 +1,149 @@
+"""
+Typed event stream for one chat turn, for the SSE / NDJSON mode of /multi_agent_chat/.
+
+A TurnEventStream is published through a ContextVar for the duration of the turn. Anything that
+runs inside the turn (the kernel function filter, the router, the answer cache) calls emit(), and
+the events are merged with the answer tokens in the order they happen:
+
+    token        {"text"}                                  a delta of the answer
+    handoff      {"agent", "fast_path", ...}               work was delegated to an agent
+    tool_call    {"name", "plugin", "arguments"}           a kernel function (agent or tool) started
+    tool_result  {"name", "plugin", "duration_ms", "ok"}   it finished
+    cache_hit    {"cached_query"}                          the answer is replayed from the semantic answer cache
+    error        {"message"}
+    final        {"ttft_ms", "total_ms", "tokens", "characters", "tool_calls", "tool_ms"}
+
+Every event also carries "t_ms", the server-side time since the request arrived. tool_ms in the
+final event is the sum of all kernel function durations, so a tool called by an agent is counted
+both on its own and inside the agent's handoff.
+"""
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Iterable, Optional
+
+from semantic_kernel.filters import FunctionInvocationContext
+
+# longest argument / result text copied into an event
+MAX_EVENT_TEXT_CHARS = 500
+
+
+class TurnEventStream:
+    """Collects the events of one turn and yields them, with the answer tokens, as they happen."""
+
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.tokens = 0
+        self.characters = 0
+        self.tool_calls = 0
+        self.tool_seconds = 0.0
+        self._queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    def elapsed_ms(self, at: Optional[float] = None) -> float:
+        return round(((at or time.perf_counter()) - self.started_at) * 1000, 1)
+
+    def emit(self, event_type: str, **data: Any) -> None:
+        self._queue.put_nowait({"type": event_type, "t_ms": self.elapsed_ms(), **data})
+
+    def token(self, text: str) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+        self.characters += len(text)
+        self.emit("token", text=text)
+
+    def final_event(self) -> Dict[str, Any]:
+        return {
+            "type": "final",
+            "t_ms": self.elapsed_ms(),
+            "ttft_ms": self.elapsed_ms(self.first_token_at) if self.first_token_at else None,
+            "total_ms": self.elapsed_ms(),
+            "tokens": self.tokens,
+            "characters": self.characters,
+            "tool_calls": self.tool_calls,
+            "tool_ms": round(self.tool_seconds * 1000, 1),
+        }
+
+    async def run(self, token_stream: Optional[AsyncIterator[Any]],
+                  chunk_texts: Callable[[Any], Iterable[str]]) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Consume token_stream in a task so that events emitted while it waits on tools are yielded right away.
+        A None token_stream (the turn failed to start) yields an error and the final event.
+        """
+
+        async def pump() -> None:
+            try:
+                if token_stream is None:
+                    raise RuntimeError("the chat stream could not be started")
+                async for chunk in token_stream:
+                    for text in chunk_texts(chunk):
+                        self.token(text)
+            except Exception as e:
+                print("Error in multi agent chat stream: ", e)
+                self.emit("error", message=str(e))
+            finally:
+                self._queue.put_nowait(None)
+
+        # the task copies the current context, so the filters running inside it see this stream
+        current_turn_events.set(self)
+        task = asyncio.create_task(pump())
+        try:
+            while True:
+                event = await self._queue.get()
+                if event is None:
+                    break
+                yield event
+            yield self.final_event()
+        finally:
+            if not task.done():
+                task.cancel()
+
+
+current_turn_events: ContextVar[Optional[TurnEventStream]] = ContextVar("current_turn_events", default=None)
+
+
+def emit(event_type: str, **data: Any) -> None:
+    """Add an event to the current turn's stream; a no-op for plain text requests."""
+    stream = current_turn_events.get()
+    if stream is not None:
+        stream.emit(event_type, **data)
+
+
+def _truncate(value: Any) -> str:
+    text = value if isinstance(value, str) else str(value)
+    return text if len(text) <= MAX_EVENT_TEXT_CHARS else text[:MAX_EVENT_TEXT_CHARS] + "…"
+
+
+async def turn_event_filter(context: FunctionInvocationContext, next) -> None:
+    """Function invocation filter that reports every kernel function call of the turn, with its latency."""
+    stream = current_turn_events.get()
+    if stream is None:
+        await next(context)
+        return
+    name, plugin = context.function.name, context.function.plugin_name
+    arguments = {key: _truncate(value) for key, value in context.arguments.items()}
+    # agents exposed as plugins take the conversation as "messages"
+    if "messages" in context.arguments:
+        stream.emit("handoff", agent=name, fast_path=False)
+    stream.emit("tool_call", name=name, plugin=plugin, arguments=arguments)
+    stream.tool_calls += 1
+    started = time.perf_counter()
+    ok = False
+    try:
+        await next(context)
+        ok = True
+    finally:
+        duration = time.perf_counter() - started
+        stream.tool_seconds += duration
+        stream.emit("tool_result", name=name, plugin=plugin, duration_ms=round(duration * 1000, 1), ok=ok,
+                    result=_truncate(context.result.value) if ok and context.result is not None else None)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+def format_ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(event, ensure_ascii=False, default=str) + "\n"
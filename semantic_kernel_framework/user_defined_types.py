@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 from semantic_kernel.kernel_pydantic import KernelBaseModel
 from semantic_kernel.contents import ChatHistory
@@ -21,6 +21,11 @@ class PaypalSearchResult(BaseModel):
     id: Optional[str]
     fileName: Optional[str]
     content: Optional[str]
+    # set for chunk-level records: the source document and the chunk's position in it
+    parentId: Optional[str] = None
+    chunkIndex: Optional[int] = None
+    # source pages merged into this one as near-duplicates
+    duplicateFileNames: Optional[List[str]] = None
   
 class PaypalResult(BaseModel):
     search_results: list[PaypalSearchResult] = []
@@ -0,0 +1,238 @@
+"""
+Compact on-disk format for the embedded search docs.
+
+A store is two files that share a base path:
+
+    <base>.npy    float32 matrix (num_docs, dimensions), standard NumPy .npy layout
+    <base>.jsonl  one metadata record per line ({"id", "fileName", "content", ...}),
+                  line N describes row N of the matrix
+
+The matrix is opened with mmap, so loaders and the local search path read it
+zero-copy and only page in the rows they touch. Metadata lines are located by
+byte offset and parsed on demand.
+
+Convert the legacy JSON file with:
+
+    python -m semantic_kernel_framework.vector_store export search_docs_with_vectors.json search_docs_vectors
+    python -m semantic_kernel_framework.vector_store import search_docs_vectors search_docs_with_vectors.json
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VECTOR_FIELD_NAME = "contentVector"
+MATRIX_SUFFIX = ".npy"
+METADATA_SUFFIX = ".jsonl"
+
+# Bumped by data prep and the index loaders whenever the KB is rebuilt, so that anything
+# derived from the old index (e.g. the semantic answer cache) can notice and drop it.
+repo_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+kb_version_file_path = os.getenv("KB_VERSION_FILE") or os.path.join(repo_root, ".kb_version")
+_kb_version_cache = (None, "")
+
+
+def matrix_path(base_path: str) -> str:
+    return base_path + MATRIX_SUFFIX
+
+
+def metadata_path(base_path: str) -> str:
+    return base_path + METADATA_SUFFIX
+
+
+def store_exists(base_path: str) -> bool:
+    return os.path.exists(matrix_path(base_path)) and os.path.exists(metadata_path(base_path))
+
+
+def store_mtime(base_path: str) -> int:
+    """Latest modification time (ns) of the store's files; changes whenever the store is rewritten."""
+    return max(os.stat(matrix_path(base_path)).st_mtime_ns, os.stat(metadata_path(base_path)).st_mtime_ns)
+
+
+def _normalize_record(doc: Dict[str, Any]) -> Dict[str, Any]:
+    record = {k: v for k, v in doc.items() if k not in (VECTOR_FIELD_NAME, "filename")}
+    # data_prep historically wrote "filename" while the loaders read "fileName"
+    record["fileName"] = doc.get("fileName") or doc.get("filename", "")
+    return record
+
+
+def write_vector_store(base_path: str, docs: Iterable[Dict[str, Any]]) -> int:
+    """Write documents that carry a contentVector to <base>.npy / <base>.jsonl. Returns the row count."""
+    rows: List[np.ndarray] = []
+    tmp_metadata = metadata_path(base_path) + ".tmp"
+    with open(tmp_metadata, "w", encoding="utf-8") as f:
+        for doc in docs:
+            vector = doc.get(VECTOR_FIELD_NAME)
+            if not vector:
+                print(f"Skipping document without {VECTOR_FIELD_NAME}: {doc.get('id', 'unknown')}")
+                continue
+            rows.append(np.asarray(vector, dtype=np.float32))
+            f.write(json.dumps(_normalize_record(doc), ensure_ascii=False) + "\n")
+
+    matrix = np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+    tmp_matrix = matrix_path(base_path) + ".tmp"
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, matrix, allow_pickle=False)
+
+    # swap both files in only once they are complete so readers never see a half-written store
+    os.replace(tmp_matrix, matrix_path(base_path))
+    os.replace(tmp_metadata, metadata_path(base_path))
+    return len(rows)
+
+
+class VectorStore:
+    """Read-only view over a store: memory-mapped vectors plus lazily parsed metadata."""
+
+    def __init__(self, base_path: str) -> None:
+        self.base_path = base_path
+        self.vectors: np.ndarray = np.load(matrix_path(base_path), mmap_mode="r", allow_pickle=False)
+        if self.vectors.dtype != np.float32 or self.vectors.ndim != 2:
+            raise ValueError(f"{matrix_path(base_path)} must hold a 2-D float32 matrix, got {self.vectors.dtype} {self.vectors.shape}")
+        self._offsets = self._index_lines(metadata_path(base_path))
+        if len(self._offsets) != self.vectors.shape[0]:
+            raise ValueError(
+                f"{metadata_path(base_path)} has {len(self._offsets)} records but the matrix has {self.vectors.shape[0]} rows"
+            )
+        self._metadata_file = open(metadata_path(base_path), "rb")
+
+    @staticmethod
+    def _index_lines(file_path: str) -> List[int]:
+        # byte offsets only, no JSON parsing, so opening the store stays cheap
+        offsets = []
+        position = 0
+        with open(file_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    offsets.append(position)
+                position += len(line)
+        return offsets
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    def get_record(self, row: int) -> Dict[str, Any]:
+        self._metadata_file.seek(self._offsets[row])
+        return json.loads(self._metadata_file.readline())
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        with open(metadata_path(self.base_path), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """Records joined with their vector, in the shape the index loaders expect."""
+        for row, record in enumerate(self.iter_records()):
+            record[VECTOR_FIELD_NAME] = self.vectors[row].tolist()
+            yield record
+
+    def close(self) -> None:
+        self._metadata_file.close()
+
+
+def mark_kb_rebuilt() -> str:
+    """Record that the KB index was rebuilt. Returns the new version string."""
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    with open(kb_version_file_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    print(f"KB version is now {version}")
+    return version
+
+
+def get_kb_version() -> str:
+    """Current KB version ("" if the KB was never marked). Only re-reads the file when its mtime changes."""
+    global _kb_version_cache
+    try:
+        mtime = os.stat(kb_version_file_path).st_mtime_ns
+    except FileNotFoundError:
+        return ""
+    if _kb_version_cache[0] != mtime:
+        with open(kb_version_file_path, "r", encoding="utf-8") as f:
+            _kb_version_cache = (mtime, f.read().strip())
+    return _kb_version_cache[1]
+
+
+def open_vector_store(base_path: str) -> VectorStore:
+    return VectorStore(base_path)
+
+
+def iter_json_documents(json_file_path: str, read_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """Documents of a JSON array file, decoded one at a time so the whole file is never held in memory."""
+    decoder = json.JSONDecoder()
+    with open(json_file_path, "r", encoding="utf-8") as f:
+        buffer = f.read(read_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{json_file_path} does not contain a JSON array")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                doc, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # the next document is not complete yet
+                if eof:
+                    raise
+                more = f.read(read_size)
+                eof = not more
+                buffer += more
+                continue
+            yield doc
+            buffer = buffer[end:]
+
+
+def iter_documents(base_path: str, json_fallback_path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Documents with vectors from the binary store, or from the legacy JSON file if no store exists."""
+    if store_exists(base_path):
+        store = open_vector_store(base_path)
+        try:
+            yield from store.iter_documents()
+        finally:
+            store.close()
+    elif json_fallback_path and os.path.exists(json_fallback_path):
+        print(f"No vector store at {base_path}, reading {json_fallback_path}")
+        yield from iter_json_documents(json_fallback_path)
+    else:
+        raise FileNotFoundError(f"Neither vector store {base_path} nor {json_fallback_path} exists")
+
+
+def export_json_to_store(json_file_path: str, base_path: str) -> int:
+    count = write_vector_store(base_path, iter_json_documents(json_file_path))
+    print(f"Exported {count} documents from {json_file_path} to {matrix_path(base_path)} / {metadata_path(base_path)}")
+    return count
+
+
+def import_store_to_json(base_path: str, json_file_path: str) -> int:
+    store = open_vector_store(base_path)
+    try:
+        docs = list(store.iter_documents())
+    finally:
+        store.close()
+    with open(json_file_path, "w", encoding="utf-8") as f:
+        json.dump(docs, f, indent=2, ensure_ascii=False)
+    print(f"Imported {len(docs)} documents from {base_path} into {json_file_path}")
+    return len(docs)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("export", "import"):
+        print("usage: python -m semantic_kernel_framework.vector_store export <json_file> <store_base>")
+        print("       python -m semantic_kernel_framework.vector_store import <store_base> <json_file>")
+        sys.exit(1)
+    if sys.argv[1] == "export":
+        export_json_to_store(sys.argv[2], sys.argv[3])
+    else:
+        import_store_to_json(sys.argv[2], sys.argv[3])
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# the packages are imported from the repo root, as fast_api.py and the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# the helpers create their clients at import time; no test sends a request to these endpoints
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://localhost/")
+os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2025-02-01-preview")
+os.environ.setdefault("AZURE_SEARCH_SERVICE_ENDPOINT", "https://localhost")
@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks import aoai_standin
+from benchmarks.aoai_standin import Cassette, hash_embedding, request_key, synthetic_turn
+
+SEARCH_TOOL = {"type": "function", "function": {
+    "name": "get_search_results", "description": "Search the PayPal help articles for a question",
+    "parameters": {"type": "object", "properties": {"search_query": {"type": "string"}}, "required": ["search_query"]}}}
+BALANCE_TOOL = {"type": "function", "function": {
+    "name": "get_account_balance", "description": "Balance of a customer account",
+    "parameters": {"type": "object", "properties": {"account_number": {"type": "string"}}}}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(aoai_standin.config, "mode", "synthetic")
+    monkeypatch.setattr(aoai_standin.config, "ttft_ms", 0.0)
+    monkeypatch.setattr(aoai_standin.config, "tokens_per_second", 0.0)
+    monkeypatch.setattr(aoai_standin.config, "embedding_latency_ms", 0.0)
+    return TestClient(aoai_standin.app)
+
+
+def test_embeddings_are_deterministic_and_similar_for_shared_words():
+    dispute = hash_embedding("how do I open a dispute", 256)
+
+    assert np.array_equal(dispute, hash_embedding("how do I open a dispute", 256))
+    assert np.linalg.norm(dispute) == pytest.approx(1.0)
+    assert dispute @ hash_embedding("open a dispute with a seller", 256) > dispute @ hash_embedding("reset my password", 256)
+
+
+def test_the_best_matching_tool_is_called_with_the_question():
+    body = {"messages": [{"role": "user", "content": "search the help articles about disputes"}],
+            "tools": [BALANCE_TOOL, SEARCH_TOOL]}
+
+    content, tool_call = synthetic_turn(body)
+
+    assert content == ""
+    assert tool_call["function"]["name"] == "get_search_results"
+    assert json.loads(tool_call["function"]["arguments"]) == {"search_query": "search the help articles about disputes"}
+
+
+def test_the_answer_quotes_tool_results():
+    body = {"messages": [
+        {"role": "user", "content": "how do I open a dispute"},
+        {"role": "assistant", "tool_calls": []},
+        {"role": "tool", "content": "Disputes are opened from the Resolution Center."},
+    ], "tools": [SEARCH_TOOL]}
+
+    content, tool_call = synthetic_turn(body)
+
+    assert tool_call is None
+    assert content == "Here is what I found: Disputes are opened from the Resolution Center."
+
+
+def test_json_schema_response_format_gets_a_conforming_object():
+    schema = {"type": "object", "properties": {"valid": {"type": "boolean"}, "language": {"enum": ["English", "Spanish"]}}}
+    body = {"messages": [{"role": "user", "content": "is this English"}],
+            "response_format": {"type": "json_schema", "json_schema": {"schema": schema}}}
+
+    assert json.loads(synthetic_turn(body)[0]) == {"valid": True, "language": "English"}
+
+
+def test_azure_embeddings_route(client):
+    response = client.post("/openai/deployments/ada/embeddings", json={"input": ["refund", "dispute"], "dimensions": 8})
+
+    data = response.json()["data"]
+    assert response.status_code == 200
+    assert [item["index"] for item in data] == [0, 1]
+    assert len(data[0]["embedding"]) == 8
+
+
+def test_streamed_chat_completion(client):
+    response = client.post("/openai/deployments/gpt-4o/chat/completions",
+                           json={"stream": True, "messages": [{"role": "user", "content": "hello there"}]})
+
+    events = [line[len("data: "):] for line in response.text.split("\n\n") if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+    assert text == "You asked: hello there. This is a synthetic answer from the local stand-in."
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+
+def test_request_key_ignores_volatile_fields():
+    body = {"messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+
+    assert request_key("chat", "gpt-4o", body) == request_key("chat", "gpt-4o", {**body, "user": "u1", "seed": 7})
+    assert request_key("chat", "gpt-4o", body) != request_key("chat", "gpt-4o", {**body, "temperature": 1})
+
+
+def test_replay_serves_the_recording_and_falls_back_on_a_miss(client, tmp_path, monkeypatch):
+    body = {"messages": [{"role": "user", "content": "hi"}]}
+    recorded = {"id": "chatcmpl-recorded", "choices": [{"message": {"role": "assistant", "content": "recorded answer"}}]}
+    path = tmp_path / "session.jsonl"
+    path.write_text(json.dumps({"key": request_key("chat", "gpt-4o", body), "stream": False, "status": 200,
+                                "body": json.dumps(recorded), "elapsed_ms": 5}) + "\n", encoding="utf-8")
+    monkeypatch.setattr(aoai_standin.config, "mode", "replay")
+    monkeypatch.setattr(aoai_standin.config, "replay_speed", 0.0)
+    monkeypatch.setattr(aoai_standin, "cassette", Cassette(str(path)))
+
+    assert client.post("/openai/deployments/gpt-4o/chat/completions", json=body).json() == recorded
+    miss = client.post("/openai/deployments/gpt-4o/chat/completions", json={"messages": [{"role": "user", "content": "bye"}]})
+    assert miss.json()["choices"][0]["message"]["content"].startswith("You asked: bye.")
+
+    monkeypatch.setattr(aoai_standin.config, "on_miss", "error")
+    assert client.post("/openai/deployments/gpt-4o/chat/completions",
+                       json={"messages": [{"role": "user", "content": "bye"}]}).status_code == 404
@@ -0,0 +1,72 @@
+import math
+
+import pytest
+
+from semantic_kernel_framework.bm25_index import BM25Index, rrf_fuse, tokenize
+
+DOCS = [
+    "How do I open a dispute with a seller?",
+    "Refunds take 3 to 5 business days to arrive.",
+    "Reset your password from the login page.",
+    "Escalate a dispute to a claim within 20 days.",
+]
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("How do I get my Refunds?") == ["get", "refund"]
+    assert tokenize("business access") == ["business", "access"]
+
+
+def test_search_ranks_matching_documents():
+    index = BM25Index.build(DOCS)
+
+    hits = index.search("refund", top_k=5)
+
+    assert [row for row, _ in hits] == [1]
+    assert index.search("cryptocurrency") == []
+
+
+def test_rarer_terms_weigh_more():
+    index = BM25Index.build(DOCS)
+
+    rows = [row for row, _ in index.search("dispute seller", top_k=2)]
+
+    # both mention "dispute", only row 0 has the rarer "seller"
+    assert rows == [0, 3]
+
+
+def test_scores_match_the_bm25_formula():
+    index = BM25Index.build(DOCS, k1=1.2, b=0.75)
+    lengths = [len(tokenize(doc)) for doc in DOCS]
+    average = sum(lengths) / len(lengths)
+    idf = math.log(1 + (4 - 1 + 0.5) / (1 + 0.5))
+    expected = idf * 1 * 2.2 / (1 + 1.2 * (1 - 0.75 + 0.75 * lengths[2] / average))
+
+    assert index.scores("password")[2] == pytest.approx(expected, rel=1e-5)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index.build(DOCS)
+    path = str(tmp_path / "docs.bm25.npz")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+
+    assert len(loaded) == len(DOCS)
+    assert loaded.search("dispute claim") == index.search("dispute claim")
+
+
+def test_rrf_fuse_rewards_rows_ranked_by_both():
+    lexical = [(1, 9.0), (2, 5.0), (3, 1.0)]
+    vector = [(2, 0.9), (4, 0.8), (1, 0.7)]
+
+    fused = rrf_fuse([lexical, vector], top_k=3, k=60)
+
+    assert [row for row, _ in fused] == [2, 1, 4]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_rrf_fuse_weights():
+    fused = rrf_fuse([[(1, 0.0)], [(2, 0.0)]], top_k=2, weights=[1.0, 2.0])
+
+    assert [row for row, _ in fused] == [2, 1]
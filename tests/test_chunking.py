@@ -0,0 +1,60 @@
+import pytest
+
+from vector_indexing.chunking import chunk_documents, chunk_id, chunk_text
+from vector_indexing.embedding_pipeline import estimate_tokens
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("How do I get a refund? Open the Resolution Center.", 512, 64) == [
+        "How do I get a refund? Open the Resolution Center."]
+
+
+def test_chunks_respect_max_tokens_and_overlap():
+    text = " ".join(f"Sentence number {i} is here." for i in range(200))
+    chunks = chunk_text(text, 64, 16)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 64 for chunk in chunks)
+    # consecutive chunks share text
+    for previous, following in zip(chunks, chunks[1:]):
+        assert previous.split()[-1] in following.split()[:16]
+
+
+def test_long_unbroken_token_is_kept_whole():
+    chunks = chunk_text("x" * 10000, 100, 10)
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    # without the overlap the pieces add up to the original text
+    assert "".join(chunk.replace(" ", "") for chunk in chunk_text("x" * 10000, 100, 0)) == "x" * 10000
+
+
+def test_paragraph_breaks_are_kept():
+    chunks = chunk_text("First paragraph.\n\nSecond paragraph.", 512, 64)
+    assert chunks == ["First paragraph.\n\nSecond paragraph."]
+
+
+@pytest.mark.parametrize("max_tokens, overlap_tokens", [(1, 64), (10, 10), (0, 0), (10, -1)])
+def test_invalid_sizes_are_rejected(max_tokens, overlap_tokens):
+    with pytest.raises(ValueError):
+        chunk_text("a b c", max_tokens, overlap_tokens)
+
+
+def test_chunk_documents_ids_point_to_the_parent():
+    docs = [{"id": "doc1", "fileName": "a.txt", "content": " ".join(["word"] * 400)}]
+    records = list(chunk_documents(docs, 64, 8))
+    assert [record["id"] for record in records] == [chunk_id("doc1", i) for i in range(len(records))]
+    assert {record["parentId"] for record in records} == {"doc1"}
+    assert all(record["fileName"] == "a.txt" and record["contentHash"] for record in records)
+
+
+def test_every_chunk_carries_the_merged_duplicates():
+    docs = [
+        {"id": "doc1", "fileName": "refund-help100.txt", "content": " ".join(["refund"] * 400),
+         "duplicateFileNames": ["refund-help900.txt"]},
+        {"id": "doc2", "fileName": "dispute.txt", "content": "Open a dispute."},
+    ]
+
+    records = list(chunk_documents(docs, 64, 8))
+
+    merged = [record for record in records if record["parentId"] == "doc1"]
+    assert len(merged) > 1
+    assert all(record["duplicateFileNames"] == ["refund-help900.txt"] for record in merged)
+    assert "duplicateFileNames" not in [record for record in records if record["parentId"] == "doc2"][0]
@@ -0,0 +1,59 @@
+from vector_indexing.cleaning import (clean_documents, find_near_duplicates, learn_boilerplate,
+                                      strip_boilerplate)
+
+HEADER = "Home Help Center Personal Business Developer Log In Sign Up Contact Us Security Center Community"
+FOOTER = "About Newsroom Jobs Investor Relations Privacy Legal Agreements Copyright 1999 2025 PayPal All rights reserved"
+
+TOPICS = [
+    "To open a dispute go to the Resolution Center and select the transaction you want to report.",
+    "Refunds usually take three to five business days to reach the card you paid with.",
+    "You can reset your password from the login page by choosing the forgot password link.",
+    "A limitation on your account can be removed by providing the documents we ask for.",
+    "Automatic payments can be cancelled from your settings under payments and subscriptions.",
+]
+
+
+def page(body):
+    return f"{HEADER}\n\n{body}\n\n{FOOTER}"
+
+
+def test_shared_header_and_footer_are_stripped():
+    texts = [page(body) for body in TOPICS]
+    boilerplate = learn_boilerplate(texts)
+
+    cleaned = [strip_boilerplate(text, boilerplate) for text in texts]
+
+    assert cleaned == TOPICS
+
+
+def test_text_unique_to_one_document_is_kept():
+    texts = [page(body) for body in TOPICS]
+    boilerplate = learn_boilerplate(texts)
+
+    assert strip_boilerplate("Only this page talks about invoices.", boilerplate) == "Only this page talks about invoices."
+
+
+def test_near_duplicates_are_found():
+    text = " ".join(TOPICS)
+    pairs = find_near_duplicates([text, text + " Thanks.", TOPICS[0]], threshold=0.85)
+
+    assert [(i, j) for i, j, _ in pairs] == [(0, 1)]
+    assert pairs[0][2] >= 0.85
+
+
+def test_clean_documents_merges_duplicates_into_the_longer_one():
+    body = " ".join(TOPICS)
+    docs = [
+        {"fileName": "a.txt", "content": page(body)},
+        {"fileName": "a-copy.txt", "content": page(body + " See also the help center.")},
+        {"fileName": "b.txt", "content": page("Invoices can be created and sent from the business dashboard.")},
+        {"fileName": "c.txt", "content": page("Debit cards that are lost or stolen should be reported right away.")},
+    ]
+
+    kept, report = clean_documents(docs)
+
+    assert [doc["fileName"] for doc in kept] == ["a-copy.txt", "b.txt", "c.txt"]
+    assert kept[0]["duplicateFileNames"] == ["a.txt"]
+    assert HEADER not in kept[1]["content"]
+    assert report["duplicates_merged"] == 1
+    assert report["tokens_after"] < report["tokens_before"]
@@ -0,0 +1,61 @@
+from semantic_kernel_framework.context_packer import (ELLIPSIS, extract_snippet,
+                                                      pack_search_results)
+from semantic_kernel_framework.history_reducer import estimate_tokens
+from semantic_kernel_framework.user_defined_types import PaypalSearchResult
+
+
+def result(id_, content):
+    return PaypalSearchResult(id=id_, fileName=f"{id_}.txt", content=content)
+
+
+def filler(topic, sentences):
+    return " ".join(f"This sentence {i} is about {topic} and nothing else." for i in range(sentences))
+
+
+def test_results_within_budget_are_kept_whole():
+    results = [result("a", "Open a dispute in the Resolution Center."), result("b", "Refunds take five days.")]
+
+    packed, report = pack_search_results("dispute", results, token_budget=3000, max_passage_tokens=800)
+
+    assert packed == results
+    assert report["tokens_dropped"] == 0
+
+
+def test_duplicates_are_dropped():
+    text = filler("disputes", 10)
+    results = [result("a", text), result("a", "Same id, other text entirely."), result("b", text + " Extra.")]
+
+    packed, report = pack_search_results("dispute", results, token_budget=3000, max_passage_tokens=800)
+
+    assert [item.id for item in packed] == ["a"]
+    assert report["duplicates_dropped"] == 2
+
+
+def test_budget_is_respected_in_rank_order():
+    # distinct words per passage, so none of them counts as a duplicate
+    results = [result(str(i), " ".join(f"word{i}x{j}" for j in range(200))) for i in range(5)]
+
+    packed, report = pack_search_results("word0x1", results, token_budget=400, max_passage_tokens=150)
+
+    assert sum(estimate_tokens(item.content) for item in packed) <= 400
+    assert packed[0].id == "0"
+    assert report["results_packed"] == 3
+    assert report["results_packed"] + report["results_dropped"] == 5
+
+
+def test_zero_budget_disables_packing():
+    results = [result(str(i), filler("refunds", 100)) for i in range(3)]
+
+    packed, _ = pack_search_results("refund", results, token_budget=0)
+
+    assert packed == results
+
+
+def test_snippet_is_the_window_matching_the_query():
+    text = filler("payments", 20) + " To close your account open Settings and choose close account. " + filler("cards", 20)
+
+    snippet = extract_snippet("how do I close my account", text, 60)
+
+    assert "close account" in snippet
+    assert snippet.startswith(ELLIPSIS) and snippet.endswith(ELLIPSIS)
+    assert estimate_tokens(snippet) <= 62
@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+from azure.cosmos.exceptions import CosmosHttpResponseError
+
+from vector_indexing import cosmos_bulk_loader
+from vector_indexing.cosmos_bulk_loader import AdaptiveWindow, CosmosBulkLoader
+
+
+def cosmos_error(status_code, **headers):
+    error = CosmosHttpResponseError(status_code=status_code, message=f"status {status_code}")
+    error.headers = headers
+    return error
+
+
+def test_window_grows_by_about_one_slot_per_window_of_successes():
+    window = AdaptiveWindow(initial=4, minimum=1, maximum=64)
+
+    for _ in range(4):
+        window.on_success()
+
+    assert int(window.limit) == 4
+    window.on_success()
+    assert int(window.limit) == 5
+    assert window.peak == 5
+
+
+def test_window_is_capped_at_the_maximum():
+    window = AdaptiveWindow(initial=100, minimum=1, maximum=8)
+    assert window.limit == 8
+
+    for _ in range(100):
+        window.on_success()
+
+    assert window.limit == 8
+
+
+def test_throttling_halves_the_window_once_per_retry_after(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cosmos_bulk_loader.time, "monotonic", lambda: now[0])
+    window = AdaptiveWindow(initial=16, minimum=2, maximum=64)
+
+    # the writes that were in flight together are all throttled: one decrease
+    window.on_throttle(0.5)
+    window.on_throttle(0.5)
+    window.on_throttle(0.5)
+    assert window.limit == 8
+
+    now[0] += 1
+    window.on_throttle(0.5)
+    now[0] += 1
+    window.on_throttle(0.5)
+    now[0] += 1
+    window.on_throttle(0.5)
+    assert window.limit == 2
+
+
+def test_acquire_waits_for_retry_after():
+    async def scenario():
+        window = AdaptiveWindow(initial=4, minimum=1, maximum=4)
+        window.on_throttle(0.05)
+        started = time.monotonic()
+        await window.acquire()
+        waited = time.monotonic() - started
+        await window.release()
+        return waited
+
+    assert asyncio.run(scenario()) >= 0.04
+
+
+def test_acquire_never_exceeds_the_limit():
+    async def scenario():
+        window = AdaptiveWindow(initial=2, minimum=1, maximum=2)
+        in_flight = []
+
+        async def write():
+            await window.acquire()
+            in_flight.append(window.in_flight)
+            await asyncio.sleep(0.01)
+            await window.release()
+
+        await asyncio.gather(*(write() for _ in range(6)))
+        return in_flight
+
+    assert max(asyncio.run(scenario())) == 2
+
+
+class ThrottlingContainer:
+    """Throttles the first upserts of each document with the given errors, charging 5 RU per call."""
+
+    def __init__(self, errors_per_doc):
+        self.errors_per_doc = {key: list(errors) for key, errors in errors_per_doc.items()}
+        self.items = {}
+        self.calls = []
+
+    async def upsert_item(self, doc, response_hook=None):
+        self.calls.append(doc["id"])
+        errors = self.errors_per_doc.get(doc["id"])
+        if errors:
+            error = errors.pop(0)
+            error.headers = {**error.headers, "x-ms-request-charge": "5"}
+            raise error
+        response_hook({"x-ms-request-charge": "5"}, doc)
+        self.items[doc["id"]] = doc
+
+
+def test_throttled_upserts_are_retried_after_retry_after():
+    container = ThrottlingContainer({"b": [cosmos_error(429, **{"x-ms-retry-after-ms": "20"})]})
+    loader = CosmosBulkLoader(container, initial_concurrency=8, max_concurrency=8)
+
+    started = time.monotonic()
+    stats = asyncio.run(loader.upload([{"id": "a"}, {"id": "b"}, {"id": "c"}]))
+
+    assert sorted(container.items) == ["a", "b", "c"]
+    assert container.calls.count("b") == 2
+    assert stats["throttled"] == 1 and stats["retries"] == 1 and stats["failed"] == 0
+    # throttled requests are charged too
+    assert stats["request_units"] == 20
+    assert stats["final_concurrency"] == 4
+    assert time.monotonic() - started >= 0.015
+
+
+def test_non_transient_errors_are_not_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    container = ThrottlingContainer({"b": [cosmos_error(400)]})
+    loader = CosmosBulkLoader(container)
+
+    stats = asyncio.run(loader.upload([{"id": "a"}, {"id": "b"}]))
+
+    assert container.calls.count("b") == 1
+    assert stats["documents"] == 1 and stats["failed"] == 1 and stats["retries"] == 0
+    assert (tmp_path / "upload_error.log").read_text().startswith("b: 400")
+
+
+def test_retry_after_defaults_to_100_ms():
+    container = ThrottlingContainer({"a": [cosmos_error(429)]})
+    loader = CosmosBulkLoader(container)
+
+    started = time.monotonic()
+    assert asyncio.run(loader.upload([{"id": "a"}]))["documents"] == 1
+    assert time.monotonic() - started >= 0.09
+
+
+class FakeContainer:
+    def __init__(self, ids):
+        self.items = {id_: {"id": id_} for id_ in ids}
+
+    async def upsert_item(self, doc, response_hook=None):
+        self.items[doc["id"]] = doc
+
+    async def delete_item(self, item, partition_key, response_hook=None):
+        assert item == partition_key
+        del self.items[item]
+
+    def query_items(self, query):
+        async def iterate():
+            for id_ in list(self.items):
+                yield id_
+        return iterate()
+
+
+def test_delete_stale_removes_only_records_missing_from_the_upload():
+    container = FakeContainer(["3f0c-legacy", "doc-a-0000", "doc-a-0001"])
+    loader = CosmosBulkLoader(container, max_concurrency=4)
+
+    async def load():
+        await loader.upload([{"id": "doc-a-0000"}, {"id": "doc-b-0000"}])
+        return await loader.delete_stale(loader.uploaded_ids)
+
+    deleted = asyncio.run(load())
+
+    assert deleted == 2
+    assert sorted(container.items) == ["doc-a-0000", "doc-b-0000"]
+    assert loader.stats["documents"] == 2
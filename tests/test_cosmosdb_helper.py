@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from semantic_kernel_framework import cosmosdb_helper
+
+
+class FakeContainer:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeCosmosClient:
+    instances = []
+
+    def __init__(self, endpoint, credential):
+        self.databases = []
+        self.closed = False
+        FakeCosmosClient.instances.append(self)
+
+    async def create_database_if_not_exists(self, id):
+        await asyncio.sleep(0.01)
+        self.databases.append(id)
+
+    def get_database_client(self, name):
+        return self
+
+    def get_container_client(self, name):
+        return FakeContainer(name)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClosable:
+    async def close(self):
+        pass
+
+
+def use_fake_client(monkeypatch):
+    FakeCosmosClient.instances = []
+    monkeypatch.setattr(cosmosdb_helper, "CosmosClient", FakeCosmosClient)
+    monkeypatch.setattr(cosmosdb_helper, "client", None)
+    monkeypatch.setattr(cosmosdb_helper, "container", None)
+    monkeypatch.setattr(cosmosdb_helper, "_container_lock", asyncio.Lock())
+    monkeypatch.setattr(cosmosdb_helper, "aoai_client", FakeClosable())
+    monkeypatch.setattr(cosmosdb_helper, "azcli_credential", FakeClosable())
+
+
+def test_concurrent_searches_share_one_client(monkeypatch):
+    use_fake_client(monkeypatch)
+
+    async def scenario():
+        return await asyncio.gather(*(cosmosdb_helper.get_container() for _ in range(5)))
+
+    containers = asyncio.run(scenario())
+
+    assert len(FakeCosmosClient.instances) == 1
+    assert all(container is containers[0] for container in containers)
+
+
+def test_close_clients_releases_the_client(monkeypatch):
+    use_fake_client(monkeypatch)
+
+    async def scenario():
+        await cosmosdb_helper.get_container()
+        await cosmosdb_helper.close_clients()
+        return await cosmosdb_helper.get_container()
+
+    asyncio.run(scenario())
+
+    assert [client.closed for client in FakeCosmosClient.instances] == [True, False]
+
+
+class RecordingContainer:
+    """Records the queries it is sent and fails every query when error is set."""
+
+    def __init__(self, items=(), error=None):
+        self.items = list(items)
+        self.error = error
+        self.queries = []
+
+    def query_items(self, query, parameters):
+        self.queries.append((query, {parameter["name"]: parameter["value"] for parameter in parameters}))
+
+        async def iterate():
+            if self.error is not None:
+                raise self.error
+            for item in self.items:
+                yield item
+        return iterate()
+
+
+def use_container(monkeypatch, container):
+    async def get_container():
+        return container
+
+    async def get_query_embedding(search_query):
+        return [0.25, 0.5]
+
+    monkeypatch.setattr(cosmosdb_helper, "get_container", get_container)
+    monkeypatch.setattr(cosmosdb_helper, "get_query_embedding", get_query_embedding)
+
+
+def test_full_text_literal_escapes_quotes():
+    assert cosmosdb_helper.full_text_literal("what's a \"chargeback\"?") == '"what\'s a \\"chargeback\\"?"'
+
+
+def test_fulltext_query_with_quotes(monkeypatch):
+    container = RecordingContainer([{"id": "1", "fileName": "refunds.txt", "content": "..."}])
+    use_container(monkeypatch, container)
+
+    results = asyncio.run(cosmosdb_helper.get_fulltext_search_results("what's a refund", top_k=3))
+
+    query, parameters = container.queries[0]
+    assert results == container.items
+    assert "FullTextScore(c.content, \"what's a refund\")" in query
+    assert parameters == {"@top_k": 3}
+
+
+def test_rrf_query_passes_the_embedding_as_a_parameter(monkeypatch):
+    container = RecordingContainer([{"id": "1", "fileName": "refunds.txt", "content": "...", "chunkIndex": 2,
+                                     "duplicateFileNames": ["refunds-copy.txt"]}])
+    use_container(monkeypatch, container)
+
+    results = asyncio.run(cosmosdb_helper.search_with_rrf("what's a refund", top_k=3))
+
+    query, parameters = container.queries[0]
+    assert [(result.fileName, result.chunkIndex) for result in results] == [("refunds.txt", 2)]
+    assert results[0].duplicateFileNames == ["refunds-copy.txt"]
+    assert "c.duplicateFileNames" in query
+    assert "VectorDistance(c.contentVector, @embedding)" in query
+    assert "0.25" not in query
+    assert parameters == {"@top_k": 3, "@embedding": [0.25, 0.5]}
+
+
+def test_query_errors_give_no_results_unless_raise_errors(monkeypatch):
+    use_container(monkeypatch, RecordingContainer(error=RuntimeError("syntax error")))
+
+    assert asyncio.run(cosmosdb_helper.get_fulltext_search_results("refund")) == []
+    assert asyncio.run(cosmosdb_helper.search_with_rrf("refund")) == []
+    with pytest.raises(RuntimeError):
+        asyncio.run(cosmosdb_helper.get_fulltext_search_results("refund", raise_errors=True))
+    with pytest.raises(RuntimeError):
+        asyncio.run(cosmosdb_helper.search_with_rrf("refund", raise_errors=True))
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from semantic_kernel_framework import embedding_cache
+from semantic_kernel_framework.embedding_cache import EmbeddingCache, make_cache_key, normalize_query
+
+
+def test_equivalent_queries_share_a_key():
+    assert normalize_query("  How do I  open a DISPUTE? ") == "how do i open a dispute"
+    assert make_cache_key("How do I open a dispute?", "ada") == make_cache_key("how do i open a dispute", "ada")
+    assert make_cache_key("open a dispute", "ada") != make_cache_key("open a dispute", "text-embedding-3-small")
+
+
+def test_get_or_create_embeds_once():
+    cache = EmbeddingCache()
+    calls = []
+
+    async def create():
+        calls.append(1)
+        return [0.5, 0.25]
+
+    async def lookups():
+        return [await cache.get_or_create(text, "ada", create) for text in ("Refund status?", "refund status")]
+
+    assert asyncio.run(lookups()) == [[0.5, 0.25], [0.5, 0.25]]
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("a", "ada", [1.0])
+    cache.put("b", "ada", [2.0])
+    cache.get("a", "ada")
+    cache.put("c", "ada", [3.0])
+
+    assert cache.get("b", "ada") is None
+    assert cache.get("a", "ada") == [1.0]
+    assert cache.evictions == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now[0])
+    cache = EmbeddingCache(ttl_seconds=60)
+    cache.put("a", "ada", [1.0])
+
+    now[0] += 61
+
+    assert cache.get("a", "ada") is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(disk_path=path).put("close my account", "ada", [0.25, 0.5])
+
+    cache = EmbeddingCache(disk_path=path)
+
+    assert cache.get("Close my account?", "ada") == pytest.approx([0.25, 0.5])
+    assert cache.disk_hits == 1
@@ -0,0 +1,105 @@
+import json
+
+from semantic_kernel_framework import vector_store
+from vector_indexing.embedding_checkpoint import (EmbeddingCheckpoint, content_hash, diff_manifest,
+                                                  read_manifest, rows_changed, stable_doc_id, write_manifest)
+
+
+def make_doc(file_name, content, vector=None):
+    doc = {"id": stable_doc_id(file_name), "fileName": file_name, "content": content, "contentHash": content_hash(content)}
+    if vector is not None:
+        doc["contentVector"] = vector
+    return doc
+
+
+def test_ids_and_hashes_are_stable():
+    assert stable_doc_id("refunds.txt") == stable_doc_id("refunds.txt")
+    assert stable_doc_id("refunds.txt") != stable_doc_id("disputes.txt")
+    assert content_hash("refund") == content_hash("refund") != content_hash("refunds")
+
+
+def test_appended_embeddings_are_found_after_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = EmbeddingCheckpoint(path, "ada")
+    refunds, disputes = make_doc("refunds.txt", "refund", [0.1, 0.2]), make_doc("disputes.txt", "dispute")
+    # documents whose embedding failed are left out
+    checkpoint.append([refunds, disputes])
+
+    resumed = EmbeddingCheckpoint(path, "ada")
+
+    assert resumed.load() == 1
+    assert resumed.lookup(refunds) == [0.1, 0.2]
+    assert resumed.lookup(disputes) is None
+    # the same content embedded with another model is not reused
+    assert EmbeddingCheckpoint(path, "text-embedding-3-small").lookup(refunds) is None
+
+
+def test_resume_skips_a_truncated_last_line(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = EmbeddingCheckpoint(str(path), "ada")
+    checkpoint.append([make_doc("a.txt", "a", [1.0]), make_doc("b.txt", "b", [2.0])])
+    # a crash in the middle of the next write
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"contentHash": "' + content_hash("c") + '", "model": "ada", "contentVec')
+
+    resumed = EmbeddingCheckpoint(str(path), "ada")
+
+    assert resumed.load() == 2
+    assert resumed.lookup(make_doc("b.txt", "b")) == [2.0]
+    assert resumed.lookup(make_doc("c.txt", "c")) is None
+
+
+def test_compact_keeps_only_live_entries_of_the_current_model(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    EmbeddingCheckpoint(str(path), "old-model").append([make_doc("a.txt", "a", [9.0])])
+    checkpoint = EmbeddingCheckpoint(str(path), "ada")
+    checkpoint.append([make_doc("a.txt", "a", [1.0]), make_doc("b.txt", "b", [2.0])])
+    checkpoint.load()
+
+    checkpoint.compact([content_hash("a")])
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(line["contentHash"], line["model"], line["contentVector"]) for line in lines] == [(content_hash("a"), "ada", [1.0])]
+    assert checkpoint.lookup(make_doc("b.txt", "b")) is None
+    reloaded = EmbeddingCheckpoint(str(path), "ada")
+    assert reloaded.load() == 1
+
+
+def test_seed_from_an_existing_vector_store(tmp_path):
+    base = str(tmp_path / "docs_vectors")
+    vector_store.write_vector_store(base, [make_doc("a.txt", "a", [1.0, 0.0]), make_doc("b.txt", "b", [0.0, 1.0])])
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = EmbeddingCheckpoint(path, "ada")
+    checkpoint.append([make_doc("a.txt", "a", [1.0, 0.0])])
+
+    assert checkpoint.seed_from_vector_store(base) == 1
+    assert checkpoint.lookup(make_doc("b.txt", "b")) == [0.0, 1.0]
+    assert EmbeddingCheckpoint(path, "ada").load() == 2
+    assert checkpoint.seed_from_vector_store(str(tmp_path / "missing")) == 0
+
+
+def test_diff_manifest_counts_new_changed_unchanged_and_removed(tmp_path):
+    base = str(tmp_path / "docs_vectors")
+    assert read_manifest(base) is None
+    write_manifest(base, [make_doc("a.txt", "a"), make_doc("b.txt", "b"), make_doc("c.txt", "c")], "ada")
+    previous = read_manifest(base)
+    docs = [make_doc("a.txt", "a"), make_doc("b.txt", "b, edited"), make_doc("d.txt", "d")]
+
+    assert [entry["row"] for entry in previous["documents"]] == [0, 1, 2]
+    assert diff_manifest(previous, docs, "ada") == {"new": 1, "changed": 1, "unchanged": 1, "removed": 1}
+    # a new embedding model makes every document new
+    assert diff_manifest(previous, docs, "text-embedding-3-small") == {"new": 3, "changed": 0, "unchanged": 0, "removed": 0}
+    assert diff_manifest(None, docs, "ada")["new"] == 3
+
+
+def test_merged_duplicates_changing_needs_a_rewrite_but_no_embedding(tmp_path):
+    base = str(tmp_path / "store")
+    docs = [make_doc("a.txt", "a"), make_doc("b.txt", "b")]
+    write_manifest(base, docs, "ada")
+    previous = read_manifest(base)
+
+    assert not rows_changed(previous, docs)
+    merged = [{**docs[0], "duplicateFileNames": ["a-copy.txt"]}, docs[1]]
+    assert rows_changed(previous, merged)
+    assert diff_manifest(previous, merged, "ada")["unchanged"] == 2
+    assert rows_changed(previous, docs[:1])
@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+from openai import APIStatusError
+
+from vector_indexing.embedding_pipeline import (MAX_INPUT_TOKENS, EmbeddingPipeline,
+                                                truncate_for_embedding)
+
+
+class FakeEmbeddings:
+    """Rejects any request containing a text that starts with "bad", like an input over the limit."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, input, model):
+        self.requests.append(list(input))
+        if any(text.startswith("bad") for text in input):
+            response = httpx.Response(400, request=httpx.Request("POST", "https://example.test/embeddings"))
+            raise APIStatusError("input too long", response=response, body=None)
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(text))])
+                                     for i, text in enumerate(input)])
+
+
+def make_pipeline(**kwargs):
+    client = SimpleNamespace(embeddings=FakeEmbeddings())
+    return EmbeddingPipeline(client, "test-model", max_concurrency=1, **kwargs), client.embeddings
+
+
+def test_rejected_input_fails_only_its_document(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pipeline, _ = make_pipeline()
+    docs = [{"id": str(i), "content": "bad text" if i == 5 else f"text {i}"} for i in range(8)]
+
+    result = asyncio.run(pipeline.embed_documents(docs))
+
+    assert [doc["id"] for doc in result] == [str(i) for i in range(8)]
+    failed = [doc["id"] for doc in result if doc["contentVector"] is None]
+    assert failed == ["5"]
+    assert "embedding_error" in result[5]
+    assert pipeline.stats["failed"] == 1
+    assert pipeline.stats["documents"] == 7
+    assert (tmp_path / "embedding_error.log").read_text().splitlines() == ["5: input too long"]
+
+
+def test_successful_batch_is_sent_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pipeline, embeddings = make_pipeline()
+    docs = [{"id": str(i), "content": f"text {i}"} for i in range(4)]
+
+    asyncio.run(pipeline.embed_documents(docs))
+
+    assert len(embeddings.requests) == 1
+    assert pipeline.stats["splits"] == 0
+
+
+def test_short_text_is_not_truncated():
+    text = "hello world " * 100
+    assert truncate_for_embedding(text) == text
+
+
+def test_dense_text_is_truncated_below_the_limit():
+    cjk = "支付" * MAX_INPUT_TOKENS
+    truncated = truncate_for_embedding(cjk)
+    # one token per character is already pessimistic for CJK
+    assert len(truncated) < MAX_INPUT_TOKENS
+
+    code = "x=1;" * MAX_INPUT_TOKENS
+    truncated = truncate_for_embedding(code)
+    assert len(truncated) // 3 < MAX_INPUT_TOKENS
+    assert code.startswith(truncated)
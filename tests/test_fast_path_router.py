@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from semantic_kernel_framework.fast_path_router import FastPathRouter
+
+KB = ["How do I open a dispute?", "How do I get a refund?"]
+OFF_TOPIC = ["Tell me a joke", "What's the weather like tomorrow?"]
+VECTORS = {
+    KB[0]: [1.0, 0.0, 0.0],
+    KB[1]: [0.0, 1.0, 0.0],
+    OFF_TOPIC[0]: [0.0, 0.0, 1.0],
+    OFF_TOPIC[1]: [0.0, 0.8, 0.6],
+    # close to the dispute exemplar and far from anything off-topic
+    "how can I open a dispute please": [0.98, 0.0, 0.2],
+    # close to the refund exemplar, but about as close to the weather exemplar
+    "refund or weather, which one is it": [0.0, 0.95, 0.3122],
+    # not close to any KB exemplar
+    "please tell me something funny now": [0.1, 0.0, 0.99],
+}
+
+
+def make_router(embedded=None, **kwargs):
+    async def embed(text):
+        if embedded is not None:
+            embedded.append(text)
+        return VECTORS[text]
+
+    return FastPathRouter(embed, "account_agent", "transaction_agent", "rag_agent",
+                          kb_exemplars=KB, off_topic_exemplars=OFF_TOPIC, **kwargs)
+
+
+def route(router, query):
+    return asyncio.run(router.route(query))
+
+
+@pytest.mark.parametrize("query, agent", [
+    ("What is the balance of account A1234567890?", "account_agent"),
+    ("saldo de la cuenta XYZ7890123456", "account_agent"),
+    ("show the transactions of A1234567890", "transaction_agent"),
+    ("últimos movimientos de A1234567890", "transaction_agent"),
+])
+def test_account_number_with_balance_or_transaction_wording_is_routed_by_rules(query, agent):
+    embedded = []
+    decision = route(make_router(embedded), query)
+
+    assert decision.agent_name == agent
+    assert decision.confidence == 1.0
+    assert embedded == []
+
+
+@pytest.mark.parametrize("query", [
+    "balance and transactions of A1234567890",
+    "What is my balance?",
+    "tell me about A1234567890",
+])
+def test_ambiguous_or_incomplete_account_questions_fall_back(query):
+    embedded = []
+    decision = route(make_router(embedded), query)
+
+    assert not decision.is_fast_path
+    # personal questions are left to the triage agent without embedding them
+    assert embedded == []
+
+
+def test_question_close_to_a_kb_exemplar_goes_to_the_rag_agent():
+    decision = route(make_router(threshold=0.9, margin=0.03), "how can I open a dispute please")
+
+    assert decision.agent_name == "rag_agent"
+    assert decision.confidence == pytest.approx(0.98 / (0.98 ** 2 + 0.2 ** 2) ** 0.5)
+
+
+def test_kb_match_without_margin_over_off_topic_falls_back():
+    router = make_router(threshold=0.9, margin=0.03)
+
+    assert route(router, "refund or weather, which one is it").agent_name is None
+    # the same question is routed once the margin allows it
+    assert route(make_router(threshold=0.9, margin=0.0), "refund or weather, which one is it").agent_name == "rag_agent"
+
+
+def test_question_below_the_threshold_falls_back():
+    assert route(make_router(threshold=0.9), "please tell me something funny now").agent_name is None
+
+
+def test_short_follow_ups_are_not_embedded():
+    embedded = []
+
+    assert route(make_router(embedded), "and in Spanish?").agent_name is None
+    assert embedded == []
+
+
+def test_exemplars_are_embedded_once():
+    embedded = []
+    router = make_router(embedded)
+    route(router, "how can I open a dispute please")
+    route(router, "please tell me something funny now")
+
+    assert sorted(embedded) == sorted(KB + OFF_TOPIC + ["how can I open a dispute please", "please tell me something funny now"])
+
+
+def test_embedding_failure_falls_back_to_triage():
+    async def embed(text):
+        raise RuntimeError("embedding endpoint unavailable")
+
+    router = FastPathRouter(embed, "account_agent", "transaction_agent", "rag_agent", kb_exemplars=KB, off_topic_exemplars=OFF_TOPIC)
+
+    assert route(router, "how can I open a dispute please").agent_name is None
+
+
+def test_stats_count_routed_turns_and_fallbacks():
+    router = make_router()
+    route(router, "What is the balance of account A1234567890?")
+    route(router, "how can I open a dispute please")
+    route(router, "how can I open a dispute please")
+    route(router, "and in Spanish?")
+
+    assert router.stats() == {
+        "decisions": 4,
+        "fallbacks": 1,
+        "hit_rate": 0.75,
+        "routed": {"account_agent": 1, "rag_agent": 2},
+    }
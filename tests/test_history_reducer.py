@@ -0,0 +1,85 @@
+import asyncio
+
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.contents import (AuthorRole, ChatMessageContent, FunctionCallContent,
+                                      FunctionResultContent)
+
+from semantic_kernel_framework.history_reducer import (SUMMARY_METADATA_KEY, TokenBudgetHistoryReducer,
+                                                       estimate_history_tokens)
+
+
+def turn(question, answer, tool_result=None):
+    messages = [ChatMessageContent(role=AuthorRole.USER, content=question)]
+    if tool_result is not None:
+        messages.append(ChatMessageContent(role=AuthorRole.ASSISTANT, items=[
+            FunctionCallContent(id="call", name="get_account_info_agent", arguments="{}")]))
+        messages.append(ChatMessageContent(role=AuthorRole.TOOL, items=[
+            FunctionResultContent(id="call", name="get_account_info_agent", result=tool_result)]))
+    messages.append(ChatMessageContent(role=AuthorRole.ASSISTANT, content=answer))
+    return messages
+
+
+def history(turns):
+    return [message for t in turns for message in t]
+
+
+class FakeSummarizer(ChatCompletionClientBase):
+    async def get_chat_message_content(self, chat_history, settings, **kwargs):
+        return ChatMessageContent(role=AuthorRole.ASSISTANT, content="the customer asked about their account")
+
+
+def test_history_under_budget_is_left_alone():
+    reducer = TokenBudgetHistoryReducer(messages=history([turn("hi", "hello")]), max_tokens=1000)
+
+    assert asyncio.run(reducer.reduce()) is None
+    assert len(reducer.messages) == 2
+
+
+def test_old_tool_results_are_truncated_first():
+    old = turn("balance?", "It is 10 USD.", tool_result="x" * 4000)
+    reducer = TokenBudgetHistoryReducer(
+        messages=history([old, turn("thanks", "welcome"), turn("bye", "bye")]),
+        max_tokens=500, keep_recent_turns=2, max_tool_result_chars=100)
+
+    assert asyncio.run(reducer.reduce()) is reducer
+
+    result = reducer.messages[2].items[0].result
+    assert result.startswith("x" * 100) and "[truncated 3900 chars]" in result
+    assert reducer.last_reduction["messages_removed"] == 0
+    assert estimate_history_tokens(reducer.messages) <= 500
+
+
+def test_old_turns_are_removed_at_user_boundaries():
+    turns = [turn(f"question {i} " + "q" * 400, f"answer {i} " + "a" * 400) for i in range(6)]
+    reducer = TokenBudgetHistoryReducer(messages=history(turns), max_tokens=700, keep_recent_turns=2)
+
+    asyncio.run(reducer.reduce())
+
+    assert reducer.messages[0].role == AuthorRole.USER
+    assert reducer.messages[-4].content.startswith("question 4")
+    assert estimate_history_tokens(reducer.messages) <= 700
+    assert reducer.last_reduction["tokens_saved"] > 0
+
+
+def test_recent_turns_are_never_removed():
+    turns = [turn("q" * 2000, "a" * 2000) for _ in range(2)]
+    reducer = TokenBudgetHistoryReducer(messages=history(turns), max_tokens=100, keep_recent_turns=2)
+
+    asyncio.run(reducer.reduce())
+
+    assert len(reducer.messages) == 4
+
+
+def test_removed_turns_are_summarized():
+    turns = [turn(f"question {i} " + "q" * 400, f"answer {i} " + "a" * 400) for i in range(4)]
+    reducer = TokenBudgetHistoryReducer(messages=history(turns), max_tokens=600, keep_recent_turns=1,
+                                        service=FakeSummarizer(ai_model_id="fake"))
+
+    asyncio.run(reducer.reduce())
+
+    summary = reducer.messages[0]
+    assert summary.metadata[SUMMARY_METADATA_KEY]
+    assert "the customer asked about their account" in summary.content
+    # the two oldest turns free enough tokens
+    assert reducer.messages[1].content.startswith("question 2")
+    assert reducer.last_reduction["summarized"]
@@ -0,0 +1,24 @@
+from vector_indexing.load_aisearch import add_missing_fields
+
+SCHEMA = {"fields": [{"name": "id", "type": "Edm.String", "key": True},
+                     {"name": "content", "type": "Edm.String", "searchable": True},
+                     {"name": "duplicateFileNames", "type": "Collection(Edm.String)", "filterable": True}]}
+
+
+def test_missing_fields_are_appended_to_the_existing_definition():
+    existing = {"@odata.context": "https://search/$metadata#indexes/$entity", "@odata.etag": "\"0x1\"",
+                "name": "docs", "fields": [{"name": "id", "type": "Edm.String", "key": True},
+                                           {"name": "content", "type": "Edm.String", "searchable": False}]}
+
+    assert add_missing_fields(existing, SCHEMA) == ["duplicateFileNames"]
+    assert [field["name"] for field in existing["fields"]] == ["id", "content", "duplicateFileNames"]
+    # existing fields are left as they are
+    assert existing["fields"][1]["searchable"] is False
+    assert "@odata.etag" not in existing and existing["name"] == "docs"
+
+
+def test_up_to_date_index_needs_no_update():
+    existing = {"name": "docs", "fields": [dict(field) for field in SCHEMA["fields"]]}
+
+    assert add_missing_fields(existing, SCHEMA) == []
+    assert existing["fields"] == SCHEMA["fields"]
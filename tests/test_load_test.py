@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+from benchmarks import load_test
+
+
+@pytest.mark.parametrize("p", [0, 25, 50, 95, 99, 100])
+def test_percentile_matches_numpy(p):
+    values = [0.8, 0.1, 2.5, 0.4, 1.2, 0.9, 3.3]
+
+    assert load_test.percentile(values, p) == pytest.approx(np.percentile(values, p))
+
+
+def test_distribution_ignores_missing_values():
+    summary = load_test.distribution([1.0, None, 3.0])
+
+    assert summary["count"] == 2
+    assert summary["mean"] == 2.0 and summary["p50"] == 2.0 and summary["max"] == 3.0
+    assert load_test.distribution([])["p95"] is None
+
+
+def chat_server(body_lines, status_code=200):
+    def handler(request):
+        assert json.loads(request.content)["conversation_id"] == "c1"
+        return httpx.Response(status_code, content="".join(body_lines).encode("utf-8"))
+    return httpx.MockTransport(handler)
+
+
+def send_turn(transport, stream_format):
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await load_test.send_turn(client, "http://test/multi_agent_chat/", {"name": "dispute", "turns": ["hi"]},
+                                             0, "c1", stream_format, timeout=5)
+    return asyncio.run(scenario())
+
+
+def test_text_turn_counts_tokens_of_the_answer():
+    record = send_turn(chat_server(["Open a dispute ", "from the Resolution Center."]), "text")
+
+    assert record["error"] is None and record["status"] == 200
+    assert record["characters"] == len("Open a dispute from the Resolution Center.")
+    assert record["tokens"] == 11
+    assert record["ttft"] is not None and record["total"] >= record["ttft"]
+
+
+def test_ndjson_turn_records_the_server_timings():
+    events = [
+        {"type": "tool_call", "name": "get_search_results"},
+        {"type": "token", "text": "Open a dispute."},
+        {"type": "final", "ttft_ms": 850.0, "total_ms": 1200.0, "tool_calls": 1},
+    ]
+    record = send_turn(chat_server([json.dumps(event) + "\n" for event in events]), "ndjson")
+
+    assert record["error"] is None
+    assert record["characters"] == len("Open a dispute.")
+    assert record["server_ttft"] == 0.85 and record["server_total"] == 1.2 and record["tool_calls"] == 1
+
+
+def test_server_errors_and_empty_answers_are_errors():
+    assert send_turn(chat_server(["Internal error"], status_code=500), "text")["error"] == "HTTP 500"
+    assert send_turn(chat_server([]), "text")["error"] == "empty answer"
+    error_event = json.dumps({"type": "error", "message": "model unavailable"}) + "\n"
+    assert send_turn(chat_server([error_event]), "ndjson")["error"] == "server: model unavailable"
+
+
+def test_summary_counts_errors_by_kind():
+    records = [
+        {"error": None, "ttft": 0.5, "total": 1.0, "tokens": 10, "tokens_per_second": 20.0},
+        {"error": None, "ttft": 1.5, "total": 3.0, "tokens": 30, "tokens_per_second": 20.0},
+        {"error": "HTTP 500", "ttft": None, "total": 0.1, "tokens": 0, "tokens_per_second": None},
+        {"error": "ReadTimeout: timed out", "ttft": None, "total": 120.0, "tokens": 0, "tokens_per_second": None},
+    ]
+
+    summary = load_test.summarize(records, elapsed=10.0)
+
+    assert summary["turns"] == 4 and summary["errors"] == 2 and summary["error_rate"] == 0.5
+    assert summary["errors_by_kind"] == {"HTTP 500": 1, "ReadTimeout": 1}
+    assert summary["ttft_seconds"]["p50"] == 1.0
+    assert summary["output_tokens_per_second"] == 4.0
+    assert "server_ttft_seconds" not in summary
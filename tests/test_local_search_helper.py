@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+import pytest
+
+from semantic_kernel_framework import bm25_index, vector_store
+from semantic_kernel_framework import local_search_helper as helper
+from semantic_kernel_framework.local_search_helper import LocalVectorIndex
+
+RECORDS = [{"id": str(i), "fileName": f"doc{i}.txt", "content": f"document {i}"} for i in range(6)]
+
+
+def brute_force(vectors, query, top_k):
+    """Reference ranking: cosine similarity of every row, fully sorted."""
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    scores = vectors @ query / norms / np.linalg.norm(query)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [int(row) for row in order], scores
+
+
+def test_search_returns_the_top_k_in_descending_order():
+    vectors = np.random.default_rng(7).normal(size=(200, 16)).astype(np.float32)
+    query = np.random.default_rng(8).normal(size=16).astype(np.float32)
+    index = LocalVectorIndex.from_records([{"id": str(i)} for i in range(200)], vectors)
+
+    hits = index.search(query, top_k=10)
+
+    expected_rows, expected_scores = brute_force(vectors, query, 10)
+    assert [row for row, _ in hits] == expected_rows
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert scores == pytest.approx([float(expected_scores[row]) for row in expected_rows], abs=1e-5)
+
+
+def test_inverse_norms_give_cosine_scores_without_normalizing_the_matrix():
+    vectors = np.array([[3, 0], [0, 0.5], [1, 1]], dtype=np.float32)
+    index = LocalVectorIndex.from_records(RECORDS[:3], vectors)
+
+    # the matrix is kept as it is, the norms are applied to the scores
+    assert np.array_equal(index.matrix, vectors)
+    assert index.inverse_norms == pytest.approx([1 / 3, 2, 1 / np.sqrt(2)])
+    assert index.search(np.array([2, 0], dtype=np.float32), top_k=3) == [
+        (0, pytest.approx(1.0)), (2, pytest.approx(1 / np.sqrt(2))), (1, pytest.approx(0.0))]
+
+
+def test_zero_norm_rows_score_zero():
+    vectors = np.array([[0, 0], [1, 0], [-1, 0]], dtype=np.float32)
+    index = LocalVectorIndex.from_records(RECORDS[:3], vectors)
+
+    assert index.inverse_norms[0] == 1.0
+    hits = dict(index.search(np.array([1, 0], dtype=np.float32), top_k=3))
+    assert hits[0] == 0.0
+    assert hits[1] == pytest.approx(1.0)
+    assert hits[2] == pytest.approx(-1.0)
+    # a zero query matches nothing better than anything else, but does not divide by zero
+    assert all(score == 0.0 for _, score in index.search(np.zeros(2, dtype=np.float32), top_k=3))
+
+
+def test_search_batch_matches_search_row_by_row():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    vectors[4] = 0
+    queries = rng.normal(size=(5, 8)).astype(np.float32)
+    index = LocalVectorIndex.from_records([{"id": str(i)} for i in range(50)], vectors)
+
+    batch = index.search_batch(queries, top_k=7)
+
+    assert len(batch) == 5
+    for query, hits in zip(queries, batch):
+        single = index.search(query, top_k=7)
+        assert [row for row, _ in hits] == [row for row, _ in single]
+        assert [score for _, score in hits] == pytest.approx([score for _, score in single], abs=1e-6)
+
+
+def test_top_k_larger_than_the_index_and_empty_index():
+    vectors = np.eye(3, dtype=np.float32)
+    index = LocalVectorIndex.from_records(RECORDS[:3], vectors)
+
+    assert [row for row, _ in index.search(vectors[1], top_k=10)][0] == 1
+    assert len(index.search(vectors[1], top_k=10)) == 3
+    assert [len(hits) for hits in index.search_batch(vectors, top_k=10)] == [3, 3, 3]
+
+    empty = LocalVectorIndex.from_records([], np.zeros((0, 0), dtype=np.float32))
+    assert empty.search(np.ones(3, dtype=np.float32)) == []
+    assert empty.search_batch(np.ones((2, 3), dtype=np.float32)) == [[], []]
+
+
+def test_query_dimension_must_match():
+    index = LocalVectorIndex.from_records(RECORDS[:3], np.eye(3, dtype=np.float32))
+
+    with pytest.raises(ValueError):
+        index.search(np.ones(4, dtype=np.float32))
+
+
+def test_vector_store_is_searched_memory_mapped(tmp_path):
+    base = str(tmp_path / "docs_vectors")
+    vectors = np.random.default_rng(5).normal(size=(6, 4)).astype(np.float32)
+    records = [{**record, "contentVector": vector.tolist()} for record, vector in zip(RECORDS, vectors)]
+    records[2]["duplicateFileNames"] = ["doc2-copy.txt"]
+    vector_store.write_vector_store(base, records)
+
+    index = LocalVectorIndex.from_path(base)
+    hits = index.search(vectors[2], top_k=2)
+
+    assert isinstance(index.matrix, np.memmap)
+    assert hits[0][0] == 2
+    results = index.to_search_results(hits)
+    assert (results[0].fileName, results[0].duplicateFileNames) == ("doc2.txt", ["doc2-copy.txt"])
+    assert results[1].duplicateFileNames is None
+
+
+def test_rank_fuses_lexical_and_vector_hits(monkeypatch):
+    lexical = bm25_index.BM25Index.build(["refund a payment", "open a dispute", "reset password"])
+    monkeypatch.setattr(helper, "local_search_mode", "hybrid")
+    monkeypatch.setattr(helper, "get_bm25_index", lambda: lexical)
+
+    # the vector ranking prefers row 2, but only row 1 also matches "dispute" lexically
+    fused = helper.rank("dispute", [(2, 0.9), (1, 0.8), (0, 0.1)], top_k=2)
+
+    assert [row for row, _ in fused] == [1, 2]
+
+
+def test_rank_without_hybrid_keeps_the_vector_order(monkeypatch):
+    monkeypatch.setattr(helper, "local_search_mode", "vector")
+    monkeypatch.setattr(helper, "get_bm25_index", lambda: pytest.fail("BM25 is not used in vector mode"))
+
+    assert helper.rank("dispute", [(2, 0.9), (1, 0.8), (0, 0.1)], top_k=2) == [(2, 0.9), (1, 0.8)]
+    assert helper.candidate_depth(5) == 5
+
+
+def test_indexes_reload_when_the_store_is_rewritten(tmp_path, monkeypatch):
+    base = str(tmp_path / "docs_vectors")
+    vectors = np.eye(3, dtype=np.float32)
+    contents = ["refund a payment", "open a dispute", "reset password"]
+    vector_store.write_vector_store(base, [{**record, "content": content, "contentVector": vector.tolist()}
+                                           for record, content, vector in zip(RECORDS, contents, vectors)])
+    bm25_index.build_index_for_store(base)
+    monkeypatch.setattr(helper, "vector_file_path", base)
+    monkeypatch.setattr(helper, "_local_index", None)
+    monkeypatch.setattr(helper, "_bm25_index", None)
+
+    first = helper.get_local_index()
+    assert helper.get_local_index() is first
+    assert helper.get_bm25_index().search("dispute", top_k=1)[0][0] == 1
+
+    # same number of rows, new content; the sidecar BM25 index is now older than the store
+    vector_store.write_vector_store(base, [{**record, "content": content, "contentVector": vector.tolist()}
+                                           for record, content, vector in zip(RECORDS, reversed(contents), vectors)])
+    os.utime(vector_store.matrix_path(base), ns=(1, os.stat(bm25_index.index_path(base)).st_mtime_ns + 1))
+
+    assert helper.get_local_index() is not first
+    assert helper.get_local_index().get_record(0)["content"] == "reset password"
+    assert helper.get_bm25_index().search("password", top_k=1)[0][0] == 0
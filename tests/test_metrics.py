@@ -0,0 +1,70 @@
+from semantic_kernel_framework.metrics import MetricsRegistry
+
+
+def render_lines(registry):
+    return registry.render().splitlines()
+
+
+def test_counter_and_labels_render():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_requests_total", "Requests.", ("route",))
+    counter.inc(route="/chat")
+    counter.inc(2, route='/a"b')
+
+    lines = render_lines(registry)
+
+    assert "# TYPE paypal_cs_test_requests_total counter" in lines
+    assert 'paypal_cs_test_requests_total{route="/chat"} 1' in lines
+    assert 'paypal_cs_test_requests_total{route="/a\\"b"} 2' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_results", "Results.", buckets=(1, 5), unit="1")
+    for value in (0, 3, 7):
+        histogram.observe(value)
+
+    lines = render_lines(registry)
+
+    assert 'paypal_cs_test_results_bucket{le="1"} 1' in lines
+    assert 'paypal_cs_test_results_bucket{le="5"} 2' in lines
+    assert 'paypal_cs_test_results_bucket{le="+Inf"} 3' in lines
+    assert "paypal_cs_test_results_sum 10" in lines
+    assert "paypal_cs_test_results_count 3" in lines
+
+
+def test_observed_counter_reads_its_callback():
+    registry = MetricsRegistry()
+    events = {"created": 3}
+    registry.observed_counter("test_events_total", "Events.", ("event",),
+                              lambda: {(event,): count for event, count in events.items()})
+    events["created"] = 5
+
+    lines = render_lines(registry)
+
+    assert "# TYPE paypal_cs_test_events_total counter" in lines
+    assert 'paypal_cs_test_events_total{event="created"} 5' in lines
+
+
+def test_stats_metrics_split_totals_from_ratios():
+    registry = MetricsRegistry()
+    stats = {"hits": 4, "misses": 1, "hit_rate": 0.8, "entries": 2, "enabled": True, "routed": {"a": 1}}
+    registry.stats_metrics("test_cache", "Cache lookups.", lambda: stats)
+
+    lines = render_lines(registry)
+
+    assert "# TYPE paypal_cs_test_cache_total counter" in lines
+    assert 'paypal_cs_test_cache_total{key="hits"} 4' in lines
+    assert 'paypal_cs_test_cache_total{key="misses"} 1' in lines
+    assert "# TYPE paypal_cs_test_cache gauge" in lines
+    assert 'paypal_cs_test_cache{key="hit_rate"} 0.8' in lines
+    assert 'paypal_cs_test_cache{key="entries"} 2' in lines
+    # booleans and nested dicts are not samples
+    assert not any("enabled" in line or "routed" in line for line in lines)
+
+
+def test_stats_metrics_without_ratios_has_no_gauge():
+    registry = MetricsRegistry()
+    registry.stats_metrics("test_prefetch", "Prefetch outcomes.", lambda: {"started": 2, "served": 1})
+
+    assert not any(line.startswith("# TYPE paypal_cs_test_prefetch gauge") for line in render_lines(registry))
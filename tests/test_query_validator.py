@@ -0,0 +1,46 @@
+import asyncio
+
+from semantic_kernel_framework.query_validator import (LocalQueryValidator, conversation_context,
+                                                       is_context_dependent)
+
+
+def make_validator(escalated):
+    async def embed(text):
+        return [1.0, 0.0]
+
+    async def escalate(query):
+        escalated.append(query)
+        return "escalated"
+
+    return LocalQueryValidator(embed, escalate)
+
+
+def test_follow_up_is_escalated_with_the_earlier_questions():
+    escalated = []
+    validator = make_validator(escalated)
+
+    async def validate():
+        conversation_context.set(("How do I open a dispute?",))
+        return await validator.validate_or_escalate("What about business accounts?")
+
+    assert asyncio.run(validate()) == "escalated"
+    assert "How do I open a dispute?" in escalated[0]
+    assert "What about business accounts?" in escalated[0]
+
+
+def test_first_question_is_not_escalated_for_context():
+    escalated = []
+    validator = make_validator(escalated)
+
+    # personal wording is classified without the centroids
+    result = asyncio.run(validator.validate_or_escalate("What is my account balance?"))
+
+    assert escalated == []
+    assert "Search Personal" in result
+
+
+def test_context_dependent_queries():
+    assert is_context_dependent("how long does it take?")
+    assert is_context_dependent("and for business accounts")
+    assert is_context_dependent("refund status")
+    assert not is_context_dependent("How do I get a refund for my purchase?")
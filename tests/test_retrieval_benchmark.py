@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# the benchmark scripts import each other as top-level modules, as when run from benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import retrieval_benchmark  # noqa: E402
+
+
+def test_score_query():
+    assert retrieval_benchmark.score_query(["a", "b", "c"], ["b"], k=3) == {"recall": 1.0, "hit": 1.0, "reciprocal_rank": 0.5}
+    assert retrieval_benchmark.score_query(["a", "b", "c"], ["c", "d"], k=2) == {"recall": 0.0, "hit": 0.0, "reciprocal_rank": 0.0}
+    assert retrieval_benchmark.score_query(["d", "a", "c"], ["c", "d"], k=3)["recall"] == 1.0
+    # a result also stands for the near-duplicates merged into it
+    assert retrieval_benchmark.score_query([["a"], ["b", "c"]], ["c", "d"], k=2) == {
+        "recall": 0.5, "hit": 1.0, "reciprocal_rank": 0.5}
+
+
+def test_golden_set_groups_copies_of_an_article(tmp_path):
+    (tmp_path / "how-do-i-get-a-refund-help100.txt").write_text("How do I get a refund? | PayPal US\nbody", encoding="utf-8")
+    (tmp_path / "how-do-i-get-a-refund-help900.txt").write_text("How do I get a refund? | PayPal US\ncopy", encoding="utf-8")
+    (tmp_path / "about-paypal.txt").write_text("About PayPal | PayPal US\nnot an article", encoding="utf-8")
+
+    golden = retrieval_benchmark.build_golden_set(str(tmp_path))
+
+    relevant = ["how-do-i-get-a-refund-help100.txt", "how-do-i-get-a-refund-help900.txt"]
+    assert golden == [
+        {"query": "How do I get a refund?", "relevant": relevant, "source": "title"},
+        {"query": "I want my money back for an order", "relevant": relevant, "source": "paraphrase"},
+    ]
+
+
+def test_run_backend_scores_distinct_files_and_counts_errors():
+    golden = [{"query": "refund", "relevant": ["refund.txt"]}, {"query": "dispute", "relevant": ["dispute.txt"]}]
+
+    async def search(query, top_k=5):
+        if query == "dispute":
+            raise RuntimeError("query failed")
+        # two passages of the same file count once
+        return [SimpleNamespace(fileName="other.txt"), {"fileName": "other.txt"}, {"fileName": "refund.txt"}][:top_k]
+
+    run = asyncio.run(retrieval_benchmark.run_backend("fake", search, golden, top_k=3, repeats=1))
+
+    assert run["errors"] == 1
+    assert run["per_query"][0]["files"] == ["other.txt", "refund.txt"]
+    assert run["recall"] == 0.5 and run["mrr"] == 0.25
+    assert run["latency_ms"]["count"] == 1
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(SystemExit):
+        retrieval_benchmark.resolve_backend("elastic")
+    search, module = retrieval_benchmark.resolve_backend("local-bm25")
+    assert search is retrieval_benchmark.local_bm25
+    assert module == "semantic_kernel_framework.local_search_helper"
+
+
+def test_run_backend_counts_merged_duplicates():
+    golden = [{"query": "refund", "relevant": ["refund-help100.txt", "refund-help900.txt"]}]
+
+    async def search(query, top_k=5):
+        return [{"fileName": "refund-help900.txt", "duplicateFileNames": ["refund-help100.txt"]},
+                SimpleNamespace(fileName="refund-help900.txt", duplicateFileNames=["refund-help100.txt"])]
+
+    run = asyncio.run(retrieval_benchmark.run_backend("fake", search, golden, top_k=1, repeats=1))
+
+    assert run["per_query"][0]["files"] == ["refund-help900.txt"]
+    assert run["recall"] == 1.0 and run["mrr"] == 1.0
@@ -0,0 +1,153 @@
+import asyncio
+from types import SimpleNamespace
+
+from azure.core.exceptions import HttpResponseError
+
+from vector_indexing.search_bulk_loader import SearchBulkLoader, document_size
+
+
+def doc(key, size=0):
+    return {"id": key, "content": "x" * size}
+
+
+def result(key, status_code):
+    return SimpleNamespace(key=key, succeeded=status_code in (200, 201), status_code=status_code, error_message=f"status {status_code}")
+
+
+class FlakySearchClient:
+    """Answers each upload with the next status listed for a key; the last one repeats, unlisted keys get 201."""
+
+    def __init__(self, statuses=None, request_errors=None):
+        self.statuses = {key: list(codes) for key, codes in (statuses or {}).items()}
+        self.request_errors = list(request_errors or [])
+        self.requests = []
+
+    async def upload_documents(self, documents):
+        self.requests.append([document["id"] for document in documents])
+        if self.request_errors:
+            raise self.request_errors.pop(0)
+        codes = [self.statuses.get(document["id"], [201]) for document in documents]
+        return [result(document["id"], statuses.pop(0) if len(statuses) > 1 else statuses[0])
+                for document, statuses in zip(documents, codes)]
+
+
+def test_batches_are_bounded_by_document_count():
+    loader = SearchBulkLoader(FlakySearchClient(), max_batch_documents=2)
+
+    batches = list(loader.make_batches(doc(str(i)) for i in range(5)))
+
+    assert [[d["id"] for d in batch] for batch in batches] == [["0", "1"], ["2", "3"], ["4"]]
+
+
+def test_batches_are_bounded_by_serialized_size():
+    size = document_size(doc("0", 100))
+    loader = SearchBulkLoader(FlakySearchClient(), max_batch_bytes=size * 2 + 1, max_batch_documents=100)
+
+    batches = list(loader.make_batches([doc("0", 100), doc("1", 100), doc("2", 100), doc("3", 1000), doc("4", 10)]))
+
+    # a document larger than the limit is still sent, on its own
+    assert [[d["id"] for d in batch] for batch in batches] == [["0", "1"], ["2"], ["3"], ["4"]]
+    assert loader.stats["bytes"] == sum(document_size(d) for batch in batches for d in batch)
+
+
+def test_limits_are_capped_at_the_service_maximum():
+    loader = SearchBulkLoader(FlakySearchClient(), max_batch_bytes=64 * 1024 * 1024, max_batch_documents=5000)
+
+    assert loader.max_batch_documents == 1000
+    assert loader.max_batch_bytes < 16 * 1024 * 1024
+
+
+def test_only_documents_that_failed_transiently_are_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FlakySearchClient({"b": [429, 201], "c": [503, 503, 201], "d": [400]})
+    loader = SearchBulkLoader(client, max_batch_documents=10, max_concurrency=1, max_backoff_seconds=0)
+
+    stats = asyncio.run(loader.upload([doc("a"), doc("b"), doc("c"), doc("d")]))
+
+    assert client.requests == [["a", "b", "c", "d"], ["b", "c"], ["c"]]
+    assert stats["documents"] == 3
+    assert stats["failed"] == 1 and stats["retries"] == 2
+    assert (tmp_path / "upload_error.log").read_text().startswith("d: 400")
+
+
+def test_documents_still_failing_after_max_retries_are_recorded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FlakySearchClient({"b": [429]})
+    loader = SearchBulkLoader(client, max_concurrency=1, max_retries=2, max_backoff_seconds=0)
+
+    stats = asyncio.run(loader.upload([doc("a"), doc("b")]))
+
+    assert client.requests == [["a", "b"], ["b"], ["b"]]
+    assert stats["documents"] == 1 and stats["failed"] == 1
+
+
+def test_throttled_request_is_retried_whole(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    throttled = HttpResponseError(message="Too many requests")
+    throttled.status_code = 429
+    rejected = HttpResponseError(message="Bad request")
+    rejected.status_code = 400
+    client = FlakySearchClient(request_errors=[throttled])
+    loader = SearchBulkLoader(client, max_concurrency=1, max_backoff_seconds=0)
+
+    assert asyncio.run(loader.upload([doc("a"), doc("b")]))["documents"] == 2
+    assert client.requests == [["a", "b"], ["a", "b"]]
+
+    client = FlakySearchClient(request_errors=[rejected])
+    loader = SearchBulkLoader(client, max_concurrency=1, max_backoff_seconds=0)
+
+    assert asyncio.run(loader.upload([doc("a"), doc("b")]))["failed"] == 2
+    assert client.requests == [["a", "b"]]
+
+
+class AsyncResults:
+    def __init__(self, items):
+        self.items = items
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self.items:
+            yield item
+
+
+class FakeSearchClient:
+    def __init__(self, keys):
+        self.index = {key: {"id": key} for key in keys}
+
+    async def upload_documents(self, documents):
+        for doc in documents:
+            self.index[doc["id"]] = doc
+        return [SimpleNamespace(key=doc["id"], succeeded=True, status_code=201, error_message=None) for doc in documents]
+
+    async def delete_documents(self, documents):
+        for doc in documents:
+            self.index.pop(doc["id"], None)
+        return [SimpleNamespace(key=doc["id"], succeeded=True, status_code=200, error_message=None) for doc in documents]
+
+    async def search(self, search_text, select):
+        return AsyncResults([{"id": key} for key in list(self.index)])
+
+
+def test_delete_stale_removes_only_documents_missing_from_the_upload():
+    # a random-uuid id from an old load, and a chunk the shortened document no longer has
+    client = FakeSearchClient(["3f0c-legacy", "doc-a-0000", "doc-a-0001", "doc-a-0002"])
+    loader = SearchBulkLoader(client, max_concurrency=2)
+
+    async def load():
+        await loader.upload([{"id": "doc-a-0000"}, {"id": "doc-a-0001"}, {"id": "doc-b-0000"}])
+        return await loader.delete_stale(loader.uploaded_keys)
+
+    deleted = asyncio.run(load())
+
+    assert deleted == 2
+    assert sorted(client.index) == ["doc-a-0000", "doc-a-0001", "doc-b-0000"]
+
+
+def test_delete_stale_keeps_everything_without_current_keys():
+    client = FakeSearchClient(["doc-a-0000"])
+    loader = SearchBulkLoader(client)
+
+    assert asyncio.run(loader.delete_stale([])) == 0
+    assert list(client.index) == ["doc-a-0000"]
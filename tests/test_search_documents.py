@@ -0,0 +1,27 @@
+from vector_indexing.search_documents import to_search_doc
+
+
+def test_whole_document_record():
+    doc = {"id": "d1", "fileName": "refund.txt", "content": "Refunds take five days.", "contentVector": None,
+           "contentHash": "abc"}
+
+    assert to_search_doc(doc) == {"id": "d1", "fileName": "refund.txt", "content": "Refunds take five days.",
+                                  "contentVector": []}
+
+
+def test_chunk_record_keeps_its_parent():
+    doc = {"id": "d1-1", "fileName": "refund.txt", "content": "five days.", "contentVector": [0.1, 0.2],
+           "parentId": "d1", "chunkIndex": 1}
+
+    search_doc = to_search_doc(doc)
+
+    assert search_doc["parentId"] == "d1" and search_doc["chunkIndex"] == 1
+    assert search_doc["contentVector"] == [0.1, 0.2]
+
+
+def test_merged_duplicates_are_kept():
+    doc = {"id": "d1-0", "fileName": "refund-help100.txt", "content": "...", "contentVector": [0.1],
+           "parentId": "d1", "chunkIndex": 0, "duplicateFileNames": ["refund-help900.txt"]}
+
+    assert to_search_doc(doc)["duplicateFileNames"] == ["refund-help900.txt"]
+    assert "duplicateFileNames" not in to_search_doc({**doc, "duplicateFileNames": []})
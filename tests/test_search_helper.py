@@ -0,0 +1,172 @@
+import asyncio
+import time
+
+import pytest
+from azure.core.exceptions import HttpResponseError
+from azure.search.documents.indexes.models import (ComplexField, SearchableField, SearchField,
+                                                   SearchFieldDataType, SimpleField)
+
+from semantic_kernel_framework import search_helper
+from semantic_kernel_framework.search_helper import IndexSchemaRegistry, is_stale_schema_error, split_index_fields
+
+
+class FakeFetch:
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    async def __call__(self, index_name):
+        self.calls.append(index_name)
+        await asyncio.sleep(self.delay)
+        return [f"content_v{len(self.calls)}", "fileName"], ["contentVector"]
+
+
+def http_error(status_code, message):
+    error = HttpResponseError(message=message)
+    error.status_code = status_code
+    return error
+
+
+def test_schema_is_fetched_once_and_cached():
+    fetch = FakeFetch()
+    registry = IndexSchemaRegistry(fetch, kb_version=lambda: "v1")
+
+    async def scenario():
+        return [await registry.get_fields("docs") for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [(["content_v1", "fileName"], ["contentVector"])] * 3
+    assert fetch.calls == ["docs"]
+    assert registry.cached_fields("docs") == ["content_v1", "fileName", "contentVector"]
+
+
+def test_concurrent_searches_share_one_fetch_per_index():
+    fetch = FakeFetch(delay=0.01)
+    registry = IndexSchemaRegistry(fetch, kb_version=lambda: "v1")
+
+    async def scenario():
+        await asyncio.gather(*(registry.get_fields(name) for name in ["docs", "docs", "faq", "docs", "faq"]))
+
+    asyncio.run(scenario())
+
+    assert sorted(fetch.calls) == ["docs", "faq"]
+
+
+def test_schema_is_refetched_after_the_ttl(monkeypatch):
+    offset = [0.0]
+    real_monotonic = time.monotonic
+    monkeypatch.setattr(search_helper.time, "monotonic", lambda: real_monotonic() + offset[0])
+    fetch = FakeFetch()
+    registry = IndexSchemaRegistry(fetch, ttl_seconds=60, kb_version=lambda: "v1")
+
+    asyncio.run(registry.get_fields("docs"))
+    offset[0] += 30
+    asyncio.run(registry.get_fields("docs"))
+    offset[0] += 31
+    fields = asyncio.run(registry.get_fields("docs"))
+
+    assert len(fetch.calls) == 2
+    assert fields[0][0] == "content_v2"
+
+
+def test_kb_rebuild_refetches_every_schema():
+    version = ["v1"]
+    fetch = FakeFetch()
+    registry = IndexSchemaRegistry(fetch, ttl_seconds=0, kb_version=lambda: version[0])
+    asyncio.run(registry.get_fields("docs"))
+    asyncio.run(registry.get_fields("faq"))
+
+    version[0] = "v2"
+    asyncio.run(registry.get_fields("docs"))
+    asyncio.run(registry.get_fields("faq"))
+
+    assert fetch.calls == ["docs", "faq", "docs", "faq"]
+
+
+def test_invalidate_one_index():
+    fetch = FakeFetch()
+    registry = IndexSchemaRegistry(fetch, kb_version=lambda: "v1")
+    asyncio.run(registry.get_fields("docs"))
+    asyncio.run(registry.get_fields("faq"))
+
+    registry.invalidate("docs")
+    asyncio.run(registry.get_fields("docs"))
+    asyncio.run(registry.get_fields("faq"))
+
+    assert fetch.calls == ["docs", "faq", "docs"]
+
+
+def test_fields_are_selected_by_type_and_vectors_by_dimensions():
+    fields = [
+        SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+        SearchableField(name="content"),
+        SimpleField(name="chunkIndex", type=SearchFieldDataType.Int32),
+        SimpleField(name="duplicateFileNames", type=SearchFieldDataType.Collection(SearchFieldDataType.String)),
+        SimpleField(name="internalNotes", type=SearchFieldDataType.String, hidden=True),
+        ComplexField(name="address", fields=[SimpleField(name="city", type=SearchFieldDataType.String)]),
+        SearchField(name="contentVector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+                    searchable=True, vector_search_dimensions=1536, vector_search_profile_name="profile"),
+        SearchField(name="embedding", type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+                    searchable=True, vector_search_dimensions=256, vector_search_profile_name="profile"),
+    ]
+
+    assert split_index_fields(fields) == (["id", "content", "chunkIndex", "duplicateFileNames"],
+                                          ["contentVector", "embedding"])
+
+
+@pytest.mark.parametrize("status_code, message, stale", [
+    (404, "The index 'docs' was not found.", True),
+    (400, "Invalid expression: Could not find a property named 'chunkIndex' on type 'search.document'.", True),
+    (400, "Invalid expression: syntax error at position 3.", False),
+    (403, "Forbidden", False),
+    (429, "Too many requests", False),
+    (503, "Service unavailable", False),
+])
+def test_stale_schema_errors(status_code, message, stale):
+    assert is_stale_schema_error(http_error(status_code, message), ["content", "chunkIndex"]) is stale
+
+
+def retrieve_with(monkeypatch, errors):
+    """retrieve_search_results with _search_index failing with errors, in order, before it succeeds."""
+    calls = []
+    invalidated = []
+
+    async def search_index(index_name, search_query, top_k):
+        calls.append(search_query)
+        if errors:
+            raise errors.pop(0)
+        return ["result"]
+
+    monkeypatch.setattr(search_helper, "_search_index", search_index)
+    monkeypatch.setattr(search_helper.index_schema_registry, "cached_fields", lambda name: ["content", "chunkIndex"])
+    monkeypatch.setattr(search_helper.index_schema_registry, "invalidate", invalidated.append)
+    return calls, invalidated
+
+
+def test_stale_schema_refreshes_and_retries_once(monkeypatch):
+    calls, invalidated = retrieve_with(monkeypatch, [http_error(400, "Could not find a property named 'chunkIndex'")])
+
+    results = asyncio.run(search_helper.retrieve_search_results("open a dispute", top_k=3))
+
+    assert results == ["result"]
+    assert len(calls) == 2
+    assert invalidated == [search_helper.index_name]
+
+
+def test_other_errors_are_raised_without_a_refresh(monkeypatch):
+    calls, invalidated = retrieve_with(monkeypatch, [http_error(429, "Too many requests")])
+
+    with pytest.raises(HttpResponseError):
+        asyncio.run(search_helper.retrieve_search_results("open a dispute"))
+
+    assert len(calls) == 1
+    assert invalidated == []
+
+
+def test_a_second_stale_schema_error_is_raised(monkeypatch):
+    calls, invalidated = retrieve_with(monkeypatch, [http_error(404, "not found"), http_error(404, "not found")])
+
+    with pytest.raises(HttpResponseError):
+        asyncio.run(search_helper.retrieve_search_results("open a dispute"))
+
+    assert len(calls) == 2
+    assert len(invalidated) == 1
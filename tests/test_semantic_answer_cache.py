@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from semantic_kernel_framework import semantic_answer_cache
+from semantic_kernel_framework.semantic_answer_cache import SemanticAnswerCache, looks_personal
+
+
+def make_cache(**kwargs):
+    return SemanticAnswerCache(kb_version=lambda: "v1", **kwargs)
+
+
+@pytest.mark.parametrize("query", [
+    "What is the balance of account A1234567890?",
+    "my account number is XYZ7890123456",
+    "show my last transactions",
+    "what were my recent card transactions",
+    "¿Cuál es mi saldo?",
+    "mis últimas transacciones",
+])
+def test_account_and_transaction_questions_look_personal(query):
+    assert looks_personal(query)
+
+
+@pytest.mark.parametrize("query", ["How do I open a dispute?", "How long does a refund take?", "What is a transaction fee?"])
+def test_generic_questions_do_not_look_personal(query):
+    assert not looks_personal(query)
+
+
+def test_personal_questions_are_not_cacheable():
+    cache = make_cache()
+
+    assert not cache.is_cacheable_query("what is my balance")
+    assert cache.is_cacheable_query("how do I open a dispute")
+    assert cache.stats()["skipped_personal"] == 1
+
+
+def test_close_embedding_hits_and_distant_one_misses():
+    cache = make_cache(threshold=0.95)
+    cache.store("How do I open a dispute?", [1.0, 0.0], "Go to the Resolution Center.")
+
+    assert cache.lookup([0.99, 0.05]).answer == "Go to the Resolution Center."
+    assert cache.lookup([0.0, 1.0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_empty_answers_are_not_stored():
+    cache = make_cache()
+    cache.store("How do I open a dispute?", [1.0, 0.0], "  ")
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["stores"] == 0
+
+
+def test_entries_expire(monkeypatch):
+    # entries take their creation time from the real clock, only the expiry check is moved forward
+    now = [time.time()]
+    monkeypatch.setattr(semantic_answer_cache.time, "time", lambda: now[0])
+    cache = make_cache(ttl_seconds=60)
+    cache.store("How do I open a dispute?", [1.0, 0.0], "Go to the Resolution Center.")
+
+    now[0] += 30
+    assert cache.lookup([1.0, 0.0]) is not None
+    now[0] += 31
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.store("a", [1.0, 0.0, 0.0], "answer a")
+    cache.store("b", [0.0, 1.0, 0.0], "answer b")
+    cache.lookup([1.0, 0.0, 0.0])
+    cache.store("c", [0.0, 0.0, 1.0], "answer c")
+
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0]).answer == "answer a"
+    assert cache.lookup([0.0, 0.0, 1.0]).answer == "answer c"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_kb_rebuild_drops_cached_answers():
+    version = ["v1"]
+    cache = SemanticAnswerCache(kb_version=lambda: version[0])
+    cache.store("How do I open a dispute?", [1.0, 0.0], "Go to the Resolution Center.")
+
+    version[0] = "v2"
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1
+    # answers stored after the rebuild are served again
+    cache.store("How do I open a dispute?", [1.0, 0.0], "Open it from Activity.")
+    assert cache.lookup([1.0, 0.0]).answer == "Open it from Activity."
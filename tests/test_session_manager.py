@@ -0,0 +1,95 @@
+import json
+
+from semantic_kernel_framework import AgentSessionManager
+from semantic_kernel_framework.AgentSessionManager import MultiAgentSessionManager
+from semantic_kernel_framework.session_store import SqliteSessionStore
+
+
+class FakeSession:
+    def __init__(self, size=100, turns=None):
+        self.size = size
+        self.turns = list(turns or [])
+
+    def approximate_size_bytes(self):
+        return self.size
+
+
+def use(manager, conversation_id):
+    session = manager.get_or_create_session(conversation_id)
+    manager.release_session(conversation_id)
+    return session
+
+
+def test_least_recently_used_session_is_evicted():
+    evicted = []
+    manager = MultiAgentSessionManager(FakeSession, max_sessions=2,
+                                       on_evict=[lambda cid, session, reason: evicted.append((cid, reason))])
+    use(manager, "a")
+    use(manager, "b")
+    use(manager, "a")
+    use(manager, "c")
+
+    assert evicted == [("b", "max_sessions")]
+    assert manager.get_metrics()["session_count"] == 2
+
+
+def test_session_with_a_turn_in_flight_is_not_evicted():
+    manager = MultiAgentSessionManager(FakeSession, max_sessions=1)
+    manager.get_or_create_session("a")
+    use(manager, "b")
+
+    assert "a" in manager._sessions
+    manager.release_session("a")
+    assert manager.get_metrics()["active_sessions"] == 0
+    assert manager.get_metrics()["session_count"] == 1
+
+
+def test_idle_sessions_are_evicted(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(AgentSessionManager.time, "monotonic", lambda: now[0])
+    manager = MultiAgentSessionManager(FakeSession, idle_ttl_seconds=60)
+    use(manager, "a")
+    now[0] += 30
+    use(manager, "b")
+    now[0] += 45
+
+    use(manager, "c")
+
+    assert list(manager._sessions) == ["b", "c"]
+    assert manager.evictions["idle"] == 1
+
+
+def test_memory_limits():
+    manager = MultiAgentSessionManager(FakeSession, max_total_bytes=250, max_session_bytes=1000)
+    # sessions are measured when their turn is released
+    manager.get_or_create_session("big").size = 5000
+    manager.release_session("big")
+    assert manager.evictions["max_session_bytes"] == 1
+
+    for conversation_id in ("a", "b", "c"):
+        use(manager, conversation_id)
+
+    assert manager.evictions["max_total_bytes"] == 1
+    assert list(manager._sessions) == ["b", "c"]
+
+
+def test_conversation_moves_between_workers_through_the_store(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"))
+
+    def make_manager():
+        return MultiAgentSessionManager(FakeSession, store=store,
+                                        serialize=lambda session: json.dumps(session.turns).encode(),
+                                        deserialize=lambda data: FakeSession(turns=json.loads(data)))
+    try:
+        first, second = make_manager(), make_manager()
+        first.get_or_create_session("c1").turns.append("turn 1")
+        first.release_session("c1")
+
+        session = second.get_or_create_session("c1")
+        assert session.turns == ["turn 1"]
+        session.turns.append("turn 2")
+        second.release_session("c1")
+
+        assert first.get_or_create_session("c1").turns == ["turn 1", "turn 2"]
+    finally:
+        store.close()
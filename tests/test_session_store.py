@@ -0,0 +1,78 @@
+import asyncio
+
+from semantic_kernel_framework import session_store
+from semantic_kernel_framework.session_store import SqliteSessionStore
+
+
+def test_save_load_and_versions(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions" / "sessions.db"))
+    try:
+        assert store.load("c1") is None and store.get_version("c1") is None
+
+        assert store.save("c1", b'{"messages": []}') == 1
+        assert store.save("c1", b'{"messages": [1]}') == 2
+
+        assert store.get_version("c1") == 2
+        assert store.load("c1") == (2, b'{"messages": [1]}')
+    finally:
+        store.close()
+
+
+def test_two_workers_share_the_file(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SqliteSessionStore(path), SqliteSessionStore(path)
+    try:
+        first.save("c1", b"turn 1")
+        assert second.save("c1", b"turn 2") == 2
+        assert first.load("c1") == (2, b"turn 2")
+    finally:
+        first.close()
+        second.close()
+
+
+def test_delete_and_expiry(tmp_path, monkeypatch):
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"))
+    try:
+        now = [1000.0]
+        monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+        store.save("old", b"x")
+        now[0] += 3600
+        store.save("new", b"y")
+        store.save("gone", b"z")
+
+        store.delete("gone")
+        assert store.delete_older_than(600) == 1
+
+        assert store.load("old") is None and store.load("gone") is None
+        assert store.load("new") == (1, b"y")
+    finally:
+        store.close()
+
+
+def test_purge_runs_until_cancelled(tmp_path, monkeypatch):
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"))
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+    store.save("old", b"x")
+    now[0] += 3600
+    store.save("new", b"y")
+
+    async def scenario():
+        purge = asyncio.create_task(session_store.purge_expired_sessions(store, 600, interval_seconds=0.01))
+        await asyncio.sleep(0.05)
+        store.save("stale", b"z")
+        now[0] += 3600
+        store.save("newer", b"w")
+        await asyncio.sleep(0.05)
+        purge.cancel()
+        await asyncio.gather(purge, return_exceptions=True)
+        return purge
+
+    try:
+        purge = asyncio.run(scenario())
+
+        assert purge.cancelled()
+        assert [store.load(key) for key in ("old", "new", "stale")] == [None, None, None]
+        assert store.load("newer") == (1, b"w")
+    finally:
+        store.close()
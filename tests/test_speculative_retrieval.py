@@ -0,0 +1,85 @@
+import asyncio
+
+from semantic_kernel_framework import speculative_retrieval
+from semantic_kernel_framework.speculative_retrieval import SpeculativeSearch, cancel_current, current_prefetch
+
+
+def fake_embed(vectors):
+    async def embed(text):
+        return vectors[text]
+    return embed
+
+
+async def search(query):
+    return [f"result for {query}"]
+
+
+def test_matches_the_same_normalized_text_without_embedding():
+    async def scenario():
+        prefetch = SpeculativeSearch("How do I open a dispute?", search)
+        return await prefetch.matches("how do i open a dispute"), await prefetch.matches("refund status")
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_matches_by_embedding_cosine():
+    embed = fake_embed({
+        "open a dispute": [1.0, 0.0],
+        "dispute opening steps": [0.95, 0.1],
+        "close my account": [0.0, 1.0],
+    })
+
+    async def scenario():
+        prefetch = SpeculativeSearch("open a dispute", search, embed=embed, match_threshold=0.9)
+        return await prefetch.matches("dispute opening steps"), await prefetch.matches("close my account")
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_served_when_the_tool_query_matches():
+    async def scenario():
+        token = current_prefetch.set(SpeculativeSearch("open a dispute", search))
+        try:
+            return await speculative_retrieval.serve_prefetched("Open a dispute")
+        finally:
+            current_prefetch.reset(token)
+
+    assert asyncio.run(scenario()) == ["result for open a dispute"]
+
+
+def test_not_served_when_the_tool_query_differs():
+    async def scenario():
+        token = current_prefetch.set(SpeculativeSearch("open a dispute", search))
+        try:
+            return await speculative_retrieval.serve_prefetched("refund status")
+        finally:
+            current_prefetch.reset(token)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_cancel_current_cancels_the_turns_prefetch():
+    started = asyncio.Event()
+
+    async def slow_search(query):
+        started.set()
+        await asyncio.sleep(10)
+
+    async def scenario():
+        prefetch = SpeculativeSearch("open a dispute", slow_search)
+        token = current_prefetch.set(prefetch)
+        try:
+            await started.wait()
+            cancel_current("routed to the account agent")
+            await asyncio.sleep(0)
+            return prefetch.active, await speculative_retrieval.serve_prefetched("open a dispute")
+        finally:
+            current_prefetch.reset(token)
+
+    cancelled = speculative_retrieval.speculative_retrieval_stats["cancelled"]
+    assert asyncio.run(scenario()) == (False, None)
+    assert speculative_retrieval.speculative_retrieval_stats["cancelled"] == cancelled + 1
+
+
+def test_cancel_current_without_a_prefetch_does_nothing():
+    cancel_current("no prefetch in this turn")
@@ -0,0 +1,110 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from semantic_kernel_framework import turn_events
+from semantic_kernel_framework.turn_events import TurnEventStream, format_ndjson, format_sse, turn_event_filter
+
+
+def texts(chunk):
+    yield chunk
+
+
+async def collect(stream, token_stream):
+    return [event async for event in stream.run(token_stream, texts)]
+
+
+def test_events_emitted_while_streaming_keep_their_order():
+    async def scenario():
+        stream = TurnEventStream()
+
+        async def tokens():
+            # a tool runs inside the turn before the agent answers
+            turn_events.emit("tool_call", name="get_search_results", plugin="SearchPlugins", arguments={})
+            await asyncio.sleep(0.01)
+            turn_events.emit("tool_result", name="get_search_results", plugin="SearchPlugins", duration_ms=10.0, ok=True)
+            yield "Open "
+            yield "a dispute."
+
+        return await collect(stream, tokens())
+
+    events = asyncio.run(scenario())
+
+    assert [event["type"] for event in events] == ["tool_call", "tool_result", "token", "token", "final"]
+    assert [event["text"] for event in events if event["type"] == "token"] == ["Open ", "a dispute."]
+    times = [event["t_ms"] for event in events]
+    assert times == sorted(times)
+
+
+def test_final_event_reports_first_token_and_total_time():
+    async def scenario():
+        stream = TurnEventStream()
+
+        async def tokens():
+            await asyncio.sleep(0.05)
+            yield "Hello"
+            await asyncio.sleep(0.05)
+            yield " there"
+
+        return await collect(stream, tokens())
+
+    final = asyncio.run(scenario())[-1]
+
+    assert final["type"] == "final"
+    assert 40 <= final["ttft_ms"] < final["total_ms"]
+    assert final["total_ms"] >= 90
+    assert final["tokens"] == 2 and final["characters"] == len("Hello there")
+
+
+def test_stream_error_is_reported_before_the_final_event():
+    async def tokens():
+        yield "partial"
+        raise RuntimeError("model unavailable")
+
+    events = asyncio.run(collect(TurnEventStream(), tokens()))
+
+    assert [event["type"] for event in events] == ["token", "error", "final"]
+    assert events[1]["message"] == "model unavailable"
+
+
+def test_turn_that_failed_to_start_yields_an_error_and_the_final_event():
+    events = asyncio.run(collect(TurnEventStream(), None))
+
+    assert [event["type"] for event in events] == ["error", "final"]
+    assert events[-1]["ttft_ms"] is None and events[-1]["tokens"] == 0
+
+
+def test_filter_reports_handoffs_and_tool_latency():
+    context = SimpleNamespace(function=SimpleNamespace(name="rag_agent", plugin_name="agents"),
+                              arguments={"messages": "how do I open a dispute"}, result=None)
+
+    async def next_(context):
+        await asyncio.sleep(0.01)
+        context.result = SimpleNamespace(value="Go to the Resolution Center.")
+
+    async def tokens():
+        await turn_event_filter(context, next_)
+        yield "Go to the Resolution Center."
+
+    events = asyncio.run(collect(TurnEventStream(), tokens()))
+
+    assert [event["type"] for event in events] == ["handoff", "tool_call", "tool_result", "token", "final"]
+    assert events[0]["agent"] == "rag_agent"
+    assert events[2]["ok"] is True and events[2]["result"] == "Go to the Resolution Center."
+    assert events[2]["duration_ms"] >= 9
+    assert events[-1]["tool_calls"] == 1 and events[-1]["tool_ms"] >= 9
+
+
+def test_sse_and_ndjson_formatting():
+    event = {"type": "token", "t_ms": 12.5, "text": "¿Cómo\nestás?"}
+
+    sse = format_sse(event)
+    ndjson = format_ndjson(event)
+
+    assert sse.startswith("event: token\ndata: ")
+    assert sse.endswith("\n\n")
+    # the JSON payload escapes newlines, so a token never ends the SSE event early
+    assert json.loads(sse[len("event: token\ndata: "):-2]) == event
+    assert ndjson.endswith("\n") and ndjson.count("\n") == 1
+    assert json.loads(ndjson) == event
+    assert "¿Cómo" in ndjson
@@ -0,0 +1,92 @@
+import json
+
+import numpy as np
+import pytest
+
+from semantic_kernel_framework import vector_store
+
+DOCS = [
+    {"id": "1", "fileName": "refund.txt", "content": "Refunds take five days.", "contentVector": [0.1, 0.2, 0.3]},
+    {"id": "2", "filename": "dispute.txt", "content": "Open a dispute. ✓", "contentVector": [0.4, 0.5, 0.6]},
+    {"id": "3", "fileName": "empty.txt", "content": "No vector", "contentVector": None},
+]
+
+
+def test_write_and_read_round_trip(tmp_path):
+    base = str(tmp_path / "docs_vectors")
+
+    count = vector_store.write_vector_store(base, DOCS)
+    store = vector_store.open_vector_store(base)
+    try:
+        assert count == 2
+        assert len(store) == 2 and store.dimensions == 3
+        assert store.vectors.dtype == np.float32
+        assert np.allclose(store.vectors[1], [0.4, 0.5, 0.6])
+        # the legacy "filename" key is normalized
+        assert store.get_record(1) == {"id": "2", "content": "Open a dispute. ✓", "fileName": "dispute.txt"}
+        documents = list(store.iter_documents())
+    finally:
+        store.close()
+
+    assert [doc["id"] for doc in documents] == ["1", "2"]
+    assert documents[0]["contentVector"] == pytest.approx([0.1, 0.2, 0.3])
+
+
+def test_mismatched_files_are_rejected(tmp_path):
+    base = str(tmp_path / "docs_vectors")
+    vector_store.write_vector_store(base, DOCS)
+    with open(vector_store.metadata_path(base), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "extra"}) + "\n")
+
+    with pytest.raises(ValueError):
+        vector_store.open_vector_store(base)
+
+
+def test_json_export_and_import(tmp_path):
+    json_path = tmp_path / "docs.json"
+    json_path.write_text(json.dumps(DOCS[:2]), encoding="utf-8")
+    base = str(tmp_path / "docs_vectors")
+
+    assert vector_store.export_json_to_store(str(json_path), base) == 2
+    assert vector_store.import_store_to_json(base, str(tmp_path / "back.json")) == 2
+
+    back = json.loads((tmp_path / "back.json").read_text(encoding="utf-8"))
+    assert [doc["fileName"] for doc in back] == ["refund.txt", "dispute.txt"]
+    assert back[1]["contentVector"] == pytest.approx([0.4, 0.5, 0.6])
+
+
+def test_iter_json_documents_streams_across_reads(tmp_path):
+    docs = [{"id": str(i), "content": "x" * 50 + '"]}, {', "contentVector": [float(i)] * 4} for i in range(20)]
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps(docs, indent=2), encoding="utf-8")
+
+    # a read size smaller than one document forces documents to be decoded across reads
+    assert list(vector_store.iter_json_documents(str(path), read_size=16)) == docs
+
+
+def test_iter_json_documents_empty_array(tmp_path):
+    path = tmp_path / "docs.json"
+    path.write_text("  [ ]  ", encoding="utf-8")
+
+    assert list(vector_store.iter_json_documents(str(path))) == []
+
+
+def test_iter_json_documents_rejects_non_arrays_and_truncated_files(tmp_path):
+    not_array = tmp_path / "object.json"
+    not_array.write_text('{"id": "1"}', encoding="utf-8")
+    truncated = tmp_path / "truncated.json"
+    truncated.write_text('[{"id": "1"}, {"id": "2", "content": "cut of', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(vector_store.iter_json_documents(str(not_array)))
+    with pytest.raises(json.JSONDecodeError):
+        list(vector_store.iter_json_documents(str(truncated), read_size=8))
+
+
+def test_iter_documents_falls_back_to_json(tmp_path):
+    json_path = tmp_path / "docs.json"
+    json_path.write_text(json.dumps(DOCS[:1]), encoding="utf-8")
+
+    assert list(vector_store.iter_documents(str(tmp_path / "missing"), str(json_path))) == DOCS[:1]
+    with pytest.raises(FileNotFoundError):
+        list(vector_store.iter_documents(str(tmp_path / "missing"), str(tmp_path / "missing.json")))
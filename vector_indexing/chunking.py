@@ -0,0 +1,108 @@
+"""
+Passage chunking for search docs.
+
+Each source document is split into passages of at most max_tokens (estimated at about 4
+characters per token), cut at sentence boundaries where possible and between words otherwise.
+Consecutive chunks share up to overlap_tokens of text so an answer that straddles a boundary
+is still found. Chunk ids are "{parent id}-{chunk index:04d}", so they are stable as long as the parent
+id and the text before the chunk don't change, and they point back to the parent document.
+"""
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+from vector_indexing.embedding_checkpoint import content_hash
+from vector_indexing.embedding_pipeline import CHARS_PER_TOKEN, estimate_tokens
+
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n")
+
+
+def _split_long_words(words: List[str], max_chars: int) -> Iterator[str]:
+    """The words, with any longer than max_chars (URLs, base64, code, CJK text) cut into consecutive pieces."""
+    for word in words:
+        for start in range(0, len(word), max_chars):
+            yield word[start:start + max_chars]
+
+
+def _split_units(text: str, piece_tokens: int) -> List[Tuple[str, bool]]:
+    """(sentence or word run, starts a paragraph) pieces of at most piece_tokens."""
+    units = []
+    for paragraph in PARAGRAPH_PATTERN.split(text):
+        starts_paragraph = True
+        for sentence in SENTENCE_PATTERN.split(paragraph):
+            words = sentence.split()
+            current: List[str] = []
+            for word in _split_long_words(words, piece_tokens * CHARS_PER_TOKEN):
+                if current and estimate_tokens(" ".join(current + [word])) > piece_tokens:
+                    units.append((" ".join(current), starts_paragraph))
+                    starts_paragraph = False
+                    current = []
+                current.append(word)
+            if current:
+                units.append((" ".join(current), starts_paragraph))
+                starts_paragraph = False
+    return units
+
+
+def _join(units: List[Tuple[str, bool]]) -> str:
+    return "".join(("\n\n" if starts_paragraph else " ") + text if i else text
+                   for i, (text, starts_paragraph) in enumerate(units))
+
+
+def chunk_text(text: str, max_tokens: int = 512, overlap_tokens: int = 64) -> List[str]:
+    if max_tokens < 1:
+        raise ValueError(f"max_tokens must be positive, got {max_tokens}")
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError(f"overlap_tokens must be between 0 and max_tokens - 1, got {overlap_tokens} (max_tokens {max_tokens})")
+    # long sentences (and unpunctuated text such as navigation menus) are cut into pieces small
+    # enough that several of them fit in the overlap
+    piece_tokens = max(1, min(max_tokens // 2, max(overlap_tokens // 2, max_tokens // 16)))
+    units = _split_units(text, piece_tokens)
+    chunks: List[str] = []
+    current: List[Tuple[str, bool]] = []
+    current_tokens = 0
+    for unit in units:
+        tokens = estimate_tokens(unit[0]) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(_join(current))
+            # carry the tail of the finished chunk over into the next one
+            overlap: List[Tuple[str, bool]] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                size = estimate_tokens(previous[0]) + 1
+                # the overlap never pushes the next chunk over max_tokens
+                if overlap_size + size > min(overlap_tokens, max_tokens - tokens):
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current, current_tokens = overlap, overlap_size
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        chunks.append(_join(current))
+    return chunks
+
+
+def chunk_id(parent_id: str, chunk_index: int) -> str:
+    return f"{parent_id}-{chunk_index:04d}"
+
+
+def chunk_documents(docs: Iterable[dict], max_tokens: int = 512, overlap_tokens: int = 64) -> Iterator[dict]:
+    """
+    Chunk-level records ({"id", "parentId", "chunkIndex", "fileName", "content", "contentHash"}, plus the
+    document's "duplicateFileNames" when near-duplicates were merged into it).
+    """
+    for doc in docs:
+        for index, text in enumerate(chunk_text(doc.get("content", ""), max_tokens, overlap_tokens)):
+            chunk = {
+                "id": chunk_id(doc["id"], index),
+                "parentId": doc["id"],
+                "chunkIndex": index,
+                "fileName": doc.get("fileName", ""),
+                "content": text,
+                "contentHash": content_hash(text),
+            }
+            # every passage of a merged document also answers for the pages merged into it
+            if doc.get("duplicateFileNames"):
+                chunk["duplicateFileNames"] = list(doc["duplicateFileNames"])
+            yield chunk
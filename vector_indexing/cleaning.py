@@ -0,0 +1,160 @@
+"""
+Boilerplate and near-duplicate removal for search docs, before chunking and embedding.
+
+Boilerplate: every page scraped from the help center repeats the same navigation header and
+footer. Word shingles that occur in at least min_doc_fraction of the documents are treated as
+boilerplate, and runs of at least min_run_words words covered by them are cut out of every
+document. Nothing is hard-coded, so the stage adapts when the site template changes.
+
+Near-duplicates: MinHash signatures over word shingles of the cleaned text, bucketed with LSH
+bands, find candidate pairs; pairs whose exact shingle Jaccard similarity reaches
+duplicate_threshold are merged, keeping the longer document and recording the other file names
+in its "duplicateFileNames".
+"""
+import hashlib
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from vector_indexing.embedding_pipeline import estimate_tokens
+
+WORD_PATTERN = re.compile(r"\S+")
+# 2**32 + 15, a prime just above the 32-bit hash range
+MINHASH_PRIME = 4294967311
+
+
+def _hash32(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _shingles(words: List[str], size: int) -> List[str]:
+    if len(words) < size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def learn_boilerplate(texts: List[str], shingle_size: int = 8, min_doc_fraction: float = 0.3, min_docs: int = 3) -> Set[str]:
+    """Shingles shared by at least min_doc_fraction of the documents (and at least min_docs of them)."""
+    document_frequency: Counter = Counter()
+    for text in texts:
+        words = [word.lower() for word in WORD_PATTERN.findall(text)]
+        document_frequency.update(set(_shingles(words, shingle_size)))
+    threshold = max(min_docs, int(min_doc_fraction * len(texts)))
+    return {shingle for shingle, count in document_frequency.items() if count >= threshold}
+
+
+def strip_boilerplate(text: str, boilerplate: Set[str], shingle_size: int = 8, min_run_words: int = 12) -> str:
+    matches = list(WORD_PATTERN.finditer(text))
+    words = [match.group().lower() for match in matches]
+    covered = [False] * len(words)
+    for i, shingle in enumerate(_shingles(words, shingle_size)):
+        if shingle in boilerplate:
+            for j in range(i, min(i + shingle_size, len(words))):
+                covered[j] = True
+
+    # cut runs of covered words, keeping the original whitespace everywhere else
+    pieces = []
+    position = 0
+    i = 0
+    while i < len(words):
+        if not covered[i]:
+            i += 1
+            continue
+        run_end = i
+        while run_end + 1 < len(words) and covered[run_end + 1]:
+            run_end += 1
+        if run_end - i + 1 >= min_run_words:
+            pieces.append(text[position:matches[i].start()])
+            position = matches[run_end + 1].start() if run_end + 1 < len(words) else len(text)
+        i = run_end + 1
+    pieces.append(text[position:])
+    return re.sub(r"[ \t]{2,}", " ", "".join(pieces)).strip()
+
+
+def minhash_signature(shingles: Set[str], num_perm: int = 128, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # a < 2**31 keeps a * hash (< 2**32) inside uint64
+    a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+    if not shingles:
+        return np.full(num_perm, MINHASH_PRIME, dtype=np.uint64)
+    hashes = np.fromiter((_hash32(shingle) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    return ((np.outer(hashes, a) + b) % np.uint64(MINHASH_PRIME)).min(axis=0)
+
+
+def find_near_duplicates(
+    texts: List[str], shingle_size: int = 5, threshold: float = 0.85, num_perm: int = 128, bands: int = 32
+) -> List[Tuple[int, int, float]]:
+    """(i, j, Jaccard similarity) for pairs of texts at or above threshold."""
+    shingle_sets = [set(_shingles([word.lower() for word in WORD_PATTERN.findall(text)], shingle_size)) for text in texts]
+    signatures = [minhash_signature(shingles, num_perm) for shingles in shingle_sets]
+    rows = num_perm // bands
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    for index, signature in enumerate(signatures):
+        for band in range(bands):
+            buckets[(band, signature[band * rows:(band + 1) * rows].tobytes())].append(index)
+
+    candidates = {(i, j) for members in buckets.values() for n, i in enumerate(members) for j in members[n + 1:]}
+    pairs = []
+    for i, j in sorted(candidates):
+        union = len(shingle_sets[i] | shingle_sets[j])
+        similarity = len(shingle_sets[i] & shingle_sets[j]) / union if union else 1.0
+        if similarity >= threshold:
+            pairs.append((i, j, similarity))
+    return pairs
+
+
+def clean_documents(
+    docs: List[dict],
+    min_doc_fraction: float = 0.3,
+    duplicate_threshold: float = 0.85,
+) -> Tuple[List[dict], Dict[str, float]]:
+    """Cleaned copies of docs (boilerplate stripped, near-duplicates merged) and a savings report."""
+    tokens_before = sum(estimate_tokens(doc.get("content", "")) for doc in docs)
+
+    boilerplate = learn_boilerplate([doc.get("content", "") for doc in docs], min_doc_fraction=min_doc_fraction)
+    cleaned = [{**doc, "content": strip_boilerplate(doc.get("content", ""), boilerplate)} for doc in docs]
+    tokens_after_boilerplate = sum(estimate_tokens(doc["content"]) for doc in cleaned)
+
+    # union-find over duplicate pairs; each group keeps its longest document
+    parent = list(range(len(cleaned)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    pairs = find_near_duplicates([doc["content"] for doc in cleaned], threshold=duplicate_threshold)
+    for i, j, _ in pairs:
+        parent[find(i)] = find(j)
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for index in range(len(cleaned)):
+        groups[find(index)].append(index)
+
+    kept = []
+    for members in groups.values():
+        keeper = max(members, key=lambda index: (len(cleaned[index]["content"]), -index))
+        doc = cleaned[keeper]
+        duplicates = [cleaned[index].get("fileName") for index in members if index != keeper]
+        if duplicates:
+            doc["duplicateFileNames"] = sorted(duplicates)
+            print(f"Merged {len(duplicates)} near-duplicates into {doc.get('fileName')}: {', '.join(doc['duplicateFileNames'])}")
+        kept.append((keeper, doc))
+    kept_docs = [doc for _, doc in sorted(kept, key=lambda item: item[0])]
+    tokens_after = sum(estimate_tokens(doc["content"]) for doc in kept_docs)
+
+    report = {
+        "documents": len(docs),
+        "documents_kept": len(kept_docs),
+        "duplicates_merged": len(docs) - len(kept_docs),
+        "boilerplate_shingles": len(boilerplate),
+        "tokens_before": tokens_before,
+        "boilerplate_tokens_removed": tokens_before - tokens_after_boilerplate,
+        "duplicate_tokens_removed": tokens_after_boilerplate - tokens_after,
+        "tokens_after": tokens_after,
+        "tokens_saved_percent": round(100 * (tokens_before - tokens_after) / tokens_before, 1) if tokens_before else 0.0,
+    }
+    return kept_docs, report
@@ -0,0 +1,217 @@
+"""
+Bulk upsert of documents into a Cosmos DB container for load_cosmosdb.
+
+Writes go through azure.cosmos.aio with the SDK's own throttle retries turned off, so the loader
+sees every 429 itself. The number of writes in flight is an adaptive window (AIMD): it grows by
+about one slot per window of successful writes and is halved on a 429, and all writers pause for
+the x-ms-retry-after-ms the service asks for. The window therefore settles where the container's
+provisioned RU/s are used without being exceeded. The RU charge of every response
+(x-ms-request-charge) is summed for the summary.
+
+Upserts never remove anything, so after a load delete_stale deletes the records whose id is no
+longer in the source (a removed document, a document that now has fewer chunks, or ids from an
+older id scheme).
+"""
+import asyncio
+import random
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from azure.cosmos.aio import ContainerProxy
+from azure.cosmos.documents import ConnectionPolicy, RetryOptions
+from azure.cosmos.exceptions import CosmosHttpResponseError
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+RETRY_AFTER_HEADER = "x-ms-retry-after-ms"
+# 408 timeout, 449 retry with, 503 service unavailable
+TRANSIENT_STATUS_CODES = (408, 449, 503)
+
+
+def connection_policy_without_throttle_retries() -> ConnectionPolicy:
+    """Pass as connection_policy to the aio CosmosClient so that 429s reach the loader."""
+    policy = ConnectionPolicy()
+    policy.RetryOptions = RetryOptions(max_retry_attempt_count=0)
+    return policy
+
+
+def request_charge(headers) -> float:
+    try:
+        return float((headers or {}).get(REQUEST_CHARGE_HEADER, 0) or 0)
+    except ValueError:
+        return 0.0
+
+
+class AdaptiveWindow:
+    """Concurrency limit that grows additively on success and halves on throttling."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.peak = int(self.limit)
+        self._resume_at = 0.0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        while True:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            async with self._condition:
+                await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+                if self._resume_at <= time.monotonic():
+                    self.in_flight += 1
+                    return
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self.peak = max(self.peak, int(self.limit))
+
+    def on_throttle(self, retry_after: float) -> None:
+        now = time.monotonic()
+        self._resume_at = max(self._resume_at, now + retry_after)
+        # the writes in flight when the limit was hit all come back throttled; halve only once for them
+        if now - self._last_decrease > retry_after:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+
+
+class CosmosBulkLoader:
+    """Upserts many documents into one container at the rate its provisioned throughput allows."""
+
+    def __init__(
+        self,
+        container: ContainerProxy,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        max_retries: int = 10,
+        provisioned_ru_per_second: Optional[float] = None,
+    ) -> None:
+        self.container = container
+        self.window = AdaptiveWindow(initial_concurrency, min_concurrency, max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.provisioned_ru_per_second = provisioned_ru_per_second
+        self.stats: Dict[str, float] = {"documents": 0, "failed": 0, "throttled": 0, "retries": 0, "request_units": 0.0, "deleted": 0}
+        # ids of all documents passed to upload, whether or not the upsert succeeded
+        self.uploaded_ids: Set[str] = set()
+
+    def _add_charge(self, headers, _result=None) -> None:
+        self.stats["request_units"] += request_charge(headers)
+
+    async def _upsert(self, doc: dict) -> None:
+        attempt = 0
+        while True:
+            await self.window.acquire()
+            try:
+                await self.container.upsert_item(doc, response_hook=self._add_charge)
+                self.window.on_success()
+                self.stats["documents"] += 1
+                return
+            except CosmosHttpResponseError as e:
+                # throttled and failed requests are charged too
+                self._add_charge(e.headers)
+                attempt += 1
+                if e.status_code == 429:
+                    self.stats["throttled"] += 1
+                    retry_after = float(e.headers.get(RETRY_AFTER_HEADER, 100)) / 1000
+                    self.window.on_throttle(retry_after)
+                elif e.status_code not in TRANSIENT_STATUS_CODES:
+                    attempt = self.max_retries + 1
+                if attempt > self.max_retries:
+                    self.stats["failed"] += 1
+                    print(f"Failed to upsert document {doc.get('id', 'unknown')}: {e.status_code} {e.http_error_message}")
+                    with open("upload_error.log", "a") as f:
+                        f.write(f"{doc.get('id', 'unknown')}: {e.status_code} {e.http_error_message}\n")
+                    return
+                self.stats["retries"] += 1
+                if e.status_code != 429:
+                    await asyncio.sleep(min(30, 2 ** (attempt - 1)) * (0.5 + random.random() / 2))
+            finally:
+                await self.window.release()
+
+    async def upload(self, docs: Iterable[dict]) -> Dict[str, float]:
+        """Upserts all documents and returns the stats."""
+        docs = iter(docs)
+        start = time.perf_counter()
+
+        async def worker() -> None:
+            # the workers share one lazy iterator; the adaptive window decides how many of them write at once
+            for doc in docs:
+                self.uploaded_ids.add(doc["id"])
+                await self._upsert(doc)
+                done = self.stats["documents"] + self.stats["failed"]
+                if done % 500 == 0:
+                    print(f"Upserted {self.stats['documents']} documents, window {int(self.window.limit)}, {self.stats['request_units']:.0f} RU")
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = round(elapsed, 2)
+        self.stats["documents_per_second"] = round(self.stats["documents"] / elapsed, 1) if elapsed else 0.0
+        self.stats["request_units"] = round(self.stats["request_units"], 2)
+        self.stats["request_units_per_document"] = round(self.stats["request_units"] / self.stats["documents"], 2) if self.stats["documents"] else 0.0
+        self.stats["request_units_per_second"] = round(self.stats["request_units"] / elapsed, 1) if elapsed else 0.0
+        if self.provisioned_ru_per_second:
+            self.stats["provisioned_ru_per_second"] = self.provisioned_ru_per_second
+            self.stats["ru_utilization_percent"] = round(100 * self.stats["request_units_per_second"] / self.provisioned_ru_per_second, 1)
+        self.stats["final_concurrency"] = int(self.window.limit)
+        self.stats["peak_concurrency"] = self.window.peak
+        print(f"Upsert finished: {self.stats}")
+        return self.stats
+
+    async def _delete(self, id_: str) -> None:
+        attempt = 0
+        while True:
+            await self.window.acquire()
+            try:
+                # the container is partitioned on /id
+                await self.container.delete_item(id_, partition_key=id_, response_hook=self._add_charge)
+                self.window.on_success()
+                self.stats["deleted"] += 1
+                return
+            except CosmosHttpResponseError as e:
+                self._add_charge(e.headers)
+                if e.status_code == 404:
+                    return
+                attempt += 1
+                if e.status_code == 429:
+                    self.stats["throttled"] += 1
+                    self.window.on_throttle(float(e.headers.get(RETRY_AFTER_HEADER, 100)) / 1000)
+                elif e.status_code not in TRANSIENT_STATUS_CODES:
+                    attempt = self.max_retries + 1
+                if attempt > self.max_retries:
+                    print(f"Failed to delete stale document {id_}: {e.status_code} {e.http_error_message}")
+                    return
+                self.stats["retries"] += 1
+                if e.status_code != 429:
+                    await asyncio.sleep(min(30, 2 ** (attempt - 1)) * (0.5 + random.random() / 2))
+            finally:
+                await self.window.release()
+
+    async def delete_stale(self, keep_ids: Iterable[str]) -> int:
+        """Deletes every record whose id is not in keep_ids and returns how many were deleted."""
+        keep = set(keep_ids)
+        if not keep:
+            # an empty source is far more likely a missing vector store than an empty knowledge base
+            print("No current document ids, not deleting anything")
+            return 0
+        stale = [id_ async for id_ in self.container.query_items("SELECT VALUE c.id FROM c") if id_ not in keep]
+        print(f"Deleting {len(stale)} stale documents")
+        queue = iter(stale)
+
+        async def worker() -> None:
+            for id_ in queue:
+                await self._delete(id_)
+
+        deleted_before = self.stats["deleted"]
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        return int(self.stats["deleted"] - deleted_before)
@@ -1,91 +1,55 @@
+import asyncio
 import json
 import os
-import time
-import uuid
+import sys
 
 import requests
-from azure.identity import AzureCliCredential, get_bearer_token_provider
+from azure.identity import AzureCliCredential
+from azure.identity.aio import AzureCliCredential as AioAzureCliCredential
+from azure.identity.aio import get_bearer_token_provider
 from azure.search.documents import SearchClient
 from dotenv import load_dotenv
-from openai import AzureOpenAI, RateLimitError
+
+# allow running as `python vector_indexing/data_prep.py` from the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from semantic_kernel_framework import bm25_index, vector_store
+from semantic_kernel_framework.aoai_client import create_async_client
+from vector_indexing import chunking, cleaning, embedding_checkpoint
+from vector_indexing.embedding_pipeline import EmbeddingPipeline
 
 load_dotenv()
 
 azcli_credential = AzureCliCredential()
+aio_credential = AioAzureCliCredential()
 
 token_provider = get_bearer_token_provider(
-    azcli_credential,
+    aio_credential,
     "https://cognitiveservices.azure.com/.default"
 )
 
-aoai_client = AzureOpenAI(
-   api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-   azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-   azure_ad_token_provider=token_provider,   
-)
+# retries are handled by the embedding pipeline, which honours Retry-After
+aoai_client = create_async_client(token_provider, max_retries=0)
 
-json_vector_file_name = "search_docs_with_vectors.json"
+vector_store_base_path = "search_docs_vectors"
+checkpoint_file_name = "search_docs_embeddings.checkpoint.jsonl"
+
+def get_embedding_pipeline() -> EmbeddingPipeline:
+    return EmbeddingPipeline(
+        aoai_client,
+        model=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-ada-002"),
+        max_batch_tokens=int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "64000")),
+        max_batch_inputs=int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "256")),
+        max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8")),
+        max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "8")),
+    )
 
-def generate_embeddings_sync(text_list, model="text-embedding-ada-002"):
-    try:
-        # Send a batch of texts to the embedding API
-        if text_list is None or len(text_list) == 0:
-            return []
-        #print("embedding model:", model)
-        embeddings = aoai_client.embeddings.create(input=text_list, model=model).data
-        return embeddings
-    
-    except RateLimitError as e:
-        print("Rate limit reached (429 error).")
-        raise
-    
-    except Exception as e:
-        print("Error calling OpenAI:" + str(aoai_client.base_url))
-        print(e)
-        raise
 
-def generate_embeddings(doc, fieldName, max_retries=5, base_delay=15):
-    # Extract fields
+async def embed_search_docs(docs, on_batch=None):
     try:
-        
-        content = doc.get(fieldName, "")
-        
-
-        # Function to attempt embedding generation with retry logic
-        def generate_with_retries(data, model):
-            retries = 0
-            while retries < max_retries:
-                try:
-                    if type(data) == list:
-                        cleaned_data = [item for item in data if item is not None]
-                        cleaned_data_string = ", ".join(cleaned_data)
-                        return generate_embeddings_sync(cleaned_data_string, model=model)
-                    else:
-                        return generate_embeddings_sync(data, model=model)
-
-                except Exception as e:
-                    retries += 1
-                    delay = base_delay * (2 ** (retries - 1))  # Exponential backoff
-                    print(f"Retry {retries}. Waiting {delay} seconds before retrying...")
-                    time.sleep(delay)
-            print(f"Failed to generate embeddings after {max_retries} attempts.")
-            return None
-
-        # Generate embeddings for each part, chapter, section, keywords, para, topics, summary, category
-        content_embeddings = generate_with_retries(content, os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"))
-        
-        # Update document with embeddings
-        doc[f"{fieldName}Vector"] = content_embeddings[0].embedding if content_embeddings else None
-        
-        print(f"Embedded document: {doc.get('id', 'unknown')}")
-        return doc
-    except Exception as e:
-        with open("embedding_error.log", "a") as f:
-            f.write(str(doc) + "\n")
-        print(f"generate_embeddings_for_doc Error processing document: {e}")
-        doc[f"{fieldName}Vector"] = None
-        doc["embedding_error"] = str(e)
-    return doc
+        return await get_embedding_pipeline().embed_documents(docs, "content", on_batch=on_batch)
+    finally:
+        await aoai_client.close()
+        await aio_credential.close()
 
 
 def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", language_suffix: str = "en"):
@@ -110,6 +74,22 @@ def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", la
                 "type": "Edm.String",
                 "searchable": True
             },
+            {
+                "name": "parentId",
+                "type": "Edm.String",
+                "filterable": True
+            },
+            {
+                "name": "chunkIndex",
+                "type": "Edm.Int32",
+                "filterable": True,
+                "sortable": True
+            },
+            {
+                "name": "duplicateFileNames",
+                "type": "Collection(Edm.String)",
+                "filterable": True
+            },
             {
                 "name": "contentVector",
                 "type": "Collection(Edm.Single)",
@@ -167,7 +147,7 @@ def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", la
 
     
 
-    url = f"{os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")}/indexes/{index_name}?api-version=2024-07-01"
+    url = f"{os.getenv('AZURE_SEARCH_SERVICE_ENDPOINT')}/indexes/{index_name}?api-version=2024-07-01"
 
     response = requests.get(url, headers=headers)
     
@@ -185,45 +165,87 @@ def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", la
 
 
 
-def process_search_docs():
-    search_docs_folder_path = "search_docs"
+def load_search_docs(search_docs_folder_path="search_docs"):
+    """One document per .txt file, with a stable id and a hash of its content."""
     search_docs_json = []
-    if not os.path.exists("search_docs.json") or os.path.getsize("search_docs.json") == 0:
-        for file in os.listdir(search_docs_folder_path):
-            if file.endswith(".txt"):
-                print(f"Processing file: {file}")
-                with open(os.path.join(search_docs_folder_path, file), "r", encoding="utf-8") as f:
-                    content = f.read()
-                    json_doc = {
-                        "id": str(uuid.uuid4()),
-                        "filename": file,
-                        "content": content
-                    }
-                    search_docs_json.append(json_doc)
+    for file in sorted(os.listdir(search_docs_folder_path)):
+        if file.endswith(".txt"):
+            with open(os.path.join(search_docs_folder_path, file), "r", encoding="utf-8") as f:
+                content = f.read()
+            search_docs_json.append({
+                "id": embedding_checkpoint.stable_doc_id(file),
+                "fileName": file,
+                "content": content,
+                "contentHash": embedding_checkpoint.content_hash(content),
+            })
+    return search_docs_json
 
-        with open("search_docs.json", "w", encoding="utf-8") as f:
-            f.write(json.dumps(search_docs_json, indent=2, ensure_ascii=False))
-    else:
-        print("search_docs.json already exists and is not empty. Skipping initial processing.")
-
-    if not os.path.exists(json_vector_file_name):
-        with open("search_docs.json", "r", encoding="utf-8") as f:
-            search_docs_json = json.loads(f.read())
-
-        vectorized_docs = []
-        for doc in search_docs_json:
-            doc = generate_embeddings(doc, "content")
-            
-            if doc:
-                vectorized_docs.append(doc)
-            else:
-                print(f"Failed to process document: {doc.get('id', 'unknown')}")
-
-            with open(json_vector_file_name, "w", encoding="utf-8") as f:
-                    json.dump(vectorized_docs, f, indent=2, ensure_ascii=False)
-            
-    else:
-        print(f"{json_vector_file_name} already exists. Skipping embedding generation.")
+
+def process_search_docs():
+    # the source folder is re-read on every run; only new or changed documents are embedded
+    search_docs_json = load_search_docs()
+    # shared navigation / footer text and near-duplicate pages would otherwise be embedded,
+    # retrieved and sent to the rag_agent over and over
+    search_docs_json, cleaning_report = cleaning.clean_documents(
+        search_docs_json,
+        min_doc_fraction=float(os.getenv("BOILERPLATE_MIN_DOC_FRACTION", "0.3")),
+        duplicate_threshold=float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.85")),
+    )
+    for doc in search_docs_json:
+        doc["contentHash"] = embedding_checkpoint.content_hash(doc["content"])
+    print(f"Cleaning: {cleaning_report}")
+    with open("search_docs.json", "w", encoding="utf-8") as f:
+        f.write(json.dumps(search_docs_json, indent=2, ensure_ascii=False))
+
+    # the index holds passages, not whole pages; each chunk points back to its source document
+    chunks = list(chunking.chunk_documents(
+        search_docs_json,
+        max_tokens=int(os.getenv("CHUNK_MAX_TOKENS", "512")),
+        overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "64")),
+    ))
+    print(f"Split {len(search_docs_json)} documents into {len(chunks)} chunks")
+
+    model = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-ada-002")
+    previous_manifest = embedding_checkpoint.read_manifest(vector_store_base_path)
+    changes = embedding_checkpoint.diff_manifest(previous_manifest, chunks, model)
+    print(f"Search doc chunks: {changes}")
+
+    checkpoint = embedding_checkpoint.EmbeddingCheckpoint(checkpoint_file_name, model)
+    if not checkpoint.load() and (previous_manifest is None or previous_manifest.get("model") == model):
+        checkpoint.seed_from_vector_store(vector_store_base_path)
+
+    to_embed = [chunk for chunk in chunks if checkpoint.lookup(chunk) is None]
+    if to_embed:
+        print(f"Embedding {len(to_embed)} of {len(chunks)} chunks")
+        asyncio.run(embed_search_docs(to_embed, on_batch=checkpoint.append))
+
+    vectorized_docs = []
+    for chunk in chunks:
+        vector = checkpoint.lookup(chunk)
+        if vector:
+            vectorized_docs.append({**chunk, vector_store.VECTOR_FIELD_NAME: vector})
+        else:
+            print(f"Failed to process chunk: {chunk.get('id', 'unknown')}")
+
+    up_to_date = (
+        vector_store.store_exists(vector_store_base_path)
+        and previous_manifest is not None
+        and not (changes["new"] or changes["changed"] or changes["removed"])
+        and not embedding_checkpoint.rows_changed(previous_manifest, vectorized_docs)
+    )
+    if up_to_date:
+        print(f"{vector_store_base_path} vector store is up to date. Skipping rebuild.")
+        if not os.path.exists(bm25_index.index_path(vector_store_base_path)):
+            bm25_index.build_index_for_store(vector_store_base_path)
+        return
+
+    count = vector_store.write_vector_store(vector_store_base_path, vectorized_docs)
+    embedding_checkpoint.write_manifest(vector_store_base_path, vectorized_docs, model)
+    checkpoint.compact(doc["contentHash"] for doc in vectorized_docs)
+    print(f"Wrote {count} vectors to {vector_store.matrix_path(vector_store_base_path)}")
+    # lexical index over the same rows, for local hybrid search
+    bm25_index.build_index_for_store(vector_store_base_path)
+    vector_store.mark_kb_rebuilt()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+"""
+Incremental ingestion state for data_prep.
+
+- Documents get a stable id derived from their source file name and a sha256 hash of their content.
+- Every embedded batch is appended to a JSONL checkpoint ({"contentHash", "model", "contentVector", ...}),
+  flushed to disk immediately, so a crashed run resumes with the batches it already paid for.
+- On the next run only documents whose (content hash, model) is not in the checkpoint are embedded.
+- A manifest next to the vector store records which row holds which source file version.
+
+The checkpoint is compacted to the live entries once the vector store has been written.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from semantic_kernel_framework import vector_store
+
+# fixed namespace so that ids stay the same across runs and machines
+DOC_ID_NAMESPACE = uuid.UUID("6f1c1e3a-5b0e-4f57-9a39-6c2f3f0f4a11")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def stable_doc_id(file_name: str) -> str:
+    return str(uuid.uuid5(DOC_ID_NAMESPACE, file_name))
+
+
+def manifest_path(base_path: str) -> str:
+    return base_path + ".manifest.json"
+
+
+class EmbeddingCheckpoint:
+    """Append-only record of embeddings, keyed by (content hash, model)."""
+
+    def __init__(self, path: str, model: str) -> None:
+        self.path = path
+        self.model = model
+        self._vectors: Dict[Tuple[str, str], List[float]] = {}
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a run that crashed mid-write leaves at most one partial line
+                    continue
+                self._vectors[(entry["contentHash"], entry["model"])] = entry[vector_store.VECTOR_FIELD_NAME]
+        print(f"Loaded {len(self._vectors)} embeddings from checkpoint {self.path}")
+        return len(self._vectors)
+
+    def seed_from_vector_store(self, base_path: str) -> int:
+        """Reuse the vectors of an existing store built before checkpoints existed (assumed to use this model)."""
+        if not vector_store.store_exists(base_path):
+            return 0
+        seeded = []
+        store = vector_store.open_vector_store(base_path)
+        try:
+            for record in store.iter_documents():
+                key = (record.get("contentHash") or content_hash(record.get("content", "")), self.model)
+                if key not in self._vectors:
+                    seeded.append({"contentHash": key[0], "fileName": record.get("fileName"),
+                                   vector_store.VECTOR_FIELD_NAME: record[vector_store.VECTOR_FIELD_NAME]})
+        finally:
+            store.close()
+        self.append(seeded)
+        print(f"Seeded checkpoint with {len(seeded)} embeddings from {base_path}")
+        return len(seeded)
+
+    def lookup(self, doc: dict) -> Optional[List[float]]:
+        return self._vectors.get((doc["contentHash"], self.model))
+
+    def append(self, docs: Iterable[dict]) -> None:
+        """Record embedded documents; documents whose embedding failed are left out."""
+        lines = []
+        for doc in docs:
+            vector = doc.get(vector_store.VECTOR_FIELD_NAME)
+            if not vector:
+                continue
+            self._vectors[(doc["contentHash"], self.model)] = vector
+            lines.append(json.dumps({
+                "contentHash": doc["contentHash"],
+                "model": self.model,
+                "id": doc.get("id"),
+                "fileName": doc.get("fileName"),
+                vector_store.VECTOR_FIELD_NAME: vector,
+            }) + "\n")
+        if not lines:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self, keep_hashes: Iterable[str]) -> None:
+        """Rewrite the checkpoint with only the current model's embeddings of keep_hashes."""
+        keep = set(keep_hashes)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for (hash_, model), vector in self._vectors.items():
+                if model == self.model and hash_ in keep:
+                    f.write(json.dumps({"contentHash": hash_, "model": model, vector_store.VECTOR_FIELD_NAME: vector}) + "\n")
+        os.replace(tmp_path, self.path)
+        self._vectors = {key: vector for key, vector in self._vectors.items() if key[1] == self.model and key[0] in keep}
+
+
+def read_manifest(base_path: str) -> Optional[dict]:
+    path = manifest_path(base_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(base_path: str, docs: List[dict], model: str) -> dict:
+    """docs in store row order."""
+    manifest = {
+        "model": model,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "documents": [
+            {"row": row, "id": doc["id"], "fileName": doc.get("fileName"), "contentHash": doc["contentHash"],
+             "duplicateFileNames": doc.get("duplicateFileNames", [])}
+            for row, doc in enumerate(docs)
+        ],
+    }
+    tmp_path = manifest_path(base_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(base_path))
+    return manifest
+
+
+def rows_changed(previous: dict, docs: List[dict]) -> bool:
+    """
+    Whether the store rows (ids and file names, in order) differ from the previous manifest. Unlike a content
+    change, this needs the store rewritten but nothing re-embedded, e.g. when near-duplicates are merged differently.
+    """
+    def rows(entries):
+        return [(entry["id"], entry.get("fileName"), entry.get("duplicateFileNames") or []) for entry in entries]
+    return rows(previous["documents"]) != rows(docs)
+
+
+def diff_manifest(previous: Optional[dict], docs: List[dict], model: str) -> Dict[str, int]:
+    """Counts of new / changed / unchanged / removed documents compared to the previous manifest."""
+    before = {} if previous is None or previous.get("model") != model else {
+        entry["id"]: entry["contentHash"] for entry in previous["documents"]
+    }
+    current = {doc["id"]: doc["contentHash"] for doc in docs}
+    return {
+        "new": sum(1 for id_ in current if id_ not in before),
+        "changed": sum(1 for id_, hash_ in current.items() if id_ in before and before[id_] != hash_),
+        "unchanged": sum(1 for id_, hash_ in current.items() if before.get(id_) == hash_),
+        "removed": sum(1 for id_ in before if id_ not in current),
+    }
@@ -0,0 +1,193 @@
+"""
+Batched, concurrent embedding of documents for data_prep.
+
+Documents are packed into batches bounded by an estimated token count and an input count,
+and a fixed number of workers embed them with AsyncAzureOpenAI, so at most max_concurrency
+requests are in flight. Throttled (429) and transient (5xx / connection) failures are retried,
+waiting for the Retry-After the service asks for when it sends one, and an exponential
+backoff with jitter otherwise.
+
+A non-retryable 4xx (usually one input over the model's limit) fails only the offending
+documents: the batch is split in half and each half retried, down to single documents.
+
+Token counts are estimated at about 4 characters per token for batching. Inputs are cut to the
+model's limit with a conservative count instead (a token per non-ASCII character, as for CJK
+text, and a safety margin), since dense text such as code or CJK has far fewer characters per token.
+"""
+import asyncio
+import random
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from openai import (APIConnectionError, APIStatusError, APITimeoutError,
+                    AsyncAzureOpenAI)
+
+CHARS_PER_TOKEN = 4
+# per-input limit of the text-embedding-ada-002 / text-embedding-3 models
+MAX_INPUT_TOKENS = 8191
+# fraction of the limit an input is cut to, to absorb the error of the conservative count
+INPUT_TOKEN_SAFETY_MARGIN = 0.8
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_for_embedding(text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+    """
+    text cut so that it stays under max_tokens even when it tokenizes densely: ASCII is counted at
+    3 characters per token (code), anything else at one token per character (CJK).
+    """
+    budget = max_tokens * INPUT_TOKEN_SAFETY_MARGIN
+    if len(text) <= budget:
+        return text
+    used = 0.0
+    for i, char in enumerate(text):
+        used += 1 / 3 if char.isascii() else 1.0
+        if used > budget:
+            return text[:i]
+    return text
+
+
+def is_input_error(error: Exception) -> bool:
+    """A 4xx other than throttling: the request itself was rejected, typically an input over the limit."""
+    return isinstance(error, APIStatusError) and 400 <= error.status_code < 500 and error.status_code != 429
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the service in retry-after-ms / retry-after, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+class EmbeddingPipeline:
+    """Embeds the `field` of many documents with few, large, concurrent requests."""
+
+    def __init__(
+        self,
+        client: AsyncAzureOpenAI,
+        model: str,
+        max_batch_tokens: int = 64000,
+        max_batch_inputs: int = 256,
+        max_concurrency: int = 8,
+        max_retries: int = 8,
+        max_backoff_seconds: float = 60,
+    ) -> None:
+        self.client = client
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.max_backoff_seconds = max_backoff_seconds
+        self.stats: Dict[str, float] = {"documents": 0, "batches": 0, "tokens": 0, "retries": 0, "failed": 0, "splits": 0}
+
+    def make_batches(self, docs: Iterable[dict], field: str) -> Iterator[List[dict]]:
+        """Pack documents into batches, lazily, so the input can be streamed."""
+        batch: List[dict] = []
+        batch_tokens = 0
+        for doc in docs:
+            text = doc.get(field) or ""
+            tokens = estimate_tokens(text)
+            if tokens > MAX_INPUT_TOKENS:
+                print(f"Document {doc.get('id', 'unknown')} is ~{tokens} tokens, truncating to {MAX_INPUT_TOKENS} for embedding")
+                tokens = MAX_INPUT_TOKENS
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_inputs):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(doc)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    async def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.embeddings.create(input=texts, model=self.model)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except Exception as e:
+                attempt += 1
+                if not is_retryable(e) or attempt > self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = min(self.max_backoff_seconds, 2 ** (attempt - 1)) * (0.5 + random.random() / 2)
+                self.stats["retries"] += 1
+                print(f"Embedding request failed ({e.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _embed_batch(self, batch: List[dict], field: str) -> None:
+        texts = [truncate_for_embedding(doc.get(field) or " ") for doc in batch]
+        try:
+            embeddings = await self._create_embeddings(texts)
+        except Exception as e:
+            if is_input_error(e) and len(batch) > 1:
+                # find the offending documents instead of failing the whole batch
+                self.stats["splits"] += 1
+                middle = len(batch) // 2
+                print(f"Embedding batch of {len(batch)} documents rejected ({e.__class__.__name__}), retrying in halves")
+                await self._embed_batch(batch[:middle], field)
+                await self._embed_batch(batch[middle:], field)
+                return
+            self.stats["failed"] += len(batch)
+            print(f"Failed to embed a batch of {len(batch)} documents: {e}")
+            with open("embedding_error.log", "a") as f:
+                for doc in batch:
+                    f.write(f"{doc.get('id', 'unknown')}: {e}\n")
+            for doc in batch:
+                doc[f"{field}Vector"] = None
+                doc["embedding_error"] = str(e)
+            return
+        for doc, embedding in zip(batch, embeddings):
+            doc[f"{field}Vector"] = embedding
+        self.stats["batches"] += 1
+        self.stats["documents"] += len(batch)
+        self.stats["tokens"] += sum(estimate_tokens(text) for text in texts)
+
+    async def embed_documents(
+        self,
+        docs: Iterable[dict],
+        field: str = "content",
+        on_batch: Optional[Callable[[List[dict]], None]] = None,
+    ) -> List[dict]:
+        """
+        Adds f"{field}Vector" to every document (None plus "embedding_error" if it failed).
+        on_batch is called with each finished batch, in completion order. Returns the documents in input order.
+        """
+        batches = enumerate(self.make_batches(docs, field))
+        done: Dict[int, List[dict]] = {}
+        start = time.perf_counter()
+
+        async def worker() -> None:
+            # the workers share one lazy batch iterator, which bounds the in-flight window
+            for number, batch in batches:
+                await self._embed_batch(batch, field)
+                done[number] = batch
+                if on_batch:
+                    on_batch(batch)
+                print(f"Embedded {self.stats['documents']} documents in {self.stats['batches']} batches")
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = round(elapsed, 2)
+        self.stats["documents_per_second"] = round(self.stats["documents"] / elapsed, 1) if elapsed else 0.0
+        print(f"Embedding finished: {self.stats}")
+        return [doc for number in sorted(done) for doc in done[number]]
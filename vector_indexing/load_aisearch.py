@@ -1,18 +1,29 @@
+import asyncio
 import json
 import os
+import sys
 import time
 import uuid
+from typing import List
 
 import requests
 from azure.identity import AzureCliCredential, get_bearer_token_provider
-from azure.search.documents import SearchClient
+from azure.identity.aio import AzureCliCredential as AsyncAzureCliCredential
+from azure.search.documents.aio import SearchClient
 from dotenv import load_dotenv
 from openai import AzureOpenAI, RateLimitError
 
+# allow running as `python vector_indexing/<script>.py` from the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from semantic_kernel_framework import vector_store
+from vector_indexing.search_documents import to_search_doc
+from vector_indexing.search_bulk_loader import SearchBulkLoader
+
 load_dotenv()
 
 azcli_credential = AzureCliCredential()
 json_vector_file_name = "search_docs_with_vectors.json"
+vector_store_base_path = "search_docs_vectors"
 
 def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", language_suffix: str = "en"):
     index_schema = {
@@ -36,6 +47,22 @@ def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", la
                 "type": "Edm.String",
                 "searchable": True
             },
+            {
+                "name": "parentId",
+                "type": "Edm.String",
+                "filterable": True
+            },
+            {
+                "name": "chunkIndex",
+                "type": "Edm.Int32",
+                "filterable": True,
+                "sortable": True
+            },
+            {
+                "name": "duplicateFileNames",
+                "type": "Collection(Edm.String)",
+                "filterable": True
+            },
             {
                 "name": "contentVector",
                 "type": "Collection(Edm.Single)",
@@ -93,7 +120,7 @@ def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", la
 
     
 
-    url = f"{os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")}/indexes/{index_name}?api-version=2024-07-01"
+    url = f"{os.getenv('AZURE_SEARCH_SERVICE_ENDPOINT')}/indexes/{index_name}?api-version=2024-07-01"
 
     response = requests.get(url, headers=headers)
     
@@ -104,29 +131,59 @@ def create_simple_index(index_name: str, analyzer_name: str = "en.microsoft", la
         else:
             print("❌ Failed to create index:", create_response.text)
     elif response.status_code == 200:
-        print("ℹ️ Index already exists.")
+        index_definition = response.json()
+        added = add_missing_fields(index_definition, index_schema)
+        if not added:
+            print("ℹ️ Index already exists.")
+            return
+        # the upload rejects documents with fields the index doesn't have
+        update_response = requests.put(url, headers=headers, json=index_definition)
+        if update_response.status_code in [200, 201, 204]:
+            print(f"✅ Added fields {', '.join(added)} to the existing index.")
+        else:
+            print("❌ Failed to add fields to the index:", update_response.text)
     else:
         print("❌ Unexpected error while checking index:", response.text)
 
 
-def upload_to_search_simple(index_name):
-    with open(json_vector_file_name, "r", encoding="utf-8") as f:
-        index_data_with_vectors = json.load(f)
+def add_missing_fields(index_definition: dict, index_schema: dict) -> List[str]:
+    """
+    Append the schema's fields that the existing index lacks to its definition, ready to PUT back.
+    An index accepts new fields in place; changing or removing a field still needs a rebuild.
+    """
+    existing = {field["name"] for field in index_definition["fields"]}
+    missing = [field for field in index_schema["fields"] if field["name"] not in existing]
+    index_definition["fields"].extend(missing)
+    for key in [key for key in index_definition if key.startswith("@odata.")]:
+        del index_definition[key]
+    return [field["name"] for field in missing]
+
+
+async def upload_to_search_simple_async(index_name):
+    # documents are streamed from the vector store into the batches, never all held in memory
+    docs = (to_search_doc(doc) for doc in vector_store.iter_documents(vector_store_base_path, json_vector_file_name))
+    async with AsyncAzureCliCredential() as credential:
+        async with SearchClient(endpoint=os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT"), index_name=index_name, credential=credential) as search_client:
+            loader = SearchBulkLoader(
+                search_client,
+                max_batch_bytes=int(os.getenv("AZURE_SEARCH_UPLOAD_BATCH_MAX_BYTES", str(8 * 1024 * 1024))),
+                max_batch_documents=int(os.getenv("AZURE_SEARCH_UPLOAD_BATCH_MAX_DOCUMENTS", "500")),
+                max_concurrency=int(os.getenv("AZURE_SEARCH_UPLOAD_MAX_CONCURRENCY", "4")),
+                max_retries=int(os.getenv("AZURE_SEARCH_UPLOAD_MAX_RETRIES", "6")),
+            )
+            stats = await loader.upload(docs)
+            # ids changed from random uuids to file-name uuids to chunk ids, and documents get removed;
+            # uploads alone would leave those documents behind to be retrieved
+            if os.getenv("AZURE_SEARCH_DELETE_STALE", "true").lower() == "true":
+                await loader.delete_stale(loader.uploaded_keys)
+
+    print(f"{stats['documents']} Documents uploaded to Azure Search, {stats['failed']} failed, {stats['deleted']} stale deleted")
+    vector_store.mark_kb_rebuilt()
+    return stats
 
-    search_client = SearchClient(endpoint=os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT"), index_name=index_name, credential=azcli_credential)
 
-    for idx, doc in enumerate(index_data_with_vectors):
-        search_doc = {
-            "id": doc["id"],
-            "fileName": doc.get("fileName", ""),
-            "content": doc.get("content", ""),
-            "contentVector": doc.get("contentVector") or [],
-        }
-
-        result = search_client.upload_documents(documents=[search_doc])
-        print(f"Uploaded document: {doc['id']} - {idx + 1}")
-
-    print(f"{len(index_data_with_vectors)} Documents uploaded to Azure Search")
+def upload_to_search_simple(index_name):
+    return asyncio.run(upload_to_search_simple_async(index_name))
 
 
 
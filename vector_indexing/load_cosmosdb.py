@@ -2,12 +2,21 @@
 import asyncio
 import json
 import os
+import sys
 import uuid
 
-from azure.cosmos import CosmosClient, PartitionKey, exceptions
+from azure.cosmos import CosmosClient, PartitionKey, ThroughputProperties, exceptions
+from azure.cosmos.aio import CosmosClient as AsyncCosmosClient
 from azure.identity import AzureCliCredential
+from azure.identity.aio import AzureCliCredential as AsyncAzureCliCredential
 from dotenv import load_dotenv
 
+# allow running as `python vector_indexing/<script>.py` from the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from semantic_kernel_framework import vector_store
+from vector_indexing.cosmos_bulk_loader import CosmosBulkLoader, connection_policy_without_throttle_retries
+from vector_indexing.search_documents import to_search_doc
+
 load_dotenv()
 
 print(f"Using Cosmos DB endpoint: {os.getenv('AZURE_COSMOSDB_ENDPOINT')}")
@@ -15,7 +24,8 @@ print(f"Using Cosmos DB endpoint: {os.getenv('AZURE_COSMOSDB_ENDPOINT')}")
 # Initialize the Cosmos client
 client = CosmosClient(os.getenv("AZURE_COSMOSDB_ENDPOINT"), credential=AzureCliCredential())
 database_name = os.getenv("AZURE_COSMOSDB_DBNAME")
-container_name = os.getenv("AZURE_COSMOSDB_CONTAINERNAME")
+# AZURE_COSMOSDB_CONTAINER_NAME is what the search helper reads; the old name is still accepted
+container_name = os.getenv("AZURE_COSMOSDB_CONTAINER_NAME") or os.getenv("AZURE_COSMOSDB_CONTAINERNAME")
 
 client.create_database_if_not_exists(id=database_name)
 # Connect to the database and container
@@ -37,6 +47,7 @@ vector_indexing_policy = {
     
     "indexingMode": "consistent",
     "automatic": True,
+    # "/*" also indexes parentId / chunkIndex of chunk-level records
     "includedPaths": [
         {
             "path": "/*"
@@ -85,13 +96,20 @@ for db in client.list_databases():
 
 
 
+def get_offer_throughput():
+    # autoscale lets a bulk load burst to the max and scales back down to 10% of it when idle
+    if os.getenv("AZURE_COSMOSDB_AUTOSCALE_MAX_THROUGHPUT"):
+        return ThroughputProperties(auto_scale_max_throughput=int(os.getenv("AZURE_COSMOSDB_AUTOSCALE_MAX_THROUGHPUT")))
+    return int(os.getenv("AZURE_COSMOSDB_THROUGHPUT", "400"))
+
+
 container = None
 try:
     container = database.create_container(id=container_name, partition_key=PartitionKey(path="/id"), 
                           vector_embedding_policy=vector_embedding_policy,
-                          indexing_policy=vector_embedding_policy,
+                          indexing_policy=vector_indexing_policy,
                           full_text_policy=full_text_paths_policy,
-                          offer_throughput=400) 
+                          offer_throughput=get_offer_throughput()) 
 except exceptions.CosmosResourceExistsError:
     print(f"Container {container_name} already exists. Using existing container.")
     container = database.get_container_client(container_name)
@@ -100,18 +118,43 @@ except exceptions.CosmosResourceExistsError:
 
 
 json_vector_file_name = "search_docs_with_vectors.json"
+vector_store_base_path = "search_docs_vectors"
+
+
+def get_provisioned_throughput():
+    """RU/s the container can use right now (the autoscale max for autoscale), None for serverless accounts."""
+    try:
+        properties = container.get_throughput()
+    except exceptions.CosmosHttpResponseError:
+        return None
+    return properties.auto_scale_max_throughput or properties.offer_throughput
+
+
 async def start_processing():
-    with open(json_vector_file_name, "r", encoding="utf-8") as f:
-        index_data_with_vectors = json.load(f)
-
-    for idx, doc in enumerate(index_data_with_vectors):
-        search_doc = {
-            "id": doc["id"],
-            "fileName": doc.get("fileName", ""),
-            "content": doc.get("content", ""),
-            "contentVector": doc.get("contentVector") or [],
-        }
-        res = container.upsert_item(search_doc)
+    provisioned = get_provisioned_throughput()
+    print(f"Provisioned throughput: {provisioned or 'serverless / shared'} RU/s")
+    docs = (to_search_doc(doc) for doc in vector_store.iter_documents(vector_store_base_path, json_vector_file_name))
+    async with AsyncAzureCliCredential() as credential:
+        async with AsyncCosmosClient(os.getenv("AZURE_COSMOSDB_ENDPOINT"), credential=credential,
+                                     connection_policy=connection_policy_without_throttle_retries()) as async_client:
+            async_container = async_client.get_database_client(database_name).get_container_client(container_name)
+            loader = CosmosBulkLoader(
+                async_container,
+                initial_concurrency=int(os.getenv("AZURE_COSMOSDB_UPLOAD_INITIAL_CONCURRENCY", "8")),
+                max_concurrency=int(os.getenv("AZURE_COSMOSDB_UPLOAD_MAX_CONCURRENCY", "64")),
+                max_retries=int(os.getenv("AZURE_COSMOSDB_UPLOAD_MAX_RETRIES", "10")),
+                provisioned_ru_per_second=provisioned,
+            )
+            stats = await loader.upload(docs)
+            # ids changed from random uuids to file-name uuids to chunk ids, and documents get removed;
+            # upserts alone would leave those records behind to be retrieved
+            if os.getenv("AZURE_COSMOSDB_DELETE_STALE", "true").lower() == "true":
+                await loader.delete_stale(loader.uploaded_ids)
+
+    print(f"{stats['documents']} Documents upserted to Cosmos DB, {stats['failed']} failed, {stats['deleted']} stale deleted, "
+          f"{stats['request_units']} RU ({stats['request_units_per_second']} RU/s)")
+    vector_store.mark_kb_rebuilt()
+    return stats
 
 
 if __name__ == "__main__":
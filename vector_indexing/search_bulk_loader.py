@@ -0,0 +1,197 @@
+"""
+Bulk upload of documents to an Azure AI Search index for load_aisearch.
+
+Documents are packed into batches bounded by their serialized size and count (the service
+accepts at most 1000 documents and 16 MB per request), and a fixed number of workers send them
+with the async SearchClient, so at most max_concurrency requests are in flight. The service
+reports success per document: documents that failed with a transient status (409, 422, 429,
+503) are retried on their own with exponential backoff, the others are logged as failed.
+A whole request that is throttled or fails in transit is retried the same way.
+
+Uploads never remove anything, so after a load delete_stale deletes the documents whose key is
+no longer in the source (a removed document, a document that now has fewer chunks, or keys from
+an older id scheme).
+"""
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+from azure.search.documents.aio import SearchClient
+
+MAX_BATCH_DOCUMENTS = 1000
+# the service limit is 16 MB, leave room for the request envelope
+MAX_BATCH_BYTES = 15 * 1024 * 1024
+RETRYABLE_STATUS_CODES = (409, 422, 429, 503)
+
+
+def document_size(doc: dict) -> int:
+    return len(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        return True
+    return isinstance(error, HttpResponseError) and (error.status_code in RETRYABLE_STATUS_CODES or (error.status_code or 0) >= 500)
+
+
+class SearchBulkLoader:
+    """Uploads many documents to one index with few, large, concurrent requests."""
+
+    def __init__(
+        self,
+        client: SearchClient,
+        key_field: str = "id",
+        max_batch_bytes: int = 8 * 1024 * 1024,
+        max_batch_documents: int = 500,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        max_backoff_seconds: float = 60,
+    ) -> None:
+        self.client = client
+        self.key_field = key_field
+        self.max_batch_bytes = min(max_batch_bytes, MAX_BATCH_BYTES)
+        self.max_batch_documents = min(max_batch_documents, MAX_BATCH_DOCUMENTS)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.max_backoff_seconds = max_backoff_seconds
+        self.stats: Dict[str, float] = {"documents": 0, "batches": 0, "bytes": 0, "requests": 0, "retries": 0, "failed": 0, "deleted": 0}
+        # keys of all documents passed to upload, whether or not they were indexed
+        self.uploaded_keys: Set[str] = set()
+
+    def make_batches(self, docs: Iterable[dict]) -> Iterator[List[dict]]:
+        """Pack documents into batches, lazily, so the input can be streamed."""
+        batch: List[dict] = []
+        batch_bytes = 0
+        for doc in docs:
+            size = document_size(doc)
+            if batch and (batch_bytes + size > self.max_batch_bytes or len(batch) >= self.max_batch_documents):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(doc)
+            batch_bytes += size
+            self.stats["bytes"] += size
+        if batch:
+            yield batch
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_backoff_seconds, 2 ** (attempt - 1)) * (0.5 + random.random() / 2)
+
+    def _record_failures(self, docs: List[dict], reasons: Dict[str, str]) -> None:
+        self.stats["failed"] += len(docs)
+        with open("upload_error.log", "a") as f:
+            for doc in docs:
+                key = doc.get(self.key_field, "unknown")
+                print(f"Failed to upload document {key}: {reasons.get(key)}")
+                f.write(f"{key}: {reasons.get(key)}\n")
+
+    async def _upload_batch(self, batch: List[dict]) -> None:
+        pending = batch
+        attempt = 0
+        while pending:
+            self.stats["requests"] += 1
+            try:
+                results = await self.client.upload_documents(documents=pending)
+            except Exception as e:
+                attempt += 1
+                if not is_retryable(e) or attempt > self.max_retries:
+                    self._record_failures(pending, {doc.get(self.key_field): str(e) for doc in pending})
+                    return
+                delay = self._backoff(attempt)
+                self.stats["retries"] += 1
+                print(f"Upload of {len(pending)} documents failed ({e.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            by_key = {result.key: result for result in results}
+            retry, failed, reasons = [], [], {}
+            for doc in pending:
+                result = by_key.get(doc.get(self.key_field))
+                if result is not None and result.succeeded:
+                    self.stats["documents"] += 1
+                    continue
+                status_code = result.status_code if result is not None else None
+                reasons[doc.get(self.key_field)] = f"{status_code}: {result.error_message if result is not None else 'no result'}"
+                (retry if status_code in RETRYABLE_STATUS_CODES else failed).append(doc)
+            if failed:
+                self._record_failures(failed, reasons)
+            if not retry:
+                return
+            attempt += 1
+            if attempt > self.max_retries:
+                self._record_failures(retry, reasons)
+                return
+            delay = self._backoff(attempt)
+            self.stats["retries"] += 1
+            print(f"{len(retry)} of {len(pending)} documents were not indexed, retry {attempt} in {delay:.1f}s")
+            pending = retry
+            await asyncio.sleep(delay)
+
+    async def upload(self, docs: Iterable[dict], on_batch: Optional[Callable[[List[dict]], None]] = None) -> Dict[str, float]:
+        """Uploads all documents and returns the stats; on_batch is called with each finished batch."""
+        batches = self.make_batches(docs)
+        start = time.perf_counter()
+
+        async def worker() -> None:
+            # the workers share one lazy batch iterator, which bounds the in-flight window
+            for batch in batches:
+                self.uploaded_keys.update(doc[self.key_field] for doc in batch)
+                await self._upload_batch(batch)
+                self.stats["batches"] += 1
+                if on_batch:
+                    on_batch(batch)
+                print(f"Uploaded {self.stats['documents']} documents in {self.stats['batches']} batches")
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = round(elapsed, 2)
+        self.stats["documents_per_second"] = round(self.stats["documents"] / elapsed, 1) if elapsed else 0.0
+        self.stats["megabytes_per_second"] = round(self.stats["bytes"] / elapsed / 1024 / 1024, 2) if elapsed else 0.0
+        print(f"Upload finished: {self.stats}")
+        return self.stats
+
+    async def _delete_batch(self, keys: List[str]) -> None:
+        attempt = 0
+        while keys:
+            self.stats["requests"] += 1
+            try:
+                results = await self.client.delete_documents(documents=[{self.key_field: key} for key in keys])
+            except Exception as e:
+                attempt += 1
+                if not is_retryable(e) or attempt > self.max_retries:
+                    print(f"Failed to delete {len(keys)} stale documents: {e}")
+                    return
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            # deleting a key that is already gone succeeds too
+            self.stats["deleted"] += sum(1 for result in results if result.succeeded)
+            for result in results:
+                if not result.succeeded and result.status_code not in RETRYABLE_STATUS_CODES:
+                    print(f"Failed to delete stale document {result.key}: {result.status_code} {result.error_message}")
+            keys = [result.key for result in results if not result.succeeded and result.status_code in RETRYABLE_STATUS_CODES]
+            attempt += 1
+            if keys and attempt > self.max_retries:
+                print(f"Failed to delete {len(keys)} stale documents")
+                return
+            if keys:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def delete_stale(self, keep_keys: Iterable[str]) -> int:
+        """Deletes every document whose key is not in keep_keys and returns how many were deleted."""
+        keep = set(keep_keys)
+        if not keep:
+            # an empty source is far more likely a missing vector store than an empty knowledge base
+            print("No current document keys, not deleting anything")
+            return 0
+        results = await self.client.search(search_text="*", select=[self.key_field])
+        stale = [result[self.key_field] async for result in results if result[self.key_field] not in keep]
+        print(f"Deleting {len(stale)} stale documents")
+        deleted_before = self.stats["deleted"]
+        for start in range(0, len(stale), self.max_batch_documents):
+            await self._delete_batch(stale[start:start + self.max_batch_documents])
+        return int(self.stats["deleted"] - deleted_before)
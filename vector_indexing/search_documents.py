@@ -0,0 +1,21 @@
+"""
+The document shape both loaders write: vector store records mapped onto the fields of the AI Search
+index and of the Cosmos DB container, which share one schema.
+"""
+
+
+def to_search_doc(doc: dict) -> dict:
+    search_doc = {
+        "id": doc["id"],
+        "fileName": doc.get("fileName", ""),
+        "content": doc.get("content", ""),
+        "contentVector": doc.get("contentVector") or [],
+    }
+    # chunk-level records point back to their source document
+    if "parentId" in doc:
+        search_doc["parentId"] = doc["parentId"]
+        search_doc["chunkIndex"] = doc.get("chunkIndex")
+    # pages merged into this one as near-duplicates
+    if doc.get("duplicateFileNames"):
+        search_doc["duplicateFileNames"] = doc["duplicateFileNames"]
+    return search_doc